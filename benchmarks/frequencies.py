@@ -0,0 +1,83 @@
+"""
+Times the Frequency reads, get_task and get_frequency_by_task_id, and
+changing a Frequency's type with replace_frequency.
+
+Only the public functions in taskmaster.taskmaster are used, so the same
+script can be run against older checkouts to compare storage layouts.
+
+Run from the repository root with `python benchmarks/frequencies.py`
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from taskmaster.database import dispose_engine, init_db, unit_of_work
+from taskmaster.models import (DailyFrequency, MonthlyDateFrequency,
+                               MonthlyDayFrequency, WeeklyFrequency)
+from taskmaster.taskmaster import (create_task, get_frequency_by_task_id,
+                                   get_task, replace_frequency)
+
+
+def random_frequency(rng, task_id):
+    return rng.choice([
+        lambda: DailyFrequency(task_id=task_id),
+        lambda: WeeklyFrequency(task_id=task_id,
+                                day_of_week=rng.randint(1, 7)),
+        lambda: MonthlyDateFrequency(task_id=task_id,
+                                     day_of_month=rng.randint(1, 31)),
+        lambda: MonthlyDayFrequency(task_id=task_id, week_of_month=-1,
+                                    day_of_week=rng.randint(1, 7)),
+    ])()
+
+
+def time_calls(function, task_ids, rng):
+    timings = []
+    for task_id in task_ids:
+        start = time.perf_counter()
+        function(task_id, rng)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=1000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['TASKMASTER_DATABASE_URL'] = \
+            f'sqlite:///{os.path.join(directory, "bench.sqlite")}'
+        dispose_engine()
+        init_db()
+        with unit_of_work() as session:
+            task_ids = [create_task(f'Task {i}', session=session).id
+                        for i in range(args.tasks)]
+        with unit_of_work() as session:
+            for task_id in task_ids:
+                replace_frequency(random_frequency(rng, task_id),
+                                  session=session)
+
+        operations = {
+            'get_task': lambda task_id, rng: get_task(task_id),
+            'get_frequency_by_task_id':
+                lambda task_id, rng: get_frequency_by_task_id(task_id),
+            'replace_frequency': lambda task_id, rng: replace_frequency(
+                random_frequency(rng, task_id)),
+        }
+        print(f'{"operation":<26}{"median us":>12}{"p95 us":>12}')
+        for name, function in operations.items():
+            sample = [rng.choice(task_ids) for _ in range(args.runs)]
+            timings = sorted(time_calls(function, sample, rng))
+            median = statistics.median(timings) * 1e6
+            p95 = timings[int(len(timings) * 0.95)] * 1e6
+            print(f'{name:<26}{median:>12.1f}{p95:>12.1f}')
+        dispose_engine()
+
+
+if __name__ == '__main__':
+    main()
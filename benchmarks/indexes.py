@@ -0,0 +1,130 @@
+"""
+Shows how the hot queries on executions and execution_windows scale as the
+history grows, with and without the secondary indexes in taskmaster.models.
+
+For each size the database is filled with one window and one execution per
+Task per day, all in the past and HIT except for a single OPEN window per
+Task covering now. Then these queries are timed for random Tasks:
+* open_window: the lookup execute_task does on every execution
+* executions: loading a Task's executions in time order
+* window_executions: executions belonging to one window
+
+Run from the repository root with `python benchmarks/indexes.py`
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, insert, select
+
+from taskmaster.database import create_engine_from_config, get_config
+from taskmaster.models import (Base, Execution, ExecutionWindow,
+                               ExecutionWindowStatusEnum, Task)
+
+
+TASKS = 100
+
+
+def fill(connection, days):
+    now = datetime.utcnow()
+    connection.execute(insert(Task), [
+        {'id': task_id, 'name': f'Task {task_id}'}
+        for task_id in range(1, TASKS + 1)
+    ])
+    windows = []
+    executions = []
+    window_id = 0
+    for day in range(days, -1, -1):
+        start = (now - timedelta(days=day)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        for task_id in range(1, TASKS + 1):
+            window_id += 1
+            is_today = day == 0
+            windows.append({
+                'id': window_id, 'task_id': task_id, 'start': start,
+                'end': start + timedelta(days=1),
+                'status': (ExecutionWindowStatusEnum.OPEN if is_today
+                           else ExecutionWindowStatusEnum.HIT),
+            })
+            if not is_today:
+                executions.append({
+                    'task_id': task_id, 'execution_window_id': window_id,
+                    'executed_at': start + timedelta(hours=9),
+                })
+    connection.execute(insert(ExecutionWindow), windows)
+    connection.execute(insert(Execution), executions)
+    return window_id
+
+
+def queries(max_window_id):
+    now = datetime.utcnow()
+    return {
+        'open_window': lambda task_id: select(ExecutionWindow.id).where(and_(
+            ExecutionWindow.task_id == task_id,
+            ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
+            ExecutionWindow.start <= now,
+            ExecutionWindow.end >= now)),
+        'executions': lambda task_id: (
+            select(Execution.id, Execution.executed_at)
+            .where(Execution.task_id == task_id)
+            .order_by(Execution.executed_at.desc()).limit(20)),
+        'window_executions': lambda task_id: select(Execution.id).where(
+            Execution.execution_window_id == random.randint(
+                1, max_window_id)),
+    }
+
+
+def time_queries(connection, max_window_id, runs):
+    results = {}
+    for name, build_query in queries(max_window_id).items():
+        timings = []
+        for _ in range(runs):
+            query = build_query(random.randint(1, TASKS))
+            start = time.perf_counter()
+            connection.execute(query).all()
+            timings.append(time.perf_counter() - start)
+        results[name] = statistics.median(timings) * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--days', type=int, nargs='+',
+                        default=[10, 100, 1000])
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(f'{"rows":>10} {"indexes":>8} '
+          + ' '.join(f'{name + " us":>20}' for name in queries(1)))
+    for days in args.days:
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine_from_config(get_config(environ={
+                'TASKMASTER_DATABASE_URL':
+                    f'sqlite:///{os.path.join(directory, "bench.sqlite")}',
+            }))
+            Base.metadata.create_all(engine)
+            with engine.begin() as connection:
+                max_window_id = fill(connection, days)
+            for indexed in (True, False):
+                if not indexed:
+                    with engine.begin() as connection:
+                        for table in (Execution.__table__,
+                                      ExecutionWindow.__table__):
+                            for index in table.indexes:
+                                index.drop(connection)
+                with engine.connect() as connection:
+                    results = time_queries(connection, max_window_id,
+                                           args.runs)
+                print(f'{max_window_id:>10} {str(indexed):>8} '
+                      + ' '.join(f'{value:>20.1f}'
+                                 for value in results.values()))
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Load tests the WSGI app (website/app.py) against the ASGI app
+(website/asgi.py), reporting requests per second and latency percentiles.
+
+Each app is started in its own process on a throwaway database:
+* sync: gunicorn with --workers sync workers if gunicorn is installed,
+  otherwise wsgiref, which serves like a single sync worker
+* async: a single uvicorn process
+
+Clients mostly read a Task, and every tenth request executes one. --slow
+makes each client dawdle between sending its headers and its body, like a
+client on a slow network, which is where a sync worker is stuck waiting.
+
+Run from the repository root with `python benchmarks/load.py`
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from taskmaster.database import dispose_engine, init_db, unit_of_work
+from taskmaster.taskmaster import create_task
+
+
+WSGIREF_SERVER = '''
+import sys
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from website.app import app
+
+
+class Server(WSGIServer):
+    # The default backlog of 5 resets most of the clients
+    request_queue_size = 1024
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+make_server('127.0.0.1', int(sys.argv[1]), app, server_class=Server,
+            handler_class=QuietHandler).serve_forever()
+'''
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(kind, port, workers):
+    if kind == 'async':
+        return [sys.executable, '-m', 'uvicorn', 'website.asgi:app',
+                '--port', str(port), '--log-level', 'warning']
+    if importlib.util.find_spec('gunicorn'):
+        return [sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+                '--bind', f'127.0.0.1:{port}', 'website.app:app']
+    return [sys.executable, '-c', WSGIREF_SERVER, str(port)]
+
+
+def wait_for(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'Server on port {port} never started')
+
+
+async def one_request(port, method, path, slow):
+    body = b'{}' if method == 'POST' else b''
+    started = time.perf_counter()
+    try:
+        response = await _exchange(port, method, path, body, slow)
+    except OSError:
+        return time.perf_counter() - started, None
+    status = int(response.split(b' ', 2)[1])
+    return time.perf_counter() - started, status
+
+
+async def _exchange(port, method, path, body, slow):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'
+                 f'Content-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n'
+                 f'Connection: close\r\n\r\n'.encode('latin-1'))
+    if slow:
+        await writer.drain()
+        await asyncio.sleep(slow)
+    writer.write(body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def run_clients(port, task_ids, clients, requests, slow, seed):
+    rng = random.Random(seed)
+    plan = [('POST', f'/api/tasks/{rng.choice(task_ids)}/executions')
+            if i % 10 == 9 else ('GET', f'/api/tasks/{rng.choice(task_ids)}')
+            for i in range(requests)]
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        while plan:
+            method, path = plan.pop()
+            latency, status = await one_request(port, method, path, slow)
+            latencies.append(latency)
+            errors += status is None or status >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - started, sorted(latencies), errors
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--slow', type=float, default=0.0,
+                        help='Seconds each client waits mid-request')
+    parser.add_argument('--workers', type=int, default=3,
+                        help='gunicorn workers for the sync app')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, TASKMASTER_DATABASE_URL=(
+            f'sqlite:///{os.path.join(directory, "bench.sqlite")}'))
+        os.environ.update(env)
+        dispose_engine()
+        init_db()
+        with unit_of_work() as session:
+            task_ids = [create_task(f'Task {i}', session=session).id
+                        for i in range(args.tasks)]
+        dispose_engine()
+
+        for kind in ('sync', 'async'):
+            port = free_port()
+            server = subprocess.Popen(
+                server_command(kind, port, args.workers), env=env,
+                stdout=subprocess.DEVNULL)
+            try:
+                wait_for(port)
+                elapsed, latencies, errors = asyncio.run(run_clients(
+                    port, task_ids, args.clients, args.requests, args.slow,
+                    seed=0))
+            finally:
+                server.terminate()
+                server.wait()
+            results[kind] = {
+                'rps': len(latencies) / elapsed,
+                'p50_ms': percentile(latencies, 0.50) * 1e3,
+                'p99_ms': percentile(latencies, 0.99) * 1e3,
+                'errors': errors,
+            }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{"app":<8}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}'
+          f'{"errors":>8}')
+    for kind, result in results.items():
+        print(f'{kind:<8}{result["rps"]:>10.1f}{result["p50_ms"]:>10.1f}'
+              f'{result["p99_ms"]:>10.1f}{result["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
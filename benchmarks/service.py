@@ -0,0 +1,168 @@
+"""
+Times the service functions in taskmaster.taskmaster as the data grows, on
+databases filled by synthetic.py.
+
+For each --sizes number of Tasks a fresh database is filled, then each
+operation is called --runs times for random Tasks, each call in its own
+unit of work like a CLI command or web request would be:
+* get_task
+* get_tasks, which loads every Task
+* execute_task, which also looks for the open Execution Window
+* check_if_execution_window_overlaps, for a window over the next day
+
+Throughput and latency percentiles are printed for each size and
+operation. --output saves them as JSON, along with the commit and the
+arguments, and --compare prints how the p50s moved since a saved run:
+
+    python benchmarks/service.py --output before.json
+    git checkout my-branch
+    python benchmarks/service.py --compare before.json
+
+The read-through cache is turned off, so every call reaches the database.
+
+Run from the repository root with `python benchmarks/service.py`
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy
+
+from synthetic import fill  # benchmarks/synthetic.py
+
+from taskmaster.cache import configure_cache
+from taskmaster.database import dispose_engine, get_engine, init_db
+from taskmaster.models import ExecutionWindow, Task
+from taskmaster.taskmaster import (check_if_execution_window_overlaps,
+                                   execute_task, get_task, get_tasks)
+
+
+PERCENTILES = (50, 95, 99)
+
+
+def operations(now):
+    """Name: function of a Task id"""
+
+    def overlaps(task_id):
+        check_if_execution_window_overlaps(Task(id=task_id), ExecutionWindow(
+            task_id=task_id, start=now, end=now + timedelta(days=1)))
+
+    return {
+        'get_task': get_task,
+        'get_tasks': lambda task_id: get_tasks(),
+        'execute_task': execute_task,
+        'check_if_execution_window_overlaps': overlaps,
+    }
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def time_operation(function, task_ids):
+    timings = []
+    started = time.perf_counter()
+    for task_id in task_ids:
+        start = time.perf_counter()
+        function(task_id)
+        timings.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    result = {'ops_per_second': len(timings) / elapsed}
+    for p in PERCENTILES:
+        result[f'p{p}_us'] = percentile(timings, p / 100) * 1e6
+    return result
+
+
+def run_size(directory, tasks, args):
+    path = os.path.join(directory, f'bench-{tasks}.sqlite')
+    os.environ['TASKMASTER_DATABASE_URL'] = f'sqlite:///{path}'
+    dispose_engine()
+    init_db()
+    now = datetime.utcnow()
+    with get_engine().begin() as connection:
+        task_ids = fill(connection, tasks, args.executions, args.windows,
+                        now=now, seed=args.seed)
+
+    rng = random.Random(args.seed)
+    results = {}
+    for name, function in operations(now).items():
+        sample = [rng.choice(task_ids) for _ in range(args.runs)]
+        # A few calls first, so the pool and statement cache are warm
+        for task_id in sample[:10]:
+            function(task_id)
+        results[name] = time_operation(function, sample)
+    dispose_engine()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, previous=None):
+    print(f'{"tasks":>8} {"operation":<36}{"ops/s":>10}'
+          + ''.join(f'{f"p{p} us":>12}' for p in PERCENTILES)
+          + (f'{"p50 change":>12}' if previous else ''))
+    for size, operation_results in results.items():
+        for name, result in operation_results.items():
+            line = (f'{size:>8} {name:<36}{result["ops_per_second"]:>10.1f}'
+                    + ''.join(f'{result[f"p{p}_us"]:>12.1f}'
+                              for p in PERCENTILES))
+            before = (previous or {}).get(size, {}).get(name)
+            if before:
+                change = result['p50_us'] / before['p50_us'] - 1
+                line += f'{change:>+12.0%}'
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 1000, 5000], help='Numbers of Tasks')
+    parser.add_argument('--executions', type=int, default=20,
+                        help='Per Task')
+    parser.add_argument('--windows', type=int, default=20, help='Per Task')
+    parser.add_argument('--runs', type=int, default=200,
+                        help='Calls of each operation at each size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Save the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file from an earlier run')
+    args = parser.parse_args()
+
+    configure_cache(None)
+    with tempfile.TemporaryDirectory() as directory:
+        results = {str(size): run_size(directory, size, args)
+                   for size in args.sizes}
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+    print_results(results, previous)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'date': datetime.utcnow().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlalchemy': sqlalchemy.__version__,
+                'arguments': vars(args),
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
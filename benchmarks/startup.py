@@ -0,0 +1,92 @@
+"""
+Measures how long TaskMaster takes to start, which is most of the cost of
+a short CLI call or a gunicorn worker boot.
+
+Each scenario runs in a fresh interpreter against a throwaway database:
+* import: `import taskmaster.cli`
+* help: `taskmaster --help`
+* noop: `taskmaster tasks --help`, which goes through the cli group
+* client: `taskmaster-client tasks list`, served by a `taskmaster daemon`
+  that's started once beforehand
+
+Run from the repository root with `python benchmarks/startup.py`. The
+scenarios import TaskMaster from the current directory, so running this
+file from a checkout of an older commit times that commit, pass
+--scenarios to leave out the ones it doesn't have yet.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+SCENARIOS = {
+    'import': 'import taskmaster.cli',
+    'help': ('from taskmaster.cli import cli; '
+             'cli(["--help"], prog_name="taskmaster")'),
+    'noop': ('from taskmaster.cli import cli; '
+             'cli(["tasks", "--help"], prog_name="taskmaster")'),
+    'client': ('from taskmaster.client import main; '
+               'main(["tasks", "list"])'),
+}
+
+
+def time_scenario(code, runs, env):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                        default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ)
+        env['TASKMASTER_DATABASE_URL'] = \
+            f'sqlite:///{directory}/taskmaster.sqlite'
+        env['TASKMASTER_DAEMON_SOCKET'] = f'{directory}/taskmaster-cli.sock'
+        daemon = None
+        if 'client' in args.scenarios:
+            daemon = subprocess.Popen(
+                [sys.executable, '-c',
+                 'from taskmaster.cli import cli; cli(["daemon"])'],
+                env=env, stdout=subprocess.DEVNULL)
+            while not os.path.exists(env['TASKMASTER_DAEMON_SOCKET']):
+                time.sleep(0.05)
+        baseline = time_scenario('pass', args.runs, env)
+        print(f'{"scenario":<10}{"median ms":>12}{"min ms":>12}'
+              f'{"over bare python ms":>22}')
+        # Everything but the client should leave the database alone
+        created = None
+        for name in ['python', *args.scenarios]:
+            if name == 'client':
+                created = os.path.exists(
+                    os.path.join(directory, 'taskmaster.sqlite'))
+            timings = (baseline if name == 'python'
+                       else time_scenario(SCENARIOS[name], args.runs, env))
+            median = statistics.median(timings) * 1000
+            overhead = median - statistics.median(baseline) * 1000
+            print(f'{name:<10}{median:>12.1f}{min(timings) * 1000:>12.1f}'
+                  f'{overhead:>22.1f}')
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
+        if created is None:
+            created = os.path.exists(
+                os.path.join(directory, 'taskmaster.sqlite'))
+        print(f'Database file created: {created}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Fills a TaskMaster database with made up Tasks and history for benchmarks.
+
+The same arguments and seed always give the same rows, relative to `now`.
+Every Task gets:
+* a Frequency, taking each of the types in turn
+* `windows` Execution Windows, one per Frequency period going back from
+  now. The latest is OPEN and covers now, most of the rest were HIT and
+  the others MISSED
+* `executions` Executions spread over the windows' span, each belonging to
+  the HIT window it falls in, if any
+
+Rows go in with executemany on one connection, so filling is quick even
+for big databases. Run it on its own to build a database to poke at:
+
+    python benchmarks/synthetic.py bench.sqlite --tasks 1000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+
+from taskmaster.models import (Base, Execution, ExecutionWindow,
+                               ExecutionWindowStatusEnum, Frequency, Task,
+                               TaskFrequencyEnum)
+
+
+# How long each type of Frequency's windows are, near enough
+PERIODS = {
+    TaskFrequencyEnum.DAILY: timedelta(days=1),
+    TaskFrequencyEnum.WEEKLY: timedelta(days=7),
+    TaskFrequencyEnum.MONTHLY_DATE: timedelta(days=30),
+    TaskFrequencyEnum.MONTHLY_DAY: timedelta(days=30),
+}
+
+# Share of the past windows that were HIT, the rest were MISSED
+HIT_RATE = 0.8
+
+# Tasks whose rows are inserted together, with executemany
+TASKS_PER_BATCH = 1000
+
+
+def frequency_row(rng, task_id, frequency_type):
+    row = {'task_id': task_id, 'type': frequency_type, 'day_of_week': None,
+           'day_of_month': None, 'week_of_month': None}
+    if frequency_type == TaskFrequencyEnum.WEEKLY:
+        row['day_of_week'] = rng.randint(1, 7)
+    elif frequency_type == TaskFrequencyEnum.MONTHLY_DATE:
+        row['day_of_month'] = rng.randint(1, 31)
+    elif frequency_type == TaskFrequencyEnum.MONTHLY_DAY:
+        row['week_of_month'] = rng.choice([1, 2, 3, 4, -1])
+        row['day_of_week'] = rng.randint(1, 7)
+    return row
+
+
+def task_rows(rng, task_id, frequency_type, executions, windows, now,
+              first_window_id):
+    """(windows, executions) rows for one Task"""
+    period = PERIODS[frequency_type]
+    # The OPEN window starts somewhere in the period before now
+    latest_start = now - rng.random() * period
+    window_rows = []
+    for back in range(windows - 1, -1, -1):
+        start = latest_start - back * period
+        window_rows.append({
+            'id': first_window_id + len(window_rows),
+            'task_id': task_id,
+            'start': start,
+            'end': start + period,
+            'status': (ExecutionWindowStatusEnum.OPEN if back == 0
+                       else ExecutionWindowStatusEnum.HIT
+                       if rng.random() < HIT_RATE
+                       else ExecutionWindowStatusEnum.MISSED),
+        })
+
+    earliest = latest_start - max(windows - 1, 1) * period
+    span = (now - earliest).total_seconds()
+    execution_rows = []
+    for _ in range(executions):
+        executed_at = earliest + timedelta(seconds=rng.random() * span)
+        window = None
+        if windows:
+            index = int((executed_at - window_rows[0]['start']) / period)
+            if 0 <= index < windows:
+                window = window_rows[index]
+        execution_rows.append({
+            'task_id': task_id,
+            'executed_at': executed_at,
+            'execution_window_id': (
+                window['id'] if window is not None
+                and window['status'] == ExecutionWindowStatusEnum.HIT
+                else None),
+        })
+    execution_rows.sort(key=lambda row: row['executed_at'])
+    return window_rows, execution_rows
+
+
+def fill(connection, tasks, executions=10, windows=10, now=None, seed=0):
+    """Adds tasks Tasks to an empty database, each with executions
+    Executions and windows Execution Windows. Returns the Task ids"""
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    types = [*TaskFrequencyEnum]
+    task_ids = [*range(1, tasks + 1)]
+    pending = {Task: [], Frequency: [], ExecutionWindow: [], Execution: []}
+
+    def flush():
+        # Parents first, for the foreign keys
+        for model, rows in pending.items():
+            if rows:
+                connection.execute(insert(model), rows)
+                rows.clear()
+
+    window_id = 1
+    for task_id in task_ids:
+        frequency_type = types[(task_id - 1) % len(types)]
+        pending[Task].append({'id': task_id, 'name': f'Task {task_id}'})
+        pending[Frequency].append(frequency_row(rng, task_id,
+                                                frequency_type))
+        window_rows, execution_rows = task_rows(
+            rng, task_id, frequency_type, executions, windows, now,
+            window_id)
+        window_id += len(window_rows)
+        pending[ExecutionWindow].extend(window_rows)
+        pending[Execution].extend(execution_rows)
+        if len(pending[Task]) == TASKS_PER_BATCH:
+            flush()
+    flush()
+    return task_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('path', help='SQLite file to create')
+    parser.add_argument('--tasks', type=int, default=1000)
+    parser.add_argument('--executions', type=int, default=10,
+                        help='Per Task')
+    parser.add_argument('--windows', type=int, default=10, help='Per Task')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    engine = create_engine(f'sqlite:///{args.path}')
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        fill(connection, args.tasks, args.executions, args.windows,
+             seed=args.seed)
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
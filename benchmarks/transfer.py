@@ -0,0 +1,100 @@
+"""
+Times `taskmaster export` and `taskmaster import`, in rows per second, on a
+database filled by synthetic.py. The defaults make a million rows.
+
+Each format is exported to a file and imported into a fresh database,
+through the same functions the commands use. The peak memory of the
+process is printed at the end. Only a batch of rows is held in Python at a
+time, the rest is SQLite's page cache and memory mapped file, which level
+off at the cache_size and mmap_size settings.
+
+Run from the repository root with `python benchmarks/transfer.py`
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from synthetic import fill  # benchmarks/synthetic.py
+
+from taskmaster.database import dispose_engine, get_engine, init_db
+from taskmaster.taskmaster import export_records, import_records
+from taskmaster.transfer import FORMATS, read_records, write_records
+
+
+def use_database(path):
+    os.environ['TASKMASTER_DATABASE_URL'] = f'sqlite:///{path}'
+    dispose_engine()
+    init_db()
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def export_to(path, file_format):
+    with open(path, 'w', newline='') as f:
+        return write_records(export_records(), f, file_format)
+
+
+def import_from(path, file_format, batch_size):
+    with open(path, newline='') as f:
+        counts = import_records(read_records(f, file_format),
+                                batch_size=batch_size)
+    return sum(counts.values())
+
+
+def peak_memory_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB everywhere else
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tasks', type=int, default=20000)
+    parser.add_argument('--executions', type=int, default=24,
+                        help='Per Task')
+    parser.add_argument('--windows', type=int, default=24, help='Per Task')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Rows inserted per statement')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS,
+                        default=list(FORMATS))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_database(os.path.join(directory, 'source.sqlite'))
+        with get_engine().begin() as connection:
+            fill(connection, args.tasks, args.executions, args.windows,
+                 seed=args.seed)
+
+        results = []
+        for file_format in args.formats:
+            path = os.path.join(directory, f'dump.{file_format}')
+            use_database(os.path.join(directory, 'source.sqlite'))
+            rows, seconds = timed(export_to, path, file_format)
+            results.append(('export', file_format, rows, seconds,
+                            os.path.getsize(path)))
+
+            use_database(os.path.join(directory, f'{file_format}.sqlite'))
+            rows, seconds = timed(import_from, path, file_format,
+                                  args.batch_size)
+            results.append(('import', file_format, rows, seconds, None))
+        dispose_engine()
+
+    print(f'{"":<8}{"format":<8}{"rows":>10}{"seconds":>10}{"rows/s":>10}'
+          f'{"file MB":>10}')
+    for operation, file_format, rows, seconds, size in results:
+        size = f'{size / 2 ** 20:>10.1f}' if size is not None else ''
+        print(f'{operation:<8}{file_format:<8}{rows:>10}{seconds:>10.2f}'
+              f'{rows / seconds:>10.0f}{size}')
+    print(f'Peak memory: {peak_memory_mb():.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -48,6 +48,7 @@ echo "Moving files to $DEST_DIR and setting permissions on the remote host..."
 ssh "$REMOTE_HOST" << EOF
   sudo mkdir -p $DEST_DIR
   sudo cp -r $TEMP_DIR/* $DEST_DIR
+  cd $DEST_DIR && sudo python3 -m website.compile_templates
   sudo chown -R www-data:www-data $DEST_DIR
   sudo chmod -R 755 $DEST_DIR
   rm -r $TEMP_DIR
@@ -8,9 +8,17 @@ setup(
     install_requires=[
         'Click',
     ],
+    extras_require={
+        # The ASGI app, website/asgi.py
+        'async': [
+            'aiosqlite',
+            'uvicorn',
+        ],
+    },
     entry_points={
         'console_scripts': [
             'taskmaster = taskmaster.cli:cli',
+            'taskmaster-client = taskmaster.client:main',
         ],
     },
 )
\ No newline at end of file
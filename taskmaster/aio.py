@@ -0,0 +1,327 @@
+"""
+Async versions of the service functions in taskmaster.taskmaster, for the
+ASGI app in website/asgi.py.
+
+They use SQLAlchemy's async engine, over aiosqlite for SQLite, built from
+the same config as taskmaster.database. Reads run concurrently. SQLite only
+has one writer at a time, so writes take a lock first: a writer waiting its
+turn is then a suspended coroutine, rather than a connection spinning on
+busy_timeout while holding a pool slot.
+"""
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from sqlalchemy import and_, event, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from taskmaster.archive import has_archive
+from taskmaster.cache import (MISSING, get_cache, has_written,
+                              invalidate_on_commit)
+from taskmaster.database import (_as_bool, _is_memory_database,
+                                 _sqlite_pragma_listener, get_config)
+from taskmaster.events import (EVENT_BATCH_SIZE, event_ids_query,
+                               events_query, missed_events, record_execution,
+                               record_execution_window)
+from taskmaster.models import (DailyFrequency, Execution, ExecutionWindow,
+                               ExecutionWindowStatusEnum, Task)
+from taskmaster.rollups import add_to_rollups, new_window_changes
+from taskmaster.taskmaster import (TaskNotFound, dashboard_query,
+                                   execution_windows_query, executions_query,
+                                   rollups_query, stats_query)
+
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_url(url):
+    """The config's database URL, with the async driver for its backend"""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    return url.set(drivername=driver) if driver else url
+
+
+def create_async_engine_from_config(config=None):
+    config = get_config() if config is None else config
+    url = config['database_url']
+
+    engine_kwargs = {'echo': _as_bool(config['echo'])}
+    if not _is_memory_database(url):
+        # aiosqlite would otherwise open a connection (and a thread) for
+        # every checkout, so pool them like the sync engine does
+        engine_kwargs.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=int(config['pool_size']),
+            max_overflow=int(config['max_overflow']),
+            pool_timeout=int(config['pool_timeout']),
+            pool_recycle=int(config['pool_recycle']),
+        )
+
+    engine = create_async_engine(async_url(url), **engine_kwargs)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine.sync_engine, 'connect',
+                     _sqlite_pragma_listener(config))
+    return engine
+
+
+_engine = None
+
+AsyncSessionLocal = async_sessionmaker(autoflush=False,
+                                       expire_on_commit=False)
+
+# asyncio.Locks belong to one event loop, so there's one per loop
+_write_locks = weakref.WeakKeyDictionary()
+
+
+def get_async_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine_from_config()
+        AsyncSessionLocal.configure(bind=_engine)
+    return _engine
+
+
+async def dispose_async_engine():
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+
+def _write_lock():
+    loop = asyncio.get_running_loop()
+    lock = _write_locks.get(loop)
+    if lock is None:
+        lock = _write_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def _take_write_lock(session):
+    """Waits for the write lock, unless session already holds it"""
+    if 'write_lock' not in session.info:
+        lock = _write_lock()
+        await lock.acquire()
+        session.info['write_lock'] = lock
+
+
+@asynccontextmanager
+async def unit_of_work(session=None, write=False):
+    """Async taskmaster.database.unit_of_work. Pass write=True for work that
+    writes, so it waits for any other writer in this process to finish.
+
+    The lock is taken when write work starts, even inside a session that's
+    been passed in, and held until the outermost unit of work commits or
+    rolls back. Reads before then don't wait for other writers"""
+    if session is not None:
+        if write:
+            await _take_write_lock(session)
+        yield session
+        return
+
+    get_async_engine()
+    async with AsyncSessionLocal() as session:
+        try:
+            if write:
+                await _take_write_lock(session)
+            yield session
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
+        finally:
+            lock = session.info.pop('write_lock', None)
+            if lock is not None:
+                lock.release()
+
+
+async def _cached(session, key, load):
+    """Async taskmaster.cache.cached, load is a coroutine function"""
+    cache = get_cache()
+    if cache is None or has_written(session.sync_session):
+        return await load()
+    value = cache.get(key)
+    if value is MISSING:
+        value = await load()
+        cache.set(key, value)
+        return value
+    if isinstance(value, list):
+        return [await session.merge(item, load=False) for item in value]
+    return await session.merge(value, load=False)
+
+
+async def get_tasks(session=None):
+    async with unit_of_work(session) as session:
+        async def load():
+            return [*await session.scalars(select(Task))]
+        return await _cached(session, 'tasks', load)
+
+
+async def iter_tasks(limit=None, after=None, name=None, session=None):
+    """Async taskmaster.taskmaster.iter_tasks, returns a list of (id, name)
+    rows"""
+    query = select(Task.id, Task.name).order_by(Task.id)
+    if after is not None:
+        query = query.where(Task.id > after)
+    if name:
+        query = query.where(Task.name.icontains(name, autoescape=True))
+    if limit is not None:
+        query = query.limit(limit)
+    async with unit_of_work(session) as session:
+        return (await session.execute(query)).all()
+
+
+async def create_task(name, session=None):
+    task = Task(name=name)
+    task.frequency = DailyFrequency()
+    async with unit_of_work(session, write=True) as session:
+        session.add(task)
+        await session.flush()
+        invalidate_on_commit(session.sync_session, 'tasks')
+        return task
+
+
+async def get_task(task_id, session=None):
+    """Loads the Task and its Frequency"""
+    async with unit_of_work(session) as session:
+        async def load():
+            return (await session.scalars(
+                select(Task).options(joinedload(Task.frequency))
+                .where(Task.id == task_id))).one()
+        try:
+            return await _cached(session, f'task:{task_id}', load)
+        except NoResultFound:
+            raise TaskNotFound(task_id)
+
+
+async def execute_task(task_id, session=None):
+    """Creates an execution, also marks any open execution window as hit"""
+    current_time = datetime.utcnow()
+    async with unit_of_work(session, write=True) as session:
+        hit_execution_window = (await session.scalars(
+            select(ExecutionWindow).where(and_(
+                ExecutionWindow.task_id == task_id,
+                ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
+                ExecutionWindow.start <= current_time,
+                ExecutionWindow.end > current_time))
+            .order_by(ExecutionWindow.start).limit(1))).one_or_none()
+        if hit_execution_window:
+            hit_execution_window.status = ExecutionWindowStatusEnum.HIT
+        # Lazy loading isn't possible in async code, so the window is always
+        # set, even to None
+        execution = Execution(task_id=task_id, executed_at=current_time,
+                              execution_window=hit_execution_window)
+        session.add(execution)
+        await session.flush()
+        invalidate_on_commit(session.sync_session, f'task:{task_id}')
+        record_execution(session.sync_session, execution.id, task_id,
+                         current_time, execution.execution_window_id)
+        changes = [(task_id, current_time, 'executions')]
+        if hit_execution_window:
+            _record_execution_window(session, hit_execution_window)
+            changes.append((task_id, hit_execution_window.start,
+                            'windows_hit'))
+        await session.run_sync(add_to_rollups, changes)
+        return execution
+
+
+async def get_executions(task_id, limit=None, since=None, before=None,
+                         include_archived=False, session=None):
+    """Async taskmaster.taskmaster.get_executions, returns a list"""
+    async with unit_of_work(session) as session:
+        archived = include_archived and await session.run_sync(has_archive)
+        query = executions_query(task_id, since, before, archived)
+        if limit is not None:
+            query = query.limit(limit)
+        return [*await session.scalars(query)]
+
+
+async def get_execution_windows(task_id, limit=None, since=None, before=None,
+                                include_archived=False, session=None):
+    """Async taskmaster.taskmaster.get_execution_windows, returns a list"""
+    async with unit_of_work(session) as session:
+        archived = include_archived and await session.run_sync(has_archive)
+        query = execution_windows_query(task_id, since, before, archived)
+        if limit is not None:
+            query = query.limit(limit)
+        return [*await session.scalars(query)]
+
+
+async def check_if_execution_window_overlaps(task, execution_window,
+                                             session=None):
+    async with unit_of_work(session) as session:
+        return (await session.scalars(
+            select(ExecutionWindow)
+            .where(and_(
+                ExecutionWindow.task_id == task.id,
+                ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
+                ExecutionWindow.start < execution_window.end,
+                ExecutionWindow.end > execution_window.start))
+            .order_by(ExecutionWindow.start.desc())
+            .limit(1))).one_or_none()
+
+
+async def add_execution_window(execution_window, session=None):
+    async with unit_of_work(session, write=True) as session:
+        session.add(execution_window)
+        await session.flush()
+        invalidate_on_commit(session.sync_session,
+                             f'task:{execution_window.task_id}')
+        _record_execution_window(session, execution_window)
+        await session.run_sync(add_to_rollups,
+                               new_window_changes(execution_window))
+
+
+def _record_execution_window(session, execution_window):
+    record_execution_window(session.sync_session, execution_window.id,
+                            execution_window.task_id, execution_window.start,
+                            execution_window.end, execution_window.status)
+
+
+async def get_dashboard(now=None, windows=20, executions=20, session=None):
+    """Async taskmaster.taskmaster.get_dashboard, returns a list"""
+    query = dashboard_query(now or datetime.utcnow(), windows, executions)
+    async with unit_of_work(session) as session:
+        return (await session.execute(query)).all()
+
+
+async def get_stats(task_id=None, period=None, since=None, until=None,
+                    session=None):
+    """Async taskmaster.taskmaster.get_stats, returns a list"""
+    async with unit_of_work(session) as session:
+        if task_id is not None:
+            await get_task(task_id, session=session)
+        return (await session.execute(
+            stats_query(task_id, period, since, until))).all()
+
+
+async def get_rollups(task_id=None, period='day', since=None, until=None,
+                      session=None):
+    """Async taskmaster.taskmaster.get_rollups, returns a list"""
+    async with unit_of_work(session) as session:
+        if task_id is not None:
+            await get_task(task_id, session=session)
+        return (await session.execute(
+            rollups_query(task_id, period, since, until))).all()
+
+
+async def get_events(last_id, limit=EVENT_BATCH_SIZE, session=None):
+    """Async taskmaster.events.get_events"""
+    async with unit_of_work(session) as session:
+        oldest, newest = (await session.execute(event_ids_query())).one()
+        if missed_events(last_id, oldest, newest):
+            return [], newest or 0
+        rows = await session.execute(events_query(last_id, limit))
+        return rows.all(), None
+
+
+async def get_latest_event_id(session=None):
+    """Async taskmaster.events.get_latest_event_id"""
+    async with unit_of_work(session) as session:
+        return (await session.execute(event_ids_query())).one()[1] or 0
@@ -0,0 +1,99 @@
+"""
+Old history can be moved out of the executions and execution_windows tables
+into a second SQLite file, the archive, so the hot tables (and their pages
+in the cache) only hold what's still being used.
+
+With archive_path set, taskmaster.database ATTACHes the archive to every
+connection as the `archive` schema. The archived tables have the same
+columns as the hot ones, without their foreign keys, which SQLite can't
+have across files. Rows keep their ids when they move, so history can be
+read from both at once with history(), which is what the functions in
+taskmaster.taskmaster do when they're passed include_archived=True.
+Everything else only ever reads the hot tables. The daily rollups count
+the archived history too.
+
+taskmaster.taskmaster.archive_history does the moving.
+"""
+from sqlalchemy import (Column, Index, MetaData, Table, exists, select, text,
+                        union_all)
+from sqlalchemy.orm import aliased
+
+from taskmaster.models import Execution, ExecutionWindow
+
+
+ARCHIVE_SCHEMA = 'archive'
+
+archive_metadata = MetaData(schema=ARCHIVE_SCHEMA)
+
+
+def _archive_table(model, *index_columns):
+    """A table with model's columns in the archive, indexed for reading one
+    Task's history in time order"""
+    table = model.__table__
+    return Table(
+        table.name, archive_metadata,
+        *(Column(column.name, column.type, primary_key=column.primary_key,
+                 nullable=column.nullable)
+          for column in table.columns),
+        Index(f'ix_archived_{table.name}_{"_".join(index_columns)}',
+              *index_columns))
+
+
+archived_executions = _archive_table(Execution, 'task_id', 'executed_at')
+archived_execution_windows = _archive_table(
+    ExecutionWindow, 'task_id', 'start')
+
+ARCHIVED_TABLES = {
+    Execution: archived_executions,
+    ExecutionWindow: archived_execution_windows,
+}
+
+
+def attach_statement(archive_path):
+    """The SQL and parameters the connect listener runs"""
+    return f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (archive_path,)
+
+
+def is_attached(connection):
+    """Whether the archive is attached to a Connection, or a Session's"""
+    return any(row.name == ARCHIVE_SCHEMA for row
+               in connection.execute(text('PRAGMA database_list')))
+
+
+def has_archive(session):
+    """Whether the archive is attached and has its tables, so there may be
+    archived history to read"""
+    if not is_attached(session):
+        return False
+    found = session.execute(
+        text(f'SELECT count(*) FROM {ARCHIVE_SCHEMA}.sqlite_master '
+             'WHERE type = :type AND name IN (:executions, :windows)'),
+        {'type': 'table', 'executions': archived_executions.name,
+         'windows': archived_execution_windows.name}).scalar()
+    return found == len(ARCHIVED_TABLES)
+
+
+def create_archive(connection):
+    """Creates the archived tables, if they aren't there already"""
+    archive_metadata.create_all(connection)
+
+
+def history_table(model):
+    """A subquery of model's (Execution's or ExecutionWindow's) hot and
+    archived rows together, with the same columns as its table.
+
+    A row is in both tables for a moment while it's being archived, so
+    archived rows that are still hot are left out"""
+    table = model.__table__
+    archived = ARCHIVED_TABLES[model]
+    return union_all(
+        select(table),
+        select(archived).where(
+            ~exists().where(table.c.id == archived.c.id)),
+    ).subquery(table.name)
+
+
+def history(model):
+    """An alias of model over history_table, to query like the model
+    itself"""
+    return aliased(model, history_table(model))
@@ -0,0 +1,284 @@
+"""
+An optional read-through cache for the lookups in taskmaster.taskmaster.
+
+It's off unless a backend is configured with TASKMASTER_CACHE_BACKEND:
+* memory - an LRU with a TTL, private to the process
+* sqlite - the same bounds, kept in a SQLite file at TASKMASTER_CACHE_PATH
+  so that every gunicorn worker on the machine shares it
+
+Values are pickled on the way in, so whatever is cached is a snapshot that
+later changes to the loaded objects can't disturb. Writes record the keys
+they affect on the Session, and those keys are invalidated once the
+Session commits. A Session that has written skips the cache until its
+transaction ends, so nothing uncommitted is ever cached. A reader racing a
+writer can still put back a value from just before the commit, the TTL is
+what bounds how long that can live.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from taskmaster.database import get_config
+
+
+MISSING = object()
+
+
+class MemoryBackend:
+    """In-process LRU with a TTL, safe to share between threads"""
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """An LRU with a TTL in a SQLite file, shared by every process that
+    opens the same path"""
+
+    def __init__(self, path, max_entries=1024, ttl=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._local = threading.local()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+            'value BLOB NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)')
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads, or with a
+        # forked child
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT value, expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return MISSING
+        value, expires = row
+        if expires < now:
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+            self.evictions += 1
+            return MISSING
+        connection.execute('UPDATE cache SET used = ? WHERE key = ?',
+                           (now, key))
+        return value
+
+    def set(self, key, value):
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, used) '
+            'VALUES (?, ?, ?, ?)', (key, value, now + self.ttl, now))
+        evicted = connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY used DESC LIMIT -1 OFFSET ?)', (self.max_entries,)
+        ).rowcount
+        self.evictions += max(evicted, 0)
+
+    def delete(self, keys):
+        self._connection().executemany(
+            'DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT count(*) FROM cache').fetchone()[0]
+
+
+class Cache:
+    """Read-through cache over a backend, counting hits and misses"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """The cached value, or MISSING"""
+        value = self.backend.get(key)
+        if value is MISSING:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return pickle.loads(value)
+
+    def set(self, key, value):
+        self.backend.set(key, pickle.dumps(value))
+
+    def get_or_load(self, key, load):
+        value = self.get(key)
+        if value is MISSING:
+            value = load()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, keys):
+        self.backend.delete(keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'entries': len(self.backend),
+        }
+
+
+_cache = MISSING
+
+
+def get_cache():
+    """The configured Cache, or None if caching is off"""
+    global _cache
+    if _cache is MISSING:
+        _cache = _cache_from_config(get_config())
+    return _cache
+
+
+def configure_cache(cache):
+    """Replaces the configured Cache, None turns caching off"""
+    global _cache
+    _cache = cache
+
+
+def cache_stats():
+    """The configured Cache's stats, for the API. The counts are this
+    process's, only entries is shared through the sqlite backend"""
+    cache = get_cache()
+    if cache is None:
+        return {'enabled': False}
+    return {'enabled': True, 'process': os.getpid(), **cache.stats()}
+
+
+def _cache_from_config(config):
+    backend = config['cache_backend'].strip().lower()
+    max_entries = int(config['cache_max_entries'])
+    ttl = float(config['cache_ttl'])
+    if not backend or backend == 'none':
+        return None
+    if backend == 'memory':
+        return Cache(MemoryBackend(max_entries=max_entries, ttl=ttl))
+    if backend == 'sqlite':
+        return Cache(SQLiteBackend(config['cache_path'],
+                                   max_entries=max_entries, ttl=ttl))
+    raise ValueError(f'Unknown cache backend {backend}')
+
+
+def has_written(session):
+    """Whether the Session's transaction has written anything, or is about
+    to. What it reads from then on may never be committed, and the cache
+    may be out of date for it, so the cache is left alone"""
+    return bool(session.info.get('cache_wrote') or session.new
+                or session.dirty or session.deleted)
+
+
+def cached(session, key, load):
+    """Returns the cached value for key, loading it on a miss. Cached ORM
+    objects come back merged into the Session, without touching the
+    database"""
+    cache = get_cache()
+    if cache is None or has_written(session):
+        return load()
+    value = cache.get_or_load(key, load)
+    if isinstance(value, list):
+        return [session.merge(item, load=False) for item in value]
+    return session.merge(value, load=False)
+
+
+def invalidate_on_commit(session, *keys):
+    """Drops the keys from the cache once the Session's transaction commits"""
+    if get_cache() is not None:
+        session.info.setdefault('cache_invalidations', set()).update(keys)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    keys = session.info.pop('cache_invalidations', None)
+    cache = get_cache()
+    if keys and cache is not None:
+        cache.invalidate(keys)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_invalidations(session, previous_transaction):
+    session.info.pop('cache_invalidations', None)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_flush(session, flush_context):
+    session.info['cache_wrote'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_write(orm_execute_state):
+    """INSERTs, UPDATEs and DELETEs run with Session.execute skip the
+    flush"""
+    if (orm_execute_state.is_insert or orm_execute_state.is_update
+            or orm_execute_state.is_delete):
+        orm_execute_state.session.info['cache_wrote'] = True
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _forget_writes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('cache_wrote', None)
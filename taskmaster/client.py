@@ -0,0 +1,102 @@
+"""
+A thin client for the daemon in taskmaster.daemon. It only uses the
+standard library, so it starts in about the time Python itself does, then
+forwards its arguments to the daemon and prints what comes back.
+
+    taskmaster-client tasks list
+
+If no daemon is listening it runs the command itself, like `taskmaster`.
+The socket is TASKMASTER_DAEMON_SOCKET, or ./taskmaster-cli.sock. Unlike
+the daemon the client doesn't read TASKMASTER_CONFIG, which would mean
+importing the whole of taskmaster.
+
+It also runs the command itself if the daemon was started with different
+TASKMASTER_ variables or in a different directory, as the daemon would use
+another database or config, and for commands that run until they're
+stopped, like `windows sweep --loop`, as the daemon only replies once a
+command has finished.
+"""
+import base64
+import json
+import os
+import socket
+import sys
+
+
+DEFAULT_SOCKET = './taskmaster-cli.sock'
+
+# Options that keep a command running until it's stopped
+RUNS_UNTIL_STOPPED = ('--loop',)
+
+
+class DaemonNotRunning(Exception):
+    pass
+
+
+class DaemonEnvironmentDiffers(Exception):
+    pass
+
+
+def environment(environ=None):
+    """What a command's behaviour depends on, other than its arguments: the
+    TASKMASTER_ variables, bar the socket, and the working directory that
+    relative paths in them are from"""
+    environ = os.environ if environ is None else environ
+    return {
+        'cwd': os.getcwd(),
+        'environ': {key: value for key, value in environ.items()
+                    if key.startswith('TASKMASTER_')
+                    and key != 'TASKMASTER_DAEMON_SOCKET'},
+    }
+
+
+def runs_until_stopped(argv):
+    return any(option in argv for option in RUNS_UNTIL_STOPPED)
+
+
+def send_command(argv, stdin=None, color=False, path=None):
+    """Runs argv on the daemon, returning (exit code, output).
+    stdin -- binary file to answer the command's reads from"""
+    path = path or os.environ.get('TASKMASTER_DAEMON_SOCKET', DEFAULT_SOCKET)
+    with socket.socket(socket.AF_UNIX) as connection:
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise DaemonNotRunning(path)
+        with connection.makefile('rwb') as stream:
+            _send(stream, {'argv': argv, 'color': color, **environment()})
+            while True:
+                message = json.loads(stream.readline())
+                if message.get('environment_differs'):
+                    raise DaemonEnvironmentDiffers(path)
+                if 'read' not in message:
+                    return message['exit_code'], message['output']
+                data = stdin.read1(message['read']) if stdin else b''
+                _send(stream, {'data': base64.b64encode(data).decode()})
+
+
+def _send(stream, message):
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if runs_until_stopped(argv):
+        return _run_here(argv)
+    try:
+        exit_code, output = send_command(argv, stdin=sys.stdin.buffer,
+                                         color=sys.stdout.isatty())
+    except (DaemonNotRunning, DaemonEnvironmentDiffers):
+        return _run_here(argv)
+    sys.stdout.write(output)
+    return exit_code
+
+
+def _run_here(argv):
+    from taskmaster.cli import cli
+    return cli.main(argv, prog_name='taskmaster')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
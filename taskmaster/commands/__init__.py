@@ -0,0 +1,17 @@
+"""
+The CLI's commands, one module per group, loaded by taskmaster.cli when
+they're first used. What they share lives here
+"""
+import click
+
+from taskmaster.utils import parse_datetime
+
+
+def validate_datetime(ctx, param, value):
+    """Accepts the fuzzy formats, or a full ISO 8601 timestamp for paging"""
+    if value is None:
+        return None
+    try:
+        return parse_datetime(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
@@ -0,0 +1,61 @@
+"""
+The `taskmaster execute-batch` command, for recording Executions in bulk
+"""
+import csv
+import json
+from itertools import islice
+
+import click
+
+from taskmaster.cli import get_session
+from taskmaster.taskmaster import TaskNotFound, execute_tasks
+from taskmaster.utils import parse_datetime
+
+
+def _read_execution_records(records_file, file_format):
+    """Yields (task_id, executed_at) from JSONL objects or CSV rows with
+    task_id and optional executed_at fields"""
+    if file_format == 'csv':
+        rows = enumerate(csv.DictReader(records_file), start=2)
+    else:
+        rows = ((number, json.loads(line))
+                for number, line in enumerate(records_file, start=1)
+                if line.strip())
+    for number, row in rows:
+        try:
+            executed_at = row.get('executed_at')
+            yield (int(row['task_id']),
+                   parse_datetime(executed_at) if executed_at else None)
+        except (KeyError, TypeError, ValueError) as e:
+            raise click.ClickException(
+                f'Invalid record on line {number}: {e!r}')
+
+
+@click.command('execute-batch')
+@click.argument('records_file', type=click.File('r'), default='-')
+@click.option('--format', 'file_format', type=click.Choice(['jsonl', 'csv']),
+              help='Defaults to csv for .csv files and jsonl otherwise.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=5000,
+              show_default=True, help='Records matched per query.')
+@click.pass_context
+def execute_batch(ctx, records_file, file_format, batch_size):
+    """Record many Executions at once from RECORDS_FILE (default stdin).
+
+    Each record needs a task_id and can have an executed_at in UTC
+    (YYYY-MM-DD HH:mm or ISO 8601), otherwise it's now. Everything is
+    recorded in one transaction, or nothing is."""
+    if file_format is None:
+        file_format = 'csv' if records_file.name.endswith('.csv') else 'jsonl'
+    session = get_session(ctx)
+    records = _read_execution_records(records_file, file_format)
+    total_executions = total_hits = 0
+    try:
+        while chunk := [*islice(records, batch_size)]:
+            executions, hits = execute_tasks(chunk, session=session)
+            total_executions += executions
+            total_hits += hits
+    except TaskNotFound as e:
+        click.echo(e)
+        raise click.Abort()
+    click.echo(f'Added {total_executions} Executions, hitting {total_hits} \
+Execution Windows')
@@ -0,0 +1,44 @@
+"""
+The commands that look after the database itself, `taskmaster init-db` and
+`taskmaster archive`
+"""
+from datetime import datetime, timedelta
+
+import click
+
+from taskmaster.database import init_db, vacuum
+from taskmaster.taskmaster import ArchiveNotAttached, archive_history
+
+
+@click.command('init-db')
+def init_database():
+    """Create any missing database tables."""
+    init_db()
+    click.echo('Database initialised')
+
+
+@click.command()
+@click.option('--older-than', 'days', type=click.IntRange(min=1),
+              default=365, show_default=True,
+              help='Archive history from more than this many days ago.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=1000,
+              show_default=True, help='Rows moved per transaction.')
+@click.option('--vacuum', 'shrink', is_flag=True,
+              help='Shrink the database file afterwards.')
+def archive(days, batch_size, shrink):
+    """Move old history into the archive database.
+
+    Executions, and Execution Windows that are no longer open, move to the
+    SQLite file named by the archive_path setting. Other commands leave
+    archived history out unless asked for it."""
+    before = datetime.utcnow() - timedelta(days=days)
+    try:
+        executions, windows = archive_history(before, batch_size=batch_size)
+    except ArchiveNotAttached as e:
+        click.echo(e)
+        raise click.Abort()
+    click.echo(f'Archived {executions} Executions and {windows} Execution \
+Windows from before {before:%Y-%m-%d %H:%M}')
+    if shrink:
+        vacuum()
+        click.echo('Database vacuumed')
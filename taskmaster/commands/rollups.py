@@ -0,0 +1,68 @@
+"""
+The `taskmaster rollups` commands, for the daily counts in
+taskmaster.rollups
+"""
+import click
+
+from taskmaster.cli import get_session
+from taskmaster.commands import validate_datetime
+from taskmaster.taskmaster import (STATS_PERIODS, TaskNotFound, get_rollups,
+                                   rebuild_rollups)
+
+
+@click.group()
+def rollups():
+    """Daily counts of Executions and Execution Windows."""
+    pass
+
+
+@click.command()
+@click.option('--task', 'task_id', type=int, help='Only this Task.')
+@click.option('--period', type=click.Choice([*STATS_PERIODS]), default='day',
+              show_default=True)
+@click.option('--since', callback=validate_datetime,
+              help='Only from this date (YYYY-MM-DD).')
+@click.option('--until', callback=validate_datetime,
+              help='Only before this date (YYYY-MM-DD).')
+@click.pass_context
+def show(ctx, task_id, period, since, until):
+    """Show the counts for each Task and period."""
+    rows = get_rollups(task_id=task_id, period=period,
+                       since=since and since.date(),
+                       until=until and until.date(),
+                       session=get_session(ctx))
+    line = '{:<24} {:<10} {:>10} {:>7} {:>5} {:>6}'
+    shown = 0
+    try:
+        for row in rows:
+            if not shown:
+                click.echo(line.format('Task', 'Period', 'Executions',
+                                       'Windows', 'Hit', 'Missed'))
+            shown += 1
+            click.echo(line.format(
+                f'{row.task_id} - {row.name}'[:24], row.period,
+                row.executions, row.windows, row.windows_hit,
+                row.windows_missed))
+    except TaskNotFound as e:
+        click.echo(e)
+        raise click.Abort()
+    if not shown:
+        click.echo('Nothing counted yet')
+
+
+rollups.add_command(show)
+
+
+@click.command()
+@click.option('--task', 'task_id', type=int, help='Only this Task.')
+@click.pass_context
+def rebuild(ctx, task_id):
+    """Recount the rollups from the Executions and Execution Windows.
+
+    Needed once to backfill an existing database, and after any rows are
+    changed by something other than TaskMaster itself."""
+    count = rebuild_rollups(task_id=task_id, session=get_session(ctx))
+    click.echo(f'Rebuilt {count} daily rollups')
+
+
+rollups.add_command(rebuild)
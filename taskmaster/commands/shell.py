@@ -0,0 +1,60 @@
+"""
+The commands for running lots of other commands in one process
+"""
+import shlex
+
+import click
+
+from taskmaster.cli import cli
+from taskmaster.daemon import NOT_SERVED, serve, socket_path
+
+
+@click.command()
+def shell():
+    """Run commands one after another in a single process."""
+    try:
+        import readline  # noqa: F401 - gives input() history and editing
+    except ImportError:
+        pass
+    click.echo('TaskMaster shell, type help for the commands or exit to '
+               'leave')
+    while True:
+        try:
+            line = input('taskmaster> ')
+        except EOFError:
+            click.echo()
+            return
+        except KeyboardInterrupt:
+            click.echo()
+            continue
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            click.echo(e)
+            continue
+        if not argv:
+            continue
+        if argv[0] in ('exit', 'quit'):
+            return
+        if argv[0] == 'help':
+            argv = ['--help']
+        if argv[0] in NOT_SERVED:
+            click.echo(f'{argv[0]} can\'t be run from the shell')
+            continue
+        # Each line is an invocation of its own, in its own unit of work
+        try:
+            cli.main(argv, prog_name='taskmaster', standalone_mode=False)
+        except click.Abort:
+            click.echo('Aborted!')
+        except click.ClickException as e:
+            e.show()
+
+
+@click.command()
+@click.option('--socket', 'path',
+              help='Unix socket to listen on, instead of the configured one.')
+def daemon(path):
+    """Serve commands to taskmaster-client over a Unix socket."""
+    path = path or socket_path()
+    click.echo(f'Serving TaskMaster commands on {path}')
+    serve(cli, path)
@@ -0,0 +1,64 @@
+"""
+The `taskmaster stats` command, for how well Tasks are kept up
+"""
+import click
+
+from taskmaster.cli import get_session
+from taskmaster.commands import validate_datetime
+from taskmaster.taskmaster import STATS_PERIODS, TaskNotFound, get_stats
+
+
+def _percentage(value):
+    return '-' if value is None else f'{value:.0%}'
+
+
+def _duration(seconds):
+    """Lateness to the minute, like 1d 2h 5m"""
+    if seconds is None:
+        return '-'
+    minutes = round(seconds / 60)
+    sign = '-' if minutes < 0 else ''
+    days, minutes = divmod(abs(minutes), 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    parts = [f'{value}{unit}' for value, unit in
+             ((days, 'd'), (hours, 'h')) if value]
+    return sign + ' '.join([*parts, f'{minutes}m'])
+
+
+@click.command()
+@click.option('--task', 'task_id', type=int, help='Only this Task.')
+@click.option('--period', type=click.Choice([*STATS_PERIODS]),
+              help='Break the stats down by when the windows start.')
+@click.option('--since', callback=validate_datetime,
+              help='Only windows starting from this date '
+              '(YYYY-MM-DD[ HH:mm]).')
+@click.option('--until', callback=validate_datetime,
+              help='Only windows starting before this date.')
+@click.pass_context
+def stats(ctx, task_id, period, since, until):
+    """Show how well Tasks are kept up.
+
+    Adherence is the share of the closed Execution Windows that were hit,
+    the streaks count hit windows in a row, and lateness is how long after
+    a window started the Execution that hit it came."""
+    rows = get_stats(task_id=task_id, period=period, since=since,
+                     until=until, session=get_session(ctx))
+    columns = ('Task', 'Period', 'Hit', 'Missed', 'Skipped', 'Open',
+               'Adherence', 'Streak', 'Longest', 'Mean lateness')
+    line = '{:<24} {:<10} {:>5} {:>6} {:>7} {:>4} {:>9} {:>6} {:>7} {:>13}'
+    shown = 0
+    try:
+        for row in rows:
+            if not shown:
+                click.echo(line.format(*columns))
+            shown += 1
+            click.echo(line.format(
+                f'{row.task_id} - {row.name}'[:24], row.period or 'all',
+                row.hit, row.missed, row.skipped, row.open,
+                _percentage(row.adherence), row.current_streak,
+                row.longest_streak, _duration(row.mean_lateness)))
+    except TaskNotFound as e:
+        click.echo(e)
+        raise click.Abort()
+    if not shown:
+        click.echo('No Execution Windows to report on')
@@ -0,0 +1,301 @@
+"""
+The `taskmaster task TASK_ID` commands, for working with one Task
+"""
+from datetime import datetime, timedelta
+
+import click
+
+from taskmaster.cli import get_session
+from taskmaster.commands import validate_datetime
+from taskmaster.database import unit_of_work
+from taskmaster.models import (DailyFrequency, ExecutionWindow,
+                               MonthlyDateFrequency, MonthlyDayFrequency,
+                               TaskFrequencyEnum, WeeklyFrequency)
+from taskmaster.recurrence import LAST_WEEK_OF_MONTH
+from taskmaster.taskmaster import (FrequencyNotFound, TaskNotFound,
+                                   add_execution_window,
+                                   check_if_execution_window_overlaps,
+                                   edit_task, execute_task,
+                                   generate_next_execution_window,
+                                   get_execution_windows, get_executions,
+                                   get_frequency_by_task_id, get_task,
+                                   replace_frequency)
+from taskmaster.utils import fuzzy_datetime_validator, parse_datetime
+
+
+def _commit_before_prompting(session):
+    """SQLite has a single writer, so don't sit on the write lock while
+    waiting for a human to answer a prompt"""
+    if session is not None:
+        session.commit()
+
+
+@click.group()
+@click.argument('task_id')
+@click.pass_context
+def task(ctx, task_id):
+    """Work with the Task with ID TASK_ID."""
+    try:
+        task = get_task(task_id, session=get_session(ctx))
+        ctx.ensure_object(dict)['task'] = task
+        click.echo(f'Task {task.id} - {task.name}')
+    except TaskNotFound as e:
+        click.echo(e)
+        raise click.Abort()
+
+
+def _validate_cursor(ctx, param, value):
+    """Keyset cursors for history look like <ISO datetime>,<id>, as in the
+    API"""
+    if value is None:
+        return None
+    try:
+        at, _, row_id = value.rpartition(',')
+        return parse_datetime(at), int(row_id)
+    except ValueError:
+        raise click.BadParameter('must look like <datetime>,<id>')
+
+
+def _format_cursor(cursor):
+    at, row_id = cursor
+    return f'{at.isoformat()},{row_id}'
+
+
+@click.command()
+@click.option('--limit', type=click.IntRange(min=1), default=20,
+              show_default=True,
+              help='How many Execution Windows and Executions to show.')
+@click.option('--since', callback=validate_datetime,
+              help='Only show history from this date (YYYY-MM-DD[ HH:mm]).')
+@click.option('--before', callback=validate_datetime,
+              help='Only show history before this date (YYYY-MM-DD[ HH:mm]).')
+@click.option('--windows-before', callback=_validate_cursor,
+              help='Only show Execution Windows before this cursor, as '
+              'printed for the next page.')
+@click.option('--executions-before', callback=_validate_cursor,
+              help='Only show Executions before this cursor, as printed for '
+              'the next page.')
+@click.option('--archived', is_flag=True,
+              help='Include history moved to the archive.')
+@click.pass_context
+def show(ctx, limit, since, before, windows_before, executions_before,
+         archived):
+    """Show the Frequency and the latest history of a Task."""
+    task = ctx.obj['task']
+    session = get_session(ctx)
+    # Keyset cursors compare on (datetime, id), and 0 sorts before every id
+    date_cursor = (before, 0) if before else None
+    windows_cursor = windows_before or date_cursor
+    executions_cursor = executions_before or date_cursor
+
+    click.echo()
+    click.echo('Frequency:')
+    click.echo(task.frequency.type)
+    click.echo()
+    click.echo('Execution Windows (latest first):')
+    count = 0
+    for execution_window in get_execution_windows(
+            task.id, limit=limit, since=since, before=windows_cursor,
+            include_archived=archived, session=session):
+        start = execution_window.start.strftime("%Y-%m-%d %H:%M")
+        end = execution_window.end.strftime("%Y-%m-%d %H:%M")
+        click.echo(f'{execution_window.id} - {start} to {end} - ', nl=False)
+        click.secho(execution_window.status.value.upper(), fg='green')
+        windows_cursor = (execution_window.start, execution_window.id)
+        count += 1
+    more = count == limit
+    click.echo()
+    click.echo('Executions (latest first):')
+    count = 0
+    for execution in get_executions(task.id, limit=limit, since=since,
+                                    before=executions_cursor,
+                                    include_archived=archived,
+                                    session=session):
+        click.echo(f'{execution.executed_at.strftime("%Y-%m-%d %H:%M")}')
+        executions_cursor = (execution.executed_at, execution.id)
+        count += 1
+    more = more or count == limit
+
+    if more:
+        # Each section carries on from its own last row, so rows sharing a
+        # datetime are neither skipped nor repeated. A section that's run
+        # out carries on from its end, and shows nothing more
+        options = []
+        if since:
+            options.append(f'--since "{since.isoformat(sep=" ")}"')
+        for name, cursor in (('--windows-before', windows_cursor),
+                             ('--executions-before', executions_cursor)):
+            if cursor is not None:
+                options.append(f'{name} "{_format_cursor(cursor)}"')
+        if archived:
+            options.append('--archived')
+        click.echo()
+        click.echo(f'Older history: taskmaster task {task.id} show '
+                   f'{" ".join(options)}')
+
+
+task.add_command(show)
+
+
+@click.command()
+@click.pass_context
+def edit(ctx):
+    task = ctx.obj['task']
+    session = get_session(ctx)
+
+    old_frequency = task.frequency
+    old_frequency_type = old_frequency and old_frequency.type
+
+    task.name = click.prompt('New name of task', type=str, default=task.name)
+    edit_task(task, session=session)
+    click.echo(f'Edited Task {task.id} - {task.name}')
+    _commit_before_prompting(session)
+
+    change_frequency = click.prompt(f'Do you want to change the task \
+Frequency (currently {old_frequency_type})?', type=bool, default=False)
+
+    if change_frequency:
+        ctx.invoke(edit_frequency)
+
+
+task.add_command(edit)
+
+
+def _prompt_day_of_week():
+    day_of_week = click.prompt(
+        'Choose day of week (1 = Monday)',
+        type=click.Choice(['1', '2', '3', '4', '5', '6', '7']), default='1'
+    )
+    return int(day_of_week)
+
+
+@click.command()
+@click.pass_context
+def edit_frequency(ctx):
+    """Builds a new Frequency from the prompts, which replace_frequency then
+    writes over the Task's existing one, whatever the types"""
+    task = ctx.obj['task']
+    session = get_session(ctx)
+
+    try:
+        old_frequency = get_frequency_by_task_id(task.id, session=session)
+        click.echo(f'{old_frequency.id}')
+    except FrequencyNotFound as e:
+        click.echo(e)
+        click.Abort()
+
+    prompt_values = [e.value for e in TaskFrequencyEnum]
+    prompt_type = click.Choice(prompt_values, case_sensitive=False)
+    new_frequency_type_value = click.prompt(
+        'Choose Frequency type', type=prompt_type, show_choices=True,
+        default=TaskFrequencyEnum.DAILY.value
+    )
+    new_frequency_type = TaskFrequencyEnum(new_frequency_type_value)
+
+    if new_frequency_type == TaskFrequencyEnum.DAILY:
+        new_frequency = DailyFrequency(task_id=old_frequency.task_id)
+    elif new_frequency_type == TaskFrequencyEnum.WEEKLY:
+        new_frequency = WeeklyFrequency(
+            task_id=old_frequency.task_id, day_of_week=_prompt_day_of_week())
+    elif new_frequency_type == TaskFrequencyEnum.MONTHLY_DATE:
+        day_of_month = click.prompt(
+            'Choose day of month (the 31st means the last day of the month)',
+            type=click.IntRange(1, 31), default=1
+        )
+        new_frequency = MonthlyDateFrequency(
+            task_id=old_frequency.task_id, day_of_month=day_of_month)
+    elif new_frequency_type == TaskFrequencyEnum.MONTHLY_DAY:
+        week_of_month = click.prompt(
+            'Choose week of month',
+            type=click.Choice(['1', '2', '3', '4', 'last']), default='1'
+        )
+        new_frequency = MonthlyDayFrequency(
+            task_id=old_frequency.task_id,
+            week_of_month=(LAST_WEEK_OF_MONTH if week_of_month == 'last'
+                           else int(week_of_month)),
+            day_of_week=_prompt_day_of_week())
+
+    replace_frequency(new_frequency, session=session)
+    click.echo(f'Set Frequency {new_frequency.id} for Task \
+{new_frequency.task_id}')
+
+
+task.add_command(edit_frequency)
+
+
+@click.command()
+@click.pass_context
+def execute(ctx):
+    task = ctx.obj['task']
+    session = get_session(ctx)
+    execution = execute_task(task.id, session=session)
+    click.echo(f'Execution {execution.id} added for Task {task.id} - \
+{task.name}')
+    if execution.execution_window:
+        click.echo(f'Hit Execution Window {execution.execution_window.id}')
+
+    try:
+        execution_window = generate_next_execution_window(task)
+        overlap_window = check_if_execution_window_overlaps(
+            task, execution_window, session=session)
+        if overlap_window:
+            click.echo(f'Existing Execution Window {overlap_window.id} \
+between {overlap_window.start} and {overlap_window.end} will do')
+            return
+        _commit_before_prompting(session)
+        accept = click.prompt(f'Suggest new Execution Window between \
+{execution_window.start} and {execution_window.end}', type=bool, default=True)
+        if not accept:
+            click.echo('No new Execution Window scheduled')
+            return
+        # One could have been added while the prompt was up, so check again
+        # holding the write lock
+        with unit_of_work(session, write=True) as session:
+            overlap_window = check_if_execution_window_overlaps(
+                task, execution_window, session=session)
+            if overlap_window:
+                click.echo(f'Execution Window {overlap_window.id} between \
+{overlap_window.start} and {overlap_window.end} was added in the meantime')
+                return
+            add_execution_window(execution_window, session=session)
+        click.echo(f'Added an Execution Window ({execution_window.id}) for\
+Task {task.id} - {task.name} between {execution_window.start} and \
+{execution_window.end}')
+    except FrequencyNotFound:
+        click.echo(f'No Frequency defined for Task {task.id}')
+
+
+task.add_command(execute)
+
+
+@click.command()
+@click.pass_context
+def schedule(ctx):
+    task = ctx.obj['task']
+
+    start_datetime_input = click.prompt(
+        'Please enter the start date (YYYY-MM-DD or YYYY-MM-DD HH:mm)',
+        type=str, default=datetime.now().strftime("%Y-%m-%d 00:00"))
+    start_datetime = fuzzy_datetime_validator(start_datetime_input)
+
+    default_end_datetime = start_datetime + timedelta(days=1)
+    end_datetime_input = click.prompt(
+        'Please enter the end date (YYYY-MM-DD or YYYY-MM-DD HH:mm)',
+        type=str, default=default_end_datetime.strftime("%Y-%m-%d 00:00"))
+    end_datetime = fuzzy_datetime_validator(end_datetime_input)
+
+    execution_window = ExecutionWindow(task_id=task.id, start=start_datetime,
+                                       end=end_datetime)
+    with unit_of_work(get_session(ctx), write=True) as session:
+        overlap_window = check_if_execution_window_overlaps(
+            task, execution_window, session=session)
+        if overlap_window:
+            raise click.ClickException(f'Overlaps Execution Window \
+{overlap_window.id} between {overlap_window.start} and {overlap_window.end}')
+        add_execution_window(execution_window, session=session)
+    click.echo(f'Added an Execution Window ({execution_window.id}) for Task \
+{task.id} - {task.name} between {execution_window.start} and \
+{execution_window.end}')
+
+
+task.add_command(schedule)
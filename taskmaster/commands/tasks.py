@@ -0,0 +1,44 @@
+"""
+The `taskmaster tasks` commands, for working with all the Tasks
+"""
+import click
+
+from taskmaster.cli import get_session
+from taskmaster.taskmaster import create_task, iter_tasks
+
+
+@click.group()
+def tasks():
+    """Task management commands."""
+    pass
+
+
+@click.command()
+@click.option('--limit', type=click.IntRange(min=1),
+              help='Show at most this many Tasks.')
+@click.option('--offset', type=click.IntRange(min=0),
+              help='Skip this many Tasks.')
+@click.option('--after', type=int,
+              help='Only show Tasks after this ID, for paging.')
+@click.option('--name', help='Only show Tasks whose name contains this.')
+@click.pass_context
+def list(ctx, limit, offset, after, name):
+    """List Tasks, printing them as they are read."""
+    tasks = iter_tasks(limit=limit, offset=offset, after=after, name=name,
+                       session=get_session(ctx))
+    for task in tasks:
+        click.echo(f'{task.id} - {task.name}')
+
+
+tasks.add_command(list)
+
+
+@click.command()
+@click.argument('name')
+@click.pass_context
+def new(ctx, name):
+    task = create_task(name, session=get_session(ctx))
+    click.echo(f'Created {task.id} - {task.name}')
+
+
+tasks.add_command(new)
@@ -0,0 +1,63 @@
+"""
+The `taskmaster export` and `taskmaster import` commands, for moving the
+whole dataset in and out as JSONL or CSV, see taskmaster.transfer
+"""
+import click
+
+from taskmaster.cli import get_session
+from taskmaster.taskmaster import (ImportConflict, export_records,
+                                   import_records)
+from taskmaster.transfer import (FORMATS, InvalidRecord, read_records,
+                                 write_records)
+
+
+def _file_format(file, file_format):
+    """Defaults to csv for .csv files and jsonl otherwise"""
+    if file_format is None:
+        return 'csv' if file.name.endswith('.csv') else 'jsonl'
+    return file_format
+
+
+@click.command('export')
+@click.argument('output_file', type=click.File('w'), default='-')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS),
+              help='Defaults to csv for .csv files and jsonl otherwise.')
+@click.option('--archived', is_flag=True,
+              help='Include history moved to the archive.')
+@click.pass_context
+def export_data(ctx, output_file, file_format, archived):
+    """Write every Task and all their history to OUTPUT_FILE (default
+    stdout).
+
+    Tasks come first, then Frequencies, Execution Windows and Executions,
+    each with its id. `taskmaster import` reads it back."""
+    records = export_records(include_archived=archived,
+                             session=get_session(ctx))
+    count = write_records(records, output_file,
+                          _file_format(output_file, file_format))
+    if output_file.name != '<stdout>':
+        click.echo(f'Exported {count} records')
+
+
+@click.command('import')
+@click.argument('input_file', type=click.File('r'), default='-')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS),
+              help='Defaults to csv for .csv files and jsonl otherwise.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=5000,
+              show_default=True, help='Rows inserted per statement.')
+@click.pass_context
+def import_data(ctx, input_file, file_format, batch_size):
+    """Load Tasks and their history from INPUT_FILE (default stdin).
+
+    The file is one written by `taskmaster export`. Ids are kept, so it's
+    for an empty database, and everything is loaded in one transaction or
+    nothing is."""
+    records = read_records(input_file, _file_format(input_file, file_format))
+    try:
+        counts = import_records(records, batch_size=batch_size,
+                                session=get_session(ctx))
+    except (InvalidRecord, ImportConflict) as e:
+        raise click.ClickException(e.message)
+    click.echo('Imported ' + ', '.join(
+        f'{count} {record_type.replace("_", " ")} records'
+        for record_type, count in counts.items()))
@@ -0,0 +1,57 @@
+"""
+The commands that look after Execution Windows for every Task, usually run
+on a schedule
+"""
+import time
+from datetime import datetime, timedelta
+
+import click
+
+from taskmaster.cli import get_session
+from taskmaster.events import prune_events
+from taskmaster.taskmaster import (generate_execution_windows,
+                                   sweep_missed_execution_windows)
+
+
+@click.command()
+@click.option('--loop', is_flag=True,
+              help='Keep sweeping every --interval seconds until stopped.')
+@click.option('--interval', type=click.IntRange(min=1), default=60,
+              show_default=True)
+@click.option('--grace-minutes', type=click.IntRange(min=0), default=0,
+              show_default=True,
+              help='Only sweep windows that ended at least this long ago.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=1000,
+              show_default=True, help='Windows marked per transaction.')
+@click.option('--keep-events-days', type=click.IntRange(min=1), default=7,
+              show_default=True,
+              help='Prune events for /api/events older than this.')
+def sweep(loop, interval, grace_minutes, batch_size, keep_events_days):
+    """Mark open Execution Windows that have ended as MISSED.
+
+    Events older than --keep-events-days are pruned too."""
+    grace = timedelta(minutes=grace_minutes)
+    keep_events = timedelta(days=keep_events_days)
+    try:
+        while True:
+            swept = sweep_missed_execution_windows(grace=grace,
+                                                   batch_size=batch_size)
+            pruned = prune_events(datetime.utcnow() - keep_events)
+            click.echo(f'{datetime.utcnow():%Y-%m-%d %H:%M:%S} - Marked \
+{swept} Execution Windows as MISSED, pruned {pruned} events')
+            if not loop:
+                return
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        click.echo('Stopped sweeping')
+
+
+@click.command('generate-windows')
+@click.option('--days', type=click.IntRange(min=1), default=30,
+              show_default=True, help='How far ahead to generate.')
+@click.pass_context
+def generate_windows(ctx, days):
+    """Generate upcoming Execution Windows for every Task."""
+    added = generate_execution_windows(horizon=timedelta(days=days),
+                                       session=get_session(ctx))
+    click.echo(f'Added {added} Execution Windows for the next {days} days')
@@ -0,0 +1,169 @@
+"""
+Serves the CLI over a Unix socket from one long running process, so a
+script making hundreds of calls pays for starting Python, importing
+everything and building the engine once rather than on every call.
+
+Start it with `taskmaster daemon` and send it commands with the thin client
+in taskmaster.client. Each request is one line of JSON:
+
+    {"argv": ["tasks", "list"], "color": false, "cwd": "/srv/taskmaster",
+     "environ": {"TASKMASTER_CONFIG": "taskmaster.ini"}}
+
+and the reply is one line of JSON with the exit code and the output:
+
+    {"exit_code": 0, "output": "1 - Some task\n"}
+
+If the command reads stdin (a prompt, or execute-batch reading records)
+the daemon asks the client for it along the way with {"read": <max bytes>},
+and the client answers {"data": <base64>}, empty at the end of its stdin.
+So like `taskmaster` the client only reads its stdin when the command does.
+
+The engine and config are the daemon's, so a request from a different
+directory, or with different TASKMASTER_ variables, would use the wrong
+database. The daemon refuses it with {"environment_differs": true}, and the
+client runs the command itself instead. It refuses commands that run until
+they're stopped too, since nothing is sent back until a command finishes.
+
+Commands run one at a time, which SQLite would insist on for writes anyway.
+"""
+import base64
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import traceback
+
+from click.testing import CliRunner
+
+from taskmaster.client import environment, runs_until_stopped
+from taskmaster.database import get_config, get_engine
+
+
+# Commands that make no sense to run inside the daemon
+NOT_SERVED = ('daemon', 'shell')
+
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+def run_command(cli, argv, input=None, color=False):
+    """Runs the cli for argv in this process, returning (exit code, output).
+    input -- the command's stdin, a string or a binary file"""
+    if argv and argv[0] in NOT_SERVED:
+        return 2, f'{argv[0]} can\'t be run by the daemon\n'
+    if runs_until_stopped(argv):
+        return 2, 'Commands that run until they\'re stopped can\'t be run \
+by the daemon\n'
+    result = CliRunner().invoke(cli, argv, input=input, color=color,
+                                prog_name='taskmaster')
+    output = result.output
+    if result.exception and not isinstance(result.exception, SystemExit):
+        output += ''.join(traceback.format_exception(*result.exc_info))
+    return result.exit_code, output
+
+
+class ClientInput(io.RawIOBase):
+    """The client's stdin, asked for as the command reads it"""
+
+    def __init__(self, rfile, wfile):
+        self._rfile = rfile
+        self._wfile = wfile
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        _send(self._wfile, {'read': len(buffer)})
+        try:
+            data = base64.b64decode(
+                json.loads(self._rfile.readline(MAX_REQUEST_SIZE))['data'])
+        except (ValueError, KeyError, TypeError):
+            raise OSError('Bad stdin from client')
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _send(wfile, message):
+    wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+    wfile.flush()
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_SIZE)
+        try:
+            request = json.loads(line)
+            argv = [str(arg) for arg in request['argv']]
+        except (ValueError, KeyError, TypeError):
+            self._reply(2, 'Bad request\n')
+            return
+        client_environment = {'cwd': request.get('cwd'),
+                              'environ': request.get('environ')}
+        if client_environment != self.server.environment:
+            _send(self.wfile, {
+                'exit_code': 2, 'environment_differs': True,
+                'output': 'The daemon was started in a different directory '
+                          'or with different TASKMASTER_ variables\n'})
+            return
+        stdin = io.BufferedReader(ClientInput(self.rfile, self.wfile))
+        exit_code, output = run_command(self.server.cli, argv, input=stdin,
+                                        color=bool(request.get('color')))
+        self._reply(exit_code, output)
+
+    def _reply(self, exit_code, output):
+        _send(self.wfile, {'exit_code': exit_code, 'output': output})
+
+
+class CommandServer(socketserver.UnixStreamServer):
+    """Handles one connection at a time"""
+
+    def __init__(self, path, cli):
+        self.cli = cli
+        self.environment = environment()
+        _remove_stale_socket(path)
+        # Only the user running the daemon can connect
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, CommandHandler)
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def _remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+    raise RuntimeError(f'A daemon is already listening on {path}')
+
+
+def socket_path(config=None):
+    return (config or get_config())['daemon_socket']
+
+
+def serve(cli, path=None):
+    """Warms up the engine and serves commands until interrupted"""
+    path = path or socket_path()
+    get_engine()
+    # Import the lazily loaded commands now, rather than during a request
+    for name in cli.list_commands(None):
+        cli.get_command(None, name)
+    # Stopping with SIGTERM still removes the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with CommandServer(path, cli) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
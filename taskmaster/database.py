@@ -1,26 +1,238 @@
+"""
+This module builds the SQLAlchemy engine and Session factory for TaskMaster.
+
+Nothing touches the database on import. The engine is built on first use by
+get_engine(), and the schema is only created when init_db() is called
+explicitly (normally `alembic upgrade head` does that job).
+
+Settings come from the environment (TASKMASTER_* variables) or from the
+[taskmaster] section of an INI file named by TASKMASTER_CONFIG. Environment
+variables win over the file, and the file wins over the defaults below.
+"""
+import os
+from configparser import ConfigParser
+from contextlib import contextmanager
+
 from sqlalchemy import create_engine, event
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 
+from taskmaster.archive import attach_statement, create_archive, is_attached
 from taskmaster.models import Base
 
-DATABASE_URL = "sqlite:///./taskmaster.sqlite"
 
-engine = create_engine(
-    DATABASE_URL,
-    echo=True
-)
+DEFAULT_CONFIG = {
+    'database_url': 'sqlite:///./taskmaster.sqlite',
+    'echo': 'false',
+    'pool_size': '5',
+    'max_overflow': '10',
+    'pool_timeout': '30',
+    'pool_recycle': '-1',
+    # SQLite pragmas applied to every new connection
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': '5000',  # milliseconds
+    'cache_size': '-16000',  # negative values are KiB, so 16MB
+    'mmap_size': '134217728',  # 128MB
+    # Read-through cache, see taskmaster.cache. Off unless a backend is set
+    'cache_backend': '',  # memory or sqlite
+    'cache_path': './taskmaster-cache.sqlite',
+    'cache_max_entries': '1024',
+    'cache_ttl': '60',  # seconds
+    # Where `taskmaster daemon` listens, see taskmaster.client
+    'daemon_socket': './taskmaster-cli.sock',
+    # SQLite file old history is archived to, see taskmaster.archive. No
+    # archive unless it's set
+    'archive_path': '',
+}
+
+CONFIG_SECTION = 'taskmaster'
+
+
+def get_config(environ=None):
+    """Merges the defaults, the optional config file and the environment into
+    a single dict of strings"""
+    environ = os.environ if environ is None else environ
+    config = dict(DEFAULT_CONFIG)
+
+    config_path = environ.get('TASKMASTER_CONFIG')
+    if config_path:
+        parser = ConfigParser()
+        if not parser.read(config_path):
+            raise FileNotFoundError(
+                f'TaskMaster config file {config_path} could not be read')
+        if parser.has_section(CONFIG_SECTION):
+            config.update(parser.items(CONFIG_SECTION))
+
+    for key in DEFAULT_CONFIG:
+        value = environ.get(f'TASKMASTER_{key.upper()}')
+        if value is not None:
+            config[key] = value
+
+    return config
+
+
+def _as_bool(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def create_engine_from_config(config=None):
+    """Engine factory. Pool settings only apply to file based databases, an
+    in-memory SQLite database is private to its connection so SQLAlchemy
+    picks a single-connection pool for it"""
+    config = get_config() if config is None else config
+    url = config['database_url']
+
+    engine_kwargs = {'echo': _as_bool(config['echo'])}
+    if not _is_memory_database(url):
+        engine_kwargs.update(
+            pool_size=int(config['pool_size']),
+            max_overflow=int(config['max_overflow']),
+            pool_timeout=int(config['pool_timeout']),
+            pool_recycle=int(config['pool_recycle']),
+        )
+
+    engine = create_engine(url, **engine_kwargs)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _sqlite_pragma_listener(config))
+    return engine
+
+
+def _is_memory_database(url):
+    url = make_url(url)
+    return (url.get_backend_name() == 'sqlite'
+            and url.database in (None, '', ':memory:'))
+
+
+def _sqlite_pragma_listener(config):
+    """WAL lets readers carry on while the single writer commits, and
+    synchronous=NORMAL is safe in WAL mode while skipping most fsyncs. The
+    archive, if there is one, is attached too"""
+    pragmas = [
+        'PRAGMA foreign_keys=ON',
+        f'PRAGMA journal_mode={config["journal_mode"]}',
+        f'PRAGMA synchronous={config["synchronous"]}',
+        f'PRAGMA busy_timeout={int(config["busy_timeout"])}',
+        f'PRAGMA cache_size={int(config["cache_size"])}',
+        f'PRAGMA mmap_size={int(config["mmap_size"])}',
+    ]
+    attach = config.get('archive_path') and attach_statement(
+        config['archive_path'])
+
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        if attach:
+            cursor.execute(*attach)
+        cursor.close()
 
+    return set_sqlite_pragma
 
-# Listen for the SQLite connection and set PRAGMA foreign_keys=ON
-@event.listens_for(Engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
 
+_engine = None
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine,
+SessionLocal = sessionmaker(autocommit=False, autoflush=False,
                             expire_on_commit=False)
 
-Base.metadata.create_all(bind=engine)
+
+def get_engine():
+    """The process wide engine, built from config the first time it's needed"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine_from_config()
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def dispose_engine():
+    """Closes the pooled connections and forgets the engine, so the next call
+    to get_engine() rebuilds it from the current config"""
+    global _engine
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+
+
+def _forget_engine_after_fork():
+    """A forked worker (gunicorn with --preload, say) mustn't share its
+    parent's pooled connections. They're dropped without being closed, which
+    leaves the parent's alone, and the worker builds its own pool on first
+    use"""
+    global _engine
+    if _engine is not None:
+        _engine.dispose(close=False)
+        _engine = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_engine_after_fork)
+
+
+def new_session():
+    get_engine()
+    return SessionLocal()
+
+
+def _lock_for_writing(session):
+    """Takes SQLite's write lock now, rather than at the first write, and
+    keeps it until the transaction ends. pysqlite only begins a transaction
+    at the first write, so this does nothing if there's been one"""
+    connection = session.connection()
+    if (connection.dialect.name == 'sqlite'
+            and not connection.connection.dbapi_connection.in_transaction):
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+@contextmanager
+def unit_of_work(session=None, write=False):
+    """Runs a block of work in one Session, one transaction and one connection
+    checkout. Commits if the block succeeds and rolls back if it raises.
+
+    If a Session is passed in then the caller already owns a unit of work, so
+    that Session is handed straight back and committing is left to the caller.
+    This lets the functions in taskmaster.taskmaster be composed into a single
+    transaction, or called on their own.
+
+    Pass write=True for work that reads to decide what to write, such as
+    checking for an overlap before adding an Execution Window. It takes the
+    write lock first, even in a Session that was passed in, so no other
+    writer can change what was read before the transaction ends."""
+    if session is not None:
+        if write:
+            _lock_for_writing(session)
+        yield session
+        return
+
+    session = new_session()
+    try:
+        if write:
+            _lock_for_writing(session)
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def vacuum(engine=None):
+    """Rebuilds the database file without its free pages, so it shrinks
+    once history has been archived. Writers wait while it runs. In WAL mode
+    the file only shrinks once the WAL is checkpointed, so that's done
+    straight away"""
+    with (engine or get_engine()).connect().execution_options(
+            isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql('VACUUM main')
+        connection.exec_driver_sql('PRAGMA main.wal_checkpoint(TRUNCATE)')
+
+
+def init_db(engine=None):
+    """Creates any missing tables. Handy for development and tests, real
+    databases should be managed with Alembic. The archive's tables are
+    created by archiving, or here if it's attached"""
+    with (engine or get_engine()).begin() as connection:
+        Base.metadata.create_all(bind=connection)
+        if is_attached(connection):
+            create_archive(connection)
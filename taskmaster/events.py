@@ -0,0 +1,114 @@
+"""
+A feed of what's happened to Executions and Execution Windows, for the
+/api/events stream on the ASGI website.
+
+The service functions record events on their Session as they write, and
+the events are inserted into the events table as the Session commits, in
+the same transaction as the change. So nothing rolled back is ever seen,
+and every writer is in the feed: the website, the CLI, the sweeper, in
+whichever process. Event ids only go up, in the order the transactions
+committed, so a stream reads the events after the last one it sent, and a
+client that reconnects with the id of the last event it saw carries on
+from there.
+
+Old events are pruned by `taskmaster sweep`.
+"""
+import json
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from taskmaster.database import unit_of_work
+from taskmaster.models import Event
+
+
+EXECUTION = 'execution'
+EXECUTION_WINDOW = 'execution_window'
+
+# Most events a stream reads at once
+EVENT_BATCH_SIZE = 500
+
+
+def record_event(session, event_type, data):
+    """Queues an event to insert when the Session's transaction commits"""
+    session.info.setdefault('events', []).append(
+        {'type': event_type, 'data': json.dumps(data)})
+
+
+@event.listens_for(Session, 'before_commit')
+def _insert_before_commit(session):
+    events = session.info.pop('events', None)
+    if events:
+        session.execute(insert(Event), events)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_events(session, previous_transaction):
+    session.info.pop('events', None)
+
+
+def record_execution(session, execution_id, task_id, executed_at,
+                     execution_window_id):
+    record_event(session, EXECUTION, {
+        'id': execution_id,
+        'task_id': task_id,
+        'executed_at': executed_at.isoformat(),
+        'execution_window_id': execution_window_id,
+    })
+
+
+def record_execution_window(session, execution_window_id, task_id, start,
+                            end, status):
+    """For a new Execution Window, or one that's changed status"""
+    record_event(session, EXECUTION_WINDOW, {
+        'id': execution_window_id,
+        'task_id': task_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'status': status.value,
+    })
+
+
+def events_query(last_id, limit=EVENT_BATCH_SIZE):
+    """(id, type, data) rows of the events after last_id, oldest first,
+    with data as JSON"""
+    return (select(Event.id, Event.type, Event.data)
+            .where(Event.id > last_id).order_by(Event.id).limit(limit))
+
+
+def event_ids_query():
+    """The oldest and newest event ids, both None with no events"""
+    return select(func.min(Event.id), func.max(Event.id))
+
+
+def missed_events(last_id, oldest, newest):
+    """Whether the events after last_id can't all be read, because they've
+    been pruned or last_id is from some other database"""
+    return (last_id > (newest or 0)
+            or (oldest is not None and last_id < oldest - 1))
+
+
+def get_events(last_id, limit=EVENT_BATCH_SIZE, session=None):
+    """Returns (up to limit events after last_id, None). If events were
+    missed (see missed_events) it's ([], the newest id) instead: the client
+    should reload, and carry on from there"""
+    with unit_of_work(session) as session:
+        oldest, newest = session.execute(event_ids_query()).one()
+        if missed_events(last_id, oldest, newest):
+            return [], newest or 0
+        return session.execute(events_query(last_id, limit)).all(), None
+
+
+def get_latest_event_id(session=None):
+    """Where a new stream starts, 0 with no events"""
+    with unit_of_work(session) as session:
+        return session.execute(event_ids_query()).one()[1] or 0
+
+
+def prune_events(before, session=None):
+    """Deletes the events recorded before `before` and returns how many.
+    The newest is always kept, so a client that's up to date still is"""
+    with unit_of_work(session) as session:
+        newest = select(func.max(Event.id)).scalar_subquery()
+        return session.execute(delete(Event).where(
+            Event.recorded_at < before, Event.id < newest)).rowcount
@@ -0,0 +1,39 @@
+"""
+A static interval index for overlap checks.
+
+Anything with comparable start and end attributes can be indexed, the
+intervals are treated as half open, [start, end).
+"""
+from bisect import bisect_left
+
+
+class IntervalIndex:
+    """Answers "does [start, end) overlap anything in the index" in
+    O(log n) after an O(n log n) build.
+
+    Intervals are sorted by start, and for each prefix of that order we keep
+    the position of the interval that ends last. The intervals that could
+    overlap a query are exactly the prefix that starts before the query
+    ends, and one of them overlaps it if and only if the one that ends last
+    ends after the query starts."""
+
+    def __init__(self, intervals):
+        self._intervals = sorted(intervals, key=lambda x: x.start)
+        self._starts = [interval.start for interval in self._intervals]
+        self._latest_ending = []
+        latest = None
+        for i, interval in enumerate(self._intervals):
+            if latest is None or interval.end > self._intervals[latest].end:
+                latest = i
+            self._latest_ending.append(latest)
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def find_overlap(self, start, end):
+        """One of the intervals overlapping [start, end), or None"""
+        before_end = bisect_left(self._starts, end)
+        if before_end == 0:
+            return None
+        candidate = self._intervals[self._latest_ending[before_end - 1]]
+        return candidate if candidate.end > start else None
@@ -1,7 +1,8 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
+from sqlalchemy import (Column, Date, DateTime, Enum, ForeignKey, Index,
+                        Integer, String)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -19,8 +20,8 @@ class ExecutionWindowStatusEnum(enum.Enum):
 class TaskFrequencyEnum(enum.Enum):
     DAILY = "daily"
     WEEKLY = "weekly"
-    # MONTHLY = "monthly-date" # e.g. "1st of every month"
-    # MONTHLY = "monthly-day" # e.g. "Last Sunday of every month"
+    MONTHLY_DATE = "monthly-date"  # e.g. "1st of every month"
+    MONTHLY_DAY = "monthly-day"  # e.g. "Last Sunday of every month"
 
 
 class Task(Base):
@@ -28,6 +29,9 @@ class Task(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
+    # High-water mark for generate_execution_windows, every window starting
+    # before this has already been generated
+    windows_generated_until = Column(DateTime, nullable=True, index=True)
 
     executions = relationship('Execution', backref='task')
     execution_windows = relationship('ExecutionWindow', backref='task')
@@ -36,41 +40,65 @@ class Task(Base):
 
 
 class Frequency(Base):
-    """Frequencies determine how often a task should be performed"""
+    """Frequencies determine how often a task should be performed.
+
+    All of the types share this one table (single table inheritance), so a
+    Frequency is always read from one table, and changing the type is a
+    single UPDATE. Each type uses some of the rule columns and leaves the
+    rest NULL"""
     __tablename__ = "frequencies"
     __mapper_args__ = {
         'polymorphic_on': 'type',
         'polymorphic_identity': 'frequency',
-        'with_polymorphic': '*'
     }
     id = Column(Integer, primary_key=True)
     type = Column(Enum(TaskFrequencyEnum), default=TaskFrequencyEnum.DAILY,
                   nullable=False)
     task_id = Column(Integer, ForeignKey('tasks.id'), unique=True,
                      nullable=False)
+    # 1 = Monday, for weekly and monthly-day
+    day_of_week = Column(Integer, nullable=True)
+    # 1 to 31, days past the end of a shorter month mean its last day
+    day_of_month = Column(Integer, nullable=True)
+    # 1 to 4, or -1 for the last one in the month
+    week_of_month = Column(Integer, nullable=True)
+
+
+# The columns that describe when each type of Frequency falls
+FREQUENCY_RULE_COLUMNS = ('day_of_week', 'day_of_month', 'week_of_month')
 
 
 class DailyFrequency(Frequency):
-    __tablename__ = "daily_frequencies"
     __mapper_args__ = {
         'polymorphic_identity': TaskFrequencyEnum.DAILY
     }
-    id = Column(Integer, ForeignKey('frequencies.id', ondelete="cascade"),
-                primary_key=True)
 
 
 class WeeklyFrequency(Frequency):
-    __tablename__ = "weekly_frequencies"
     __mapper_args__ = {
         'polymorphic_identity': TaskFrequencyEnum.WEEKLY
     }
-    id = Column(Integer, ForeignKey('frequencies.id', ondelete="cascade"),
-                primary_key=True)
-    day_of_week = Column(Integer)
+
+
+class MonthlyDateFrequency(Frequency):
+    __mapper_args__ = {
+        'polymorphic_identity': TaskFrequencyEnum.MONTHLY_DATE
+    }
+
+
+class MonthlyDayFrequency(Frequency):
+    __mapper_args__ = {
+        'polymorphic_identity': TaskFrequencyEnum.MONTHLY_DAY
+    }
 
 
 class Execution(Base):
     __tablename__ = 'executions'
+    __table_args__ = (
+        # Executions for a Task, in time order
+        Index('ix_executions_task_id_executed_at', 'task_id', 'executed_at'),
+        Index('ix_executions_execution_window_id', 'execution_window_id'),
+    )
 
     id = Column(Integer, primary_key=True)
     task_id = Column(Integer, ForeignKey('tasks.id', ondelete='RESTRICT'),
@@ -86,6 +114,13 @@ class ExecutionWindow(Base):
     executed.
     """
     __tablename__ = 'execution_windows'
+    __table_args__ = (
+        # Covers finding the open window for a Task at a point in time
+        Index('ix_execution_windows_task_id_status_start_end',
+              'task_id', 'status', 'start', 'end'),
+        # Covers sweeping open windows that have ended, across all Tasks
+        Index('ix_execution_windows_status_end', 'status', 'end'),
+    )
 
     id = Column(Integer, primary_key=True)
     task_id = Column(Integer, ForeignKey('tasks.id', ondelete='RESTRICT'),
@@ -96,3 +131,39 @@ class ExecutionWindow(Base):
                     default=ExecutionWindowStatusEnum.OPEN, nullable=False)
 
     executions = relationship('Execution', backref='execution_window')
+
+
+class TaskDailyRollup(Base):
+    """Running counts for a Task on a day, kept up by the functions in
+    taskmaster.taskmaster as they write, see taskmaster.rollups.
+
+    Executions count on the day they happened, and Execution Windows on the
+    day they start"""
+    __tablename__ = 'task_daily_rollups'
+
+    task_id = Column(Integer, ForeignKey('tasks.id', ondelete='RESTRICT'),
+                     primary_key=True)
+    day = Column(Date, primary_key=True)
+    executions = Column(Integer, default=0, nullable=False)
+    windows = Column(Integer, default=0, nullable=False)
+    windows_hit = Column(Integer, default=0, nullable=False)
+    windows_missed = Column(Integer, default=0, nullable=False)
+
+
+class Event(Base):
+    """Something that's happened to an Execution or Execution Window, for
+    the feed in taskmaster.events. It's written in the same transaction as
+    the change it describes.
+
+    AUTOINCREMENT means an id is never handed out twice, even once old
+    events have been pruned, so a client's last event id always means the
+    same place in the feed"""
+    __tablename__ = 'events'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String, nullable=False)
+    # The event's data as JSON, ready to send
+    data = Column(String, nullable=False)
+    recorded_at = Column(DateTime, default=datetime.utcnow, nullable=False,
+                         index=True)
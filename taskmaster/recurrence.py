@@ -0,0 +1,126 @@
+"""
+The recurrence engine, which works out when a Frequency's Execution Windows
+fall.
+
+Every window is a whole day. Times are naive UTC datetimes, and internally
+they're seconds since the Unix epoch, so daily and weekly rules come out as
+a single range() of window starts rather than a loop stepping through the
+calendar. Monthly rules need calendar arithmetic, but that's one step per
+month rather than per occurrence tried.
+
+A rule is a hashable tuple made from a Frequency by frequency_rule(), so
+Tasks with the same rule share the result of the same computation.
+"""
+import calendar
+from datetime import datetime, timedelta
+from functools import lru_cache
+from math import ceil
+
+from taskmaster.models import TaskFrequencyEnum
+
+
+EPOCH = datetime(1970, 1, 1)
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+# The 1st of January 1970 was a Thursday, weekday 3 counting from Monday = 0
+EPOCH_WEEKDAY = 3
+# The furthest apart two windows can start, e.g. the 31st of January and the
+# 31st of March for a monthly rule on the 31st... which is clamped to the
+# 28th or 29th of February, so two months is plenty
+MAX_GAP = 62 * DAY
+
+LAST_WEEK_OF_MONTH = -1
+
+
+def frequency_rule(frequency):
+    """A hashable description of when a Frequency's windows fall"""
+    if frequency.type == TaskFrequencyEnum.DAILY:
+        return (TaskFrequencyEnum.DAILY,)
+    if frequency.type == TaskFrequencyEnum.WEEKLY:
+        return (TaskFrequencyEnum.WEEKLY, frequency.day_of_week)
+    if frequency.type == TaskFrequencyEnum.MONTHLY_DATE:
+        return (TaskFrequencyEnum.MONTHLY_DATE, frequency.day_of_month)
+    if frequency.type == TaskFrequencyEnum.MONTHLY_DAY:
+        return (TaskFrequencyEnum.MONTHLY_DAY, frequency.week_of_month,
+                frequency.day_of_week)
+    raise NotImplementedError(f'Unsupported Frequency type {frequency.type}')
+
+
+def to_epoch(value, round_up=False):
+    seconds = (value - EPOCH) / timedelta(seconds=1)
+    return ceil(seconds) if round_up else int(seconds)
+
+
+def from_epoch(seconds):
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def window_starts(rule, from_epoch_seconds, to_epoch_seconds):
+    """The start, in epoch seconds, of every window the rule has starting in
+    [from, to). Windows end a day after they start"""
+    kind = rule[0]
+    if kind == TaskFrequencyEnum.DAILY:
+        return range(_first_multiple(from_epoch_seconds, DAY, 0),
+                     to_epoch_seconds, DAY)
+    if kind == TaskFrequencyEnum.WEEKLY:
+        day_of_week = rule[1]  # 1 = Monday
+        offset = ((day_of_week - 1 - EPOCH_WEEKDAY) % 7) * DAY
+        return range(_first_multiple(from_epoch_seconds, WEEK, offset),
+                     to_epoch_seconds, WEEK)
+    if kind in (TaskFrequencyEnum.MONTHLY_DATE,
+                TaskFrequencyEnum.MONTHLY_DAY):
+        return _monthly_starts(rule, from_epoch_seconds, to_epoch_seconds)
+    raise NotImplementedError(f'Unsupported Frequency type {kind}')
+
+
+def _first_multiple(at_least, step, offset):
+    """The smallest offset + n * step that is >= at_least"""
+    return offset + ceil((at_least - offset) / step) * step
+
+
+def _monthly_starts(rule, from_epoch_seconds, to_epoch_seconds):
+    first = from_epoch(from_epoch_seconds)
+    last = from_epoch(to_epoch_seconds)
+    starts = []
+    for month_index in range(first.year * 12 + first.month - 1,
+                             last.year * 12 + last.month):
+        year, month = divmod(month_index, 12)
+        month += 1
+        start = (DAY * (_day_of_month(rule, year, month) - 1)
+                 + to_epoch(datetime(year, month, 1)))
+        if from_epoch_seconds <= start < to_epoch_seconds:
+            starts.append(start)
+    return starts
+
+
+def _day_of_month(rule, year, month):
+    first_weekday, days_in_month = calendar.monthrange(year, month)
+    if rule[0] == TaskFrequencyEnum.MONTHLY_DATE:
+        # The 31st means the last day in shorter months
+        return min(rule[1], days_in_month)
+    week_of_month, day_of_week = rule[1], rule[2]
+    weekday = day_of_week - 1
+    if week_of_month == LAST_WEEK_OF_MONTH:
+        last_weekday = (first_weekday + days_in_month - 1) % 7
+        return days_in_month - (last_weekday - weekday) % 7
+    return 1 + (weekday - first_weekday) % 7 + 7 * (week_of_month - 1)
+
+
+@lru_cache(maxsize=1024)
+def windows_between(rule, from_datetime, to_datetime):
+    """The (start, end) datetimes of every window the rule has starting in
+    [from_datetime, to_datetime), as a tuple. Cached, because Tasks generated
+    together mostly share a rule and a range"""
+    starts = window_starts(rule, to_epoch(from_datetime, round_up=True),
+                           to_epoch(to_datetime, round_up=True))
+    return tuple((from_epoch(start), from_epoch(start + DAY))
+                 for start in starts)
+
+
+def next_window(rule, after):
+    """The first window the rule has starting on a later day than after"""
+    tomorrow = (after + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    start = to_epoch(tomorrow)
+    starts = window_starts(rule, start, start + MAX_GAP)
+    return from_epoch(starts[0]), from_epoch(starts[0] + DAY)
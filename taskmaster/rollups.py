@@ -0,0 +1,102 @@
+"""
+Keeps the task_daily_rollups table (models.TaskDailyRollup) up to date, so
+reports over a long history read a row per Task per day rather than every
+Execution and Execution Window.
+
+The functions in taskmaster.taskmaster call add_to_rollups as they write,
+in the same transaction, so the counts are never out of step with the rows
+they count. Anything written some other way (the rows in a test, say, or
+by hand in sqlite3) isn't counted until the rollups are rebuilt from the
+history with rebuild_statements, which `taskmaster rollups rebuild` runs.
+Archiving history (see taskmaster.archive) leaves the rollups as they are.
+"""
+from collections import Counter
+
+from sqlalchemy import case, delete, func, literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert
+
+from taskmaster.archive import history
+from taskmaster.models import (Execution, ExecutionWindow,
+                               ExecutionWindowStatusEnum, TaskDailyRollup)
+
+
+COUNTS = ('executions', 'windows', 'windows_hit', 'windows_missed')
+
+# The count a window is added to when it reaches each status
+STATUS_COUNTS = {
+    ExecutionWindowStatusEnum.HIT: 'windows_hit',
+    ExecutionWindowStatusEnum.MISSED: 'windows_missed',
+}
+
+
+def add_to_rollups(session, changes):
+    """Adds one to a count for each (task_id, datetime, count) in changes,
+    count being one of COUNTS. Everything goes in one upsert, as a row per
+    Task and day"""
+    totals = Counter((task_id, at.date(), count)
+                     for task_id, at, count in changes)
+    if not totals:
+        return
+    rows = {}
+    for (task_id, day, count), amount in totals.items():
+        row = rows.setdefault((task_id, day), {
+            'task_id': task_id, 'day': day,
+            **{name: 0 for name in COUNTS}})
+        row[count] += amount
+
+    upsert = insert(TaskDailyRollup)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[TaskDailyRollup.task_id, TaskDailyRollup.day],
+        set_={name: getattr(TaskDailyRollup, name) + upsert.excluded[name]
+              for name in COUNTS})
+    session.execute(upsert, [*rows.values()])
+
+
+def new_window_changes(execution_window):
+    """The changes adding an Execution Window makes, it might not be OPEN"""
+    changes = [(execution_window.task_id, execution_window.start, 'windows')]
+    count = STATUS_COUNTS.get(execution_window.status)
+    if count:
+        changes.append((execution_window.task_id, execution_window.start,
+                        count))
+    return changes
+
+
+def rebuild_statements(task_id=None, archived=False):
+    """The DELETE and INSERT ... SELECT that recount the rollups from the
+    history, for every Task or just task_id. archived -- count the archived
+    history too, it's counted as it's written so it must be if there is
+    any"""
+    def count_if(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    executions = history(Execution) if archived else Execution
+    windows = history(ExecutionWindow) if archived else ExecutionWindow
+    execution_counts = (
+        select(executions.task_id,
+               func.date(executions.executed_at).label('day'),
+               func.count().label('executions'),
+               *(literal(0).label(name) for name in COUNTS[1:]))
+        .group_by(executions.task_id, func.date(executions.executed_at)))
+    window_counts = (
+        select(windows.task_id,
+               func.date(windows.start).label('day'),
+               literal(0).label('executions'),
+               func.count().label('windows'),
+               *(count_if(windows.status == status).label(name)
+                 for status, name in STATUS_COUNTS.items()))
+        .group_by(windows.task_id, func.date(windows.start)))
+    clear = delete(TaskDailyRollup)
+    if task_id is not None:
+        execution_counts = execution_counts.where(
+            executions.task_id == task_id)
+        window_counts = window_counts.where(windows.task_id == task_id)
+        clear = clear.where(TaskDailyRollup.task_id == task_id)
+
+    counts = union_all(execution_counts, window_counts).subquery()
+    totals = (
+        select(counts.c.task_id, counts.c.day,
+               *(func.sum(counts.c[name]) for name in COUNTS))
+        .group_by(counts.c.task_id, counts.c.day))
+    return clear, insert(TaskDailyRollup).from_select(
+        ['task_id', 'day', *COUNTS], totals)
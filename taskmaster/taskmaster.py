@@ -2,22 +2,44 @@
 This module contains the application logic for Taskmaster
 including the functions that speak to the database.
 
-Call the functions here from the modules that contain the interfaces
+Call the functions here from the modules that contain the interfaces.
+Every function takes an optional Session. Pass the Session from a
+taskmaster.database.unit_of_work() to run several calls in one transaction,
+or leave it out and the function runs in a unit of work of its own.
 """
 
+from collections import deque
 from datetime import datetime, timedelta
 
-from sqlalchemy import and_
-from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import joinedload
-
-from taskmaster.database import SessionLocal
+from sqlalchemy import (Float, and_, case, cast, delete, exists, func, insert,
+                        literal, null, or_, select, tuple_, type_coerce,
+                        union_all, update)
+from sqlalchemy.exc import IntegrityError, NoResultFound
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from taskmaster.archive import (ARCHIVED_TABLES, create_archive,
+                                has_archive, history, history_table,
+                                is_attached)
+from taskmaster.cache import cached, invalidate_on_commit
+from taskmaster.database import unit_of_work
+from taskmaster.events import record_execution, record_execution_window
+from taskmaster.intervals import IntervalIndex
 from taskmaster.models import (DailyFrequency, Execution, ExecutionWindow,
-                               ExecutionWindowStatusEnum, Frequency, Task)
+                               ExecutionWindowStatusEnum,
+                               FREQUENCY_RULE_COLUMNS, Frequency, Task,
+                               TaskDailyRollup)
+from taskmaster.recurrence import frequency_rule, next_window, windows_between
+from taskmaster.rollups import (COUNTS as ROLLUP_COUNTS, add_to_rollups,
+                                new_window_changes, rebuild_statements)
+from taskmaster.transfer import RECORD_TYPES, to_record
 
 
 DATABASE = "taskmaster.sqlite"
 
+# Keeps IN (...) lists well under SQLite's bound parameter limit
+BULK_CHUNK_SIZE = 500
+
 
 class TaskNotFound(Exception):
     def __init__(self, task_id, message="Task not found"):
@@ -26,6 +48,20 @@ class TaskNotFound(Exception):
         super().__init__(self.message)
 
 
+class ArchiveNotAttached(Exception):
+    def __init__(self, message="No archive, set archive_path to archive to "
+                 "one"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ImportConflict(Exception):
+    def __init__(self, error, message="Records clash with the database, "
+                 "import into an empty one"):
+        self.message = f"{message}: {error}"
+        super().__init__(self.message)
+
+
 class FrequencyNotFound(Exception):
     def __init__(self, task_id, message="Frequency not found for Task"):
         self.task_id = task_id
@@ -33,109 +69,676 @@ class FrequencyNotFound(Exception):
         super().__init__(self.message)
 
 
-def get_tasks():
-    session = SessionLocal()
-    try:
-        tasks = session.query(Task).all()
-    finally:
-        session.close()
-    return tasks
+def get_tasks(session=None):
+    with unit_of_work(session) as session:
+        return cached(session, 'tasks', session.query(Task).all)
+
+
+def iter_tasks(limit=None, offset=None, after=None, name=None,
+               session=None):
+    """Streams lightweight (id, name) rows for Tasks in id order, without
+    building ORM objects.
 
+    after -- keyset cursor, the id of the last Task on the previous page
+    name -- only Tasks whose name contains this, ignoring case
+    """
+    query = select(Task.id, Task.name).order_by(Task.id)
+    if after is not None:
+        query = query.where(Task.id > after)
+    if name:
+        query = query.where(Task.name.icontains(name, autoescape=True))
+    if offset:
+        query = query.offset(offset)
+    yield from _stream(query, limit, session, scalars=False)
 
-def create_task(name):
-    session = SessionLocal()
+
+def create_task(name, session=None):
     task = Task(name=name)
     task.frequency = DailyFrequency()
-    try:
+    with unit_of_work(session) as session:
         session.add(task)
-        session.commit()
-        session.refresh(task)
+        session.flush()
+        invalidate_on_commit(session, 'tasks')
         return task
-    finally:
-        session.close()
-
-
-def get_task(task_id):
-    session = SessionLocal()
-    try:
-        return session.query(Task).options(
-            joinedload(Task.executions),
-            joinedload(Task.execution_windows),
-            joinedload(Task.frequency)
-        ).filter(Task.id == task_id).one()
-    except NoResultFound:
-        raise TaskNotFound(task_id)
-    finally:
-        session.close()
-
-
-def edit_task(task):
-    session = SessionLocal()
-    try:
+
+
+def get_task(task_id, session=None):
+    """Loads the Task and its Frequency. The history can be long, so use
+    get_executions and get_execution_windows to page through that"""
+    with unit_of_work(session) as session:
+        try:
+            return cached(session, f'task:{task_id}',
+                          session.query(Task).options(
+                              joinedload(Task.frequency)
+                          ).filter(Task.id == task_id).one)
+        except NoResultFound:
+            raise TaskNotFound(task_id)
+
+
+def executions_query(task_id, since=None, before=None, archived=False):
+    """get_executions' query, over the archive too if archived"""
+    executions = history(Execution) if archived else Execution
+    query = select(executions).where(executions.task_id == task_id)
+    if since is not None:
+        query = query.where(executions.executed_at >= since)
+    if before is not None:
+        query = query.where(
+            tuple_(executions.executed_at, executions.id) < tuple_(*before))
+    return query.order_by(executions.executed_at.desc(),
+                          executions.id.desc())
+
+
+def get_executions(task_id, limit=None, since=None, before=None,
+                   include_archived=False, session=None):
+    """Streams a Task's Executions, newest first.
+
+    since -- only Executions at or after this datetime
+    before -- keyset cursor, the (executed_at, id) of the last Execution on
+    the previous page
+    include_archived -- read the archive as well, see taskmaster.archive
+    """
+    with unit_of_work(session) as session:
+        query = executions_query(task_id, since, before,
+                                 include_archived and has_archive(session))
+        yield from _stream(query, limit, session)
+
+
+def execution_windows_query(task_id, since=None, before=None,
+                            archived=False):
+    """get_execution_windows' query, over the archive too if archived"""
+    windows = history(ExecutionWindow) if archived else ExecutionWindow
+    query = select(windows).where(windows.task_id == task_id)
+    if since is not None:
+        query = query.where(windows.start >= since)
+    if before is not None:
+        query = query.where(
+            tuple_(windows.start, windows.id) < tuple_(*before))
+    return query.order_by(windows.start.desc(), windows.id.desc())
+
+
+def get_execution_windows(task_id, limit=None, since=None, before=None,
+                          include_archived=False, session=None):
+    """Streams a Task's Execution Windows, latest starting first.
+
+    since -- only Execution Windows starting at or after this datetime
+    before -- keyset cursor, the (start, id) of the last Execution Window on
+    the previous page
+    include_archived -- read the archive as well, see taskmaster.archive
+    """
+    with unit_of_work(session) as session:
+        query = execution_windows_query(
+            task_id, since, before, include_archived and has_archive(session))
+        yield from _stream(query, limit, session)
+
+
+def dashboard_query(now, windows=20, executions=20):
+    """One query for everything on the dashboard. Its rows come in sections,
+    in this order:
+
+    1. the open Execution Windows that haven't ended, soonest first
+    2. the latest Executions, newest first
+    3. every Task with its Frequency type, in id order
+
+    Each row has section, task_id, name, item_id (the window or execution),
+    at (its start or execution time), end, status and frequency"""
+    window_rows = (
+        select(literal(1).label('section'),
+               func.row_number().over(
+                   order_by=(ExecutionWindow.start, ExecutionWindow.id)
+               ).label('position'),
+               ExecutionWindow.task_id, Task.name,
+               ExecutionWindow.id.label('item_id'),
+               ExecutionWindow.start.label('at'), ExecutionWindow.end,
+               ExecutionWindow.status,
+               type_coerce(null(), Frequency.type.type).label('frequency'))
+        .join(Task, Task.id == ExecutionWindow.task_id)
+        .where(and_(ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
+                    ExecutionWindow.end >= now))
+        .order_by(ExecutionWindow.start, ExecutionWindow.id)
+        .limit(windows)
+        .subquery())
+    execution_rows = (
+        select(literal(2), func.row_number().over(
+                   order_by=(Execution.executed_at.desc(),
+                             Execution.id.desc())),
+               Execution.task_id, Task.name, Execution.id,
+               Execution.executed_at, null().label('end'),
+               null().label('status'), null().label('frequency'))
+        .join(Task, Task.id == Execution.task_id)
+        .order_by(Execution.executed_at.desc(), Execution.id.desc())
+        .limit(executions)
+        .subquery())
+    task_rows = (
+        select(literal(3), Task.id, Task.id, Task.name,
+               null().label('item_id'), null().label('at'),
+               null().label('end'), null().label('status'), Frequency.type)
+        .outerjoin(Frequency, Frequency.task_id == Task.id))
+    rows = union_all(select(*window_rows.c), select(*execution_rows.c),
+                     task_rows).subquery()
+    return select(rows).order_by(rows.c.section, rows.c.position)
+
+
+def get_dashboard(now=None, windows=20, executions=20, session=None):
+    """Streams the rows of dashboard_query, in one round trip"""
+    query = dashboard_query(now or datetime.utcnow(), windows, executions)
+    yield from _stream(query, None, session, scalars=False)
+
+
+# How stats can be grouped, as strftime formats for the windows' starts
+STATS_PERIODS = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m',
+}
+
+
+def stats_query(task_id=None, period=None, since=None, until=None):
+    """One query for how well Tasks are kept up, from the Execution Windows
+    starting between since and until. There's a row for each Task, or for
+    each Task and period given one of STATS_PERIODS.
+
+    Each row has task_id, name, period (None without one), the number of
+    hit, missed, skipped and open windows, adherence (the share of the
+    closed windows that were hit), current_streak and longest_streak (runs
+    of hit windows in a row, which a missed or skipped window ends) and
+    mean_lateness (seconds from a window's start to the Execution that hit
+    it).
+
+    Streaks are gaps and islands: number the closed windows in order, and
+    again within each status, and the difference between the two numbers
+    stays the same along a run of one status"""
+    HIT = ExecutionWindowStatusEnum.HIT
+    OPEN = ExecutionWindowStatusEnum.OPEN
+
+    windows = select(
+        ExecutionWindow.id, ExecutionWindow.task_id, ExecutionWindow.status,
+        ExecutionWindow.start,
+        (func.strftime(STATS_PERIODS[period], ExecutionWindow.start)
+         if period else null()).label('period'))
+    if task_id is not None:
+        windows = windows.where(ExecutionWindow.task_id == task_id)
+    if since is not None:
+        windows = windows.where(ExecutionWindow.start >= since)
+    if until is not None:
+        windows = windows.where(ExecutionWindow.start < until)
+    windows = windows.cte('windows')
+    group = (windows.c.task_id, windows.c.period)
+    in_order = (windows.c.start, windows.c.id)
+
+    counts = select(*group, *(
+        func.sum(case((windows.c.status == status, 1), else_=0))
+        .label(status.value) for status in ExecutionWindowStatusEnum
+    )).group_by(*group).cte('counts')
+
+    position = func.row_number().over(partition_by=group, order_by=in_order)
+    closed = (
+        select(*group, windows.c.status, position.label('position'),
+               (position - func.row_number().over(
+                   partition_by=(*group, windows.c.status),
+                   order_by=in_order)).label('island'),
+               func.count().over(partition_by=group).label('closed'))
+        .where(windows.c.status != OPEN)
+        .cte('closed'))
+    runs = (
+        select(closed.c.task_id, closed.c.period, closed.c.status,
+               func.count().label('length'),
+               # The run that takes in the latest closed window is current
+               (func.max(closed.c.position) == func.max(closed.c.closed))
+               .label('is_current'))
+        .group_by(closed.c.task_id, closed.c.period, closed.c.status,
+                  closed.c.island)
+        .cte('runs'))
+    is_hit = runs.c.status == HIT
+    streaks = (
+        select(runs.c.task_id, runs.c.period,
+               func.max(case((and_(is_hit, runs.c.is_current),
+                              runs.c.length), else_=0))
+               .label('current_streak'),
+               func.max(case((is_hit, runs.c.length), else_=0))
+               .label('longest_streak'))
+        .group_by(runs.c.task_id, runs.c.period)
+        .cte('streaks'))
+
+    lateness = (
+        select(*group, func.avg(
+            (func.julianday(Execution.executed_at)
+             - func.julianday(windows.c.start)) * 86400
+        ).label('mean_lateness'))
+        .join(Execution, Execution.execution_window_id == windows.c.id)
+        .group_by(*group)
+        .cte('lateness'))
+
+    def same_group(other):
+        # IS rather than =, as period is NULL without a period
+        return and_(other.c.task_id == counts.c.task_id,
+                    other.c.period.is_not_distinct_from(counts.c.period))
+
+    closed_count = counts.c.hit + counts.c.missed + counts.c.skipped
+    return (
+        select(counts.c.task_id, Task.name, counts.c.period, counts.c.hit,
+               counts.c.missed, counts.c.skipped, counts.c.open,
+               (cast(counts.c.hit, Float) / func.nullif(closed_count, 0))
+               .label('adherence'),
+               func.coalesce(streaks.c.current_streak, 0)
+               .label('current_streak'),
+               func.coalesce(streaks.c.longest_streak, 0)
+               .label('longest_streak'),
+               lateness.c.mean_lateness)
+        .select_from(counts)
+        .join(Task, Task.id == counts.c.task_id)
+        .outerjoin(streaks, same_group(streaks))
+        .outerjoin(lateness, same_group(lateness))
+        .order_by(counts.c.task_id, counts.c.period))
+
+
+def get_stats(task_id=None, period=None, since=None, until=None,
+              session=None):
+    """Streams the rows of stats_query. Raises TaskNotFound if task_id is
+    given and there's no such Task"""
+    if task_id is not None:
+        get_task(task_id, session=session)
+    query = stats_query(task_id, period, since, until)
+    yield from _stream(query, None, session, scalars=False)
+
+
+def rollups_query(task_id=None, period='day', since=None, until=None):
+    """Executions and Execution Windows counted from the daily rollups, so
+    the cost goes with the number of days rather than the number of rows.
+    There's a row for each Task and period (one of STATS_PERIODS) between
+    the dates since and until.
+
+    Each row has task_id, name, period, executions, windows (the number
+    starting in the period), windows_hit and windows_missed"""
+    period_column = func.strftime(STATS_PERIODS[period], TaskDailyRollup.day)
+    query = (
+        select(TaskDailyRollup.task_id, Task.name,
+               period_column.label('period'),
+               *(func.sum(getattr(TaskDailyRollup, name)).label(name)
+                 for name in ROLLUP_COUNTS))
+        .join(Task, Task.id == TaskDailyRollup.task_id)
+        .group_by(TaskDailyRollup.task_id, period_column)
+        .order_by(TaskDailyRollup.task_id, period_column))
+    if task_id is not None:
+        query = query.where(TaskDailyRollup.task_id == task_id)
+    if since is not None:
+        query = query.where(TaskDailyRollup.day >= since)
+    if until is not None:
+        query = query.where(TaskDailyRollup.day < until)
+    return query
+
+
+def get_rollups(task_id=None, period='day', since=None, until=None,
+                session=None):
+    """Streams the rows of rollups_query. Raises TaskNotFound if task_id is
+    given and there's no such Task"""
+    if task_id is not None:
+        get_task(task_id, session=session)
+    query = rollups_query(task_id, period, since, until)
+    yield from _stream(query, None, session, scalars=False)
+
+
+def rebuild_rollups(task_id=None, session=None):
+    """Recounts the daily rollups from the history, for every Task or just
+    task_id, and returns how many rows they now have"""
+    with unit_of_work(session) as session:
+        clear, fill = rebuild_statements(task_id, has_archive(session))
+        session.execute(clear)
+        return session.execute(fill).rowcount
+
+
+def _stream(query, limit, session, scalars=True, batch_size=100):
+    if limit is not None:
+        query = query.limit(limit)
+    with unit_of_work(session) as session:
+        result = session.execute(
+            query.execution_options(yield_per=batch_size))
+        yield from result.scalars() if scalars else result
+
+
+def edit_task(task, session=None):
+    with unit_of_work(session) as session:
         session.add(task)
-        session.commit()
-    finally:
-        session.close()
-
-
-def get_frequency_by_task_id(task_id):
-    session = SessionLocal()
-    try:
-        return (session.query(Frequency)
-                .filter(Frequency.task_id == task_id).one())
-    except NoResultFound:
-        raise FrequencyNotFound(task_id)
-    finally:
-        session.close()
-
-
-def replace_frequency(frequency):
-    """ Task Frequency is stored as a polymorphic object
-    so changing it involves deleting the old one first"""
-    session = SessionLocal()
-    existing_frequency = (session.query(Frequency)
-                          .filter(Frequency.task_id == frequency.task_id)
-                          .one_or_none())
-
-    try:
-        if existing_frequency:
-            session.delete(existing_frequency)
-            session.commit()
+        session.flush()
+        invalidate_on_commit(session, f'task:{task.id}', 'tasks')
+
+
+def get_frequency_by_task_id(task_id, session=None):
+    with unit_of_work(session) as session:
+        try:
+            return cached(session, f'frequency:{task_id}',
+                          session.query(Frequency)
+                          .filter(Frequency.task_id == task_id).one)
+        except NoResultFound:
+            raise FrequencyNotFound(task_id)
+
+
+def replace_frequency(frequency, session=None):
+    """Sets the Task's Frequency to the given (new) one.
+
+    All Frequency types share one table, so if the Task already has one
+    this is a single UPDATE of its row, type and all, after which the given
+    Frequency becomes that row in the Session. Otherwise it's inserted.
+
+    Open Execution Windows generated from the old Frequency that haven't
+    started yet are deleted, and the Task's windows_generated_until is
+    reset, so generate_execution_windows follows the new one from now on"""
+    values = {'type': frequency.type}
+    for column in FREQUENCY_RULE_COLUMNS:
+        values[column] = getattr(frequency, column)
+    with unit_of_work(session) as session:
+        invalidate_on_commit(session, f'frequency:{frequency.task_id}',
+                             f'task:{frequency.task_id}')
+        frequency_id = session.execute(
+            update(Frequency.__table__)
+            .where(Frequency.task_id == frequency.task_id)
+            .values(**values)
+            .returning(Frequency.id)).scalar_one_or_none()
+        if frequency_id is None:
+            session.add(frequency)
+            session.flush()
+            return
+
+        session.execute(
+            delete(ExecutionWindow)
+            .where(and_(
+                ExecutionWindow.task_id == frequency.task_id,
+                ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
+                ExecutionWindow.start > datetime.utcnow()))
+            .execution_options(synchronize_session=False))
+        session.execute(
+            update(Task).where(Task.id == frequency.task_id)
+            .values(windows_generated_until=None)
+            .execution_options(synchronize_session=False))
+        # The deleted windows were counted, so recount the Task's rollups
+        for statement in rebuild_statements(frequency.task_id,
+                                            has_archive(session)):
+            session.execute(statement)
+
+        # Anything already loaded for the old row may be the wrong class now
+        old_frequency = session.identity_map.get(
+            identity_key(Frequency, frequency_id))
+        task = session.identity_map.get(
+            identity_key(Task, frequency.task_id))
+        if task is not None:
+            session.expire(task, ['frequency', 'windows_generated_until'])
+        if old_frequency is not None:
+            session.expunge(old_frequency)
+
+        frequency.id = frequency_id
+        for column, value in values.items():
+            setattr(frequency, column, value)
+        make_transient_to_detached(frequency)
         session.add(frequency)
-        session.commit()
-    finally:
-        session.close()
 
 
-def execute_task(task_id):
+def execute_task(task_id, session=None):
     """Creates an execution, also marks any open execution window as hit"""
-    session = SessionLocal()
     current_time = datetime.utcnow()
-
-    # The "hit" execution window is the one for this task that's currently open
-    hit_execution_window = session.query(ExecutionWindow).filter(
-        and_(
-            ExecutionWindow.task_id == task_id,
-            ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
-            ExecutionWindow.start <= current_time,
-            ExecutionWindow.end >= current_time
-            )
-        ).one_or_none()
-    execution = Execution(task_id=task_id)
-    try:
+    with unit_of_work(session) as session:
+        # The "hit" execution window is the one for this task that's currently
+        # open. Windows are half open, [start, end), so of two that meet the
+        # later one is hit at the moment they meet
+        hit_execution_window = session.query(ExecutionWindow).filter(
+            and_(
+                ExecutionWindow.task_id == task_id,
+                ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
+                ExecutionWindow.start <= current_time,
+                ExecutionWindow.end > current_time
+                )
+            ).order_by(ExecutionWindow.start).limit(1).one_or_none()
         if hit_execution_window:
             hit_execution_window.status = ExecutionWindowStatusEnum.HIT
-            execution.execution_window = hit_execution_window
-            session.add(hit_execution_window)
+        # Setting the window (even to None) means it's available without a
+        # reload once the Session is closed
+        execution = Execution(task_id=task_id, executed_at=current_time,
+                              execution_window=hit_execution_window)
         session.add(execution)
-        session.commit()
-        # Reload to get the execution window
-        execution = session.query(Execution).options(
-            joinedload(Execution.execution_window)
-        ).filter(Execution.id == execution.id).one()
+        session.flush()
+        # The cached Task is the one its new history will be read alongside
+        invalidate_on_commit(session, f'task:{task_id}')
+        record_execution(session, execution.id, task_id, current_time,
+                         execution.execution_window_id)
+        changes = [(task_id, current_time, 'executions')]
+        if hit_execution_window:
+            _record_execution_window(session, hit_execution_window)
+            changes.append((task_id, hit_execution_window.start,
+                            'windows_hit'))
+        add_to_rollups(session, changes)
         return execution
-    finally:
-        session.close()
+
+
+def execute_tasks(records, session=None):
+    """Bulk version of execute_task. Takes (task_id, executed_at) pairs, with
+    executed_at None meaning now, and returns (executions, windows hit).
+
+    The open Execution Windows for all of the records are found with one
+    query per chunk of Tasks and matched in Python, then the hits are
+    updated and the Executions inserted with executemany"""
+    current_time = datetime.utcnow()
+    records = sorted(
+        ((task_id, executed_at or current_time)
+         for task_id, executed_at in records),
+        key=lambda record: record[1])
+    if not records:
+        return 0, 0
+
+    task_ids = sorted({task_id for task_id, _ in records})
+    first = records[0][1]
+    last = records[-1][1]
+    with unit_of_work(session) as session:
+        windows_by_task = {}
+        for chunk in _chunks(task_ids, BULK_CHUNK_SIZE):
+            found_ids = set(session.scalars(
+                select(Task.id).where(Task.id.in_(chunk))))
+            for task_id in chunk:
+                if task_id not in found_ids:
+                    raise TaskNotFound(task_id)
+            open_windows = session.execute(
+                select(ExecutionWindow.id, ExecutionWindow.task_id,
+                       ExecutionWindow.start, ExecutionWindow.end)
+                .where(and_(
+                    ExecutionWindow.task_id.in_(chunk),
+                    ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
+                    ExecutionWindow.start <= last,
+                    ExecutionWindow.end > first))
+                .order_by(ExecutionWindow.start))
+            for window in open_windows:
+                windows_by_task.setdefault(window.task_id,
+                                           deque()).append(window)
+
+        # Like execute_task, an Execution hits an open window covering it,
+        # and once hit a window isn't open for the next Execution. Records
+        # are in time order, so windows that have ended can be dropped
+        hit_windows = {}
+        executions = []
+        for task_id, executed_at in records:
+            hit_window_id = None
+            windows = windows_by_task.get(task_id, ())
+            while windows and windows[0].end <= executed_at:
+                windows.popleft()
+            for window in windows:
+                if window.start > executed_at:
+                    break
+                if (window.end > executed_at
+                        and window.id not in hit_windows):
+                    hit_window_id = window.id
+                    hit_windows[window.id] = window
+                    break
+            executions.append({'task_id': task_id,
+                               'executed_at': executed_at,
+                               'execution_window_id': hit_window_id})
+
+        if hit_windows:
+            session.execute(update(ExecutionWindow), [
+                {'id': window_id, 'status': ExecutionWindowStatusEnum.HIT}
+                for window_id in hit_windows
+            ])
+        execution_ids = session.scalars(
+            insert(Execution).returning(Execution.id,
+                                        sort_by_parameter_order=True),
+            executions)
+        invalidate_on_commit(session,
+                             *(f'task:{task_id}' for task_id in task_ids))
+        for execution_id, execution in zip(execution_ids, executions):
+            record_execution(session, execution_id, **execution)
+        for window in hit_windows.values():
+            record_execution_window(session, window.id, window.task_id,
+                                    window.start, window.end,
+                                    ExecutionWindowStatusEnum.HIT)
+        add_to_rollups(session, [
+            *((execution['task_id'], execution['executed_at'], 'executions')
+              for execution in executions),
+            *((window.task_id, window.start, 'windows_hit')
+              for window in hit_windows.values())])
+        return len(executions), len(hit_windows)
+
+
+def sweep_missed_execution_windows(now=None, grace=timedelta(0),
+                                   batch_size=1000, session=None):
+    """Marks OPEN Execution Windows that ended before now - grace as MISSED,
+    batch_size at a time, and returns how many were marked.
+
+    Without a Session each batch is its own short transaction, so writers
+    running alongside only ever wait for one batch. The grace period leaves
+    time for late bulk imports of Executions to hit their windows."""
+    cutoff = (now or datetime.utcnow()) - grace
+    swept = 0
+    while True:
+        with unit_of_work(session) as batch_session:
+            batch = (select(ExecutionWindow.id)
+                     .where(and_(
+                         ExecutionWindow.status
+                         == ExecutionWindowStatusEnum.OPEN,
+                         ExecutionWindow.end < cutoff))
+                     .limit(batch_size))
+            missed = batch_session.execute(
+                update(ExecutionWindow)
+                .where(ExecutionWindow.id.in_(batch.scalar_subquery()))
+                .values(status=ExecutionWindowStatusEnum.MISSED)
+                .returning(ExecutionWindow.id, ExecutionWindow.task_id,
+                           ExecutionWindow.start, ExecutionWindow.end)
+                .execution_options(synchronize_session=False)).all()
+            for window in missed:
+                record_execution_window(batch_session, *window,
+                                        ExecutionWindowStatusEnum.MISSED)
+            add_to_rollups(batch_session, [
+                (window.task_id, window.start, 'windows_missed')
+                for window in missed])
+        swept += len(missed)
+        if len(missed) < batch_size:
+            return swept
+
+
+def archive_history(before, batch_size=1000, session=None):
+    """Moves the Executions from before `before`, and the HIT, MISSED and
+    SKIPPED Execution Windows that ended before it, into the archive (see
+    taskmaster.archive). Returns how many of each were moved. Raises
+    ArchiveNotAttached if there's no archive_path.
+
+    Each batch is copied in one transaction and deleted from the hot table
+    in the next, unless a Session is passed. SQLite in WAL mode only
+    commits atomically within each file, and this way a crash in between
+    leaves rows in both rather than in neither. The newest row in each
+    table is always kept, so SQLite never hands out an archived id again"""
+    with unit_of_work(session) as setup_session:
+        if not is_attached(setup_session):
+            raise ArchiveNotAttached()
+        create_archive(setup_session.connection())
+    executions = _archive(Execution, Execution.executed_at < before,
+                          batch_size, session)
+    # Windows still holding hot Executions stay too, for the foreign key
+    windows = _archive(ExecutionWindow, and_(
+        ExecutionWindow.status != ExecutionWindowStatusEnum.OPEN,
+        ExecutionWindow.end < before,
+        ~exists().where(Execution.execution_window_id == ExecutionWindow.id),
+    ), batch_size, session)
+    return executions, windows
+
+
+def _archive(model, condition, batch_size, session):
+    table = model.__table__
+    archived = ARCHIVED_TABLES[model]
+    newest = select(func.max(table.c.id)).scalar_subquery()
+    moved = 0
+    while True:
+        with unit_of_work(session) as batch_session:
+            ids = batch_session.scalars(
+                select(table.c.id).where(condition, table.c.id < newest)
+                .order_by(table.c.id).limit(batch_size)).all()
+            if ids:
+                batch_session.execute(
+                    insert(archived).prefix_with('OR REPLACE').from_select(
+                        [*table.c.keys()],
+                        select(table).where(table.c.id.in_(ids))))
+        if ids:
+            with unit_of_work(session) as batch_session:
+                batch_session.execute(
+                    delete(table).where(table.c.id.in_(ids)))
+        moved += len(ids)
+        if len(ids) < batch_size:
+            return moved
+
+
+def export_records(include_archived=False, batch_size=1000, session=None):
+    """Streams every Task, Frequency, Execution Window and Execution as
+    records for taskmaster.transfer.write_records, parents first and in id
+    order.
+    include_archived -- export the archived history too, as if it had
+    never been archived
+    """
+    archived_models = {model.__table__: model for model in ARCHIVED_TABLES}
+    with unit_of_work(session) as session:
+        archived = include_archived and has_archive(session)
+        for record_type, table in RECORD_TYPES.items():
+            if archived and table in archived_models:
+                table = history_table(archived_models[table])
+            rows = session.execute(
+                select(table).order_by(table.c.id)
+                .execution_options(yield_per=batch_size))
+            for row in rows.mappings():
+                yield to_record(record_type, row)
+
+
+def import_records(records, batch_size=5000, session=None):
+    """Inserts the (record type, row) pairs from
+    taskmaster.transfer.read_records, ids and all, with an executemany
+    INSERT for every batch_size rows of a type. Parents have to come before
+    their children, as they do in an export.
+
+    Everything goes in one transaction, or nothing does, and the rollups
+    are recounted at the end. Returns how many of each record type were
+    inserted. Raises ImportConflict if an id is taken or a parent is
+    missing"""
+    counts = dict.fromkeys(RECORD_TYPES, 0)
+    pending = {record_type: [] for record_type in RECORD_TYPES}
+    with unit_of_work(session) as session:
+
+        def flush():
+            # Parents first, for the foreign keys
+            for record_type, rows in pending.items():
+                if rows:
+                    session.execute(insert(RECORD_TYPES[record_type]), rows)
+                    counts[record_type] += len(rows)
+                    rows.clear()
+
+        try:
+            for record_type, row in records:
+                rows = pending[record_type]
+                rows.append(row)
+                if len(rows) == batch_size:
+                    flush()
+            flush()
+        except IntegrityError as e:
+            raise ImportConflict(e.orig)
+        for statement in rebuild_statements(archived=has_archive(session)):
+            session.execute(statement)
+        invalidate_on_commit(session, 'tasks')
+    return counts
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
 
 def generate_next_execution_window(task):
@@ -150,39 +753,149 @@ def generate_next_execution_window(task):
     return ExecutionWindow(task_id=task.id, start=start, end=end)
 
 
+def generate_execution_windows(horizon=timedelta(days=30), now=None,
+                               session=None):
+    """Pre-generates the Execution Windows each Task's Frequency calls for,
+    up to now + horizon, and returns how many were added.
+
+    Windows that would overlap one the Task already has are left out. Each
+    Task remembers how far ahead it has been generated, so a rerun only
+    looks at Tasks that are behind the new horizon and only generates the
+    windows beyond their mark. A Task that's never been generated, or has
+    fallen behind, starts from today, so it gets the window running now."""
+    now = now or datetime.utcnow()
+    # Windows are whole days, so the one running now started at midnight
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    until = now + horizon
+    added = 0
+    after = 0
+    with unit_of_work(session) as session:
+        while True:
+            # Tasks behind the horizon, a chunk at a time in id order
+            rows = session.execute(
+                select(Frequency, Task.windows_generated_until)
+                .join(Task, Task.id == Frequency.task_id)
+                .where(and_(
+                    Task.id > after,
+                    or_(Task.windows_generated_until.is_(None),
+                        Task.windows_generated_until < until)))
+                .order_by(Task.id)
+                .limit(BULK_CHUNK_SIZE)).all()
+            if not rows:
+                return added
+            after = rows[-1][0].task_id
+
+            candidates = []
+            generated_task_ids = []
+            for frequency, generated_until in rows:
+                # Tasks generated together share a rule and a range, so this
+                # is mostly served from the recurrence engine's cache
+                windows = windows_between(frequency_rule(frequency),
+                                          max(today, generated_until or today),
+                                          until)
+                generated_task_ids.append(frequency.task_id)
+                candidates.extend(
+                    ExecutionWindow(task_id=frequency.task_id, start=start,
+                                    end=end)
+                    for start, end in windows)
+
+            overlaps = find_overlapping_execution_windows(
+                candidates, open_only=False, session=session)
+            new_windows = [
+                {'task_id': window.task_id, 'start': window.start,
+                 'end': window.end, 'status': ExecutionWindowStatusEnum.OPEN}
+                for window, overlap in zip(candidates, overlaps)
+                if overlap is None
+            ]
+            if new_windows:
+                session.execute(insert(ExecutionWindow), new_windows)
+                add_to_rollups(session, [
+                    (window['task_id'], window['start'], 'windows')
+                    for window in new_windows])
+                added += len(new_windows)
+            if generated_task_ids:
+                invalidate_on_commit(session, *(
+                    f'task:{task_id}' for task_id in generated_task_ids))
+                session.execute(update(Task), [
+                    {'id': task_id, 'windows_generated_until': until}
+                    for task_id in generated_task_ids
+                ])
+
+
 def _get_execution_window_start_and_end(frequency, from_datetime):
     """Given the from_datetime, the Frequency determines when the start and end
-    of an execution window should be"""
-    if isinstance(frequency, DailyFrequency):
-        start = from_datetime + timedelta(days=1)
-        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = start + timedelta(days=1)
-        return start, end
-    else:
-        raise NotImplementedError(
-            f'Unsupport Frequency type {frequency.type}')
-
-
-def check_if_execution_window_overlaps(task, execution_window):
-    """We generally don't want overlaps"""
-    open_windows = [
-        x for x in task.execution_windows
-        if x.status == ExecutionWindowStatusEnum.OPEN
+    of the next execution window should be"""
+    return next_window(frequency_rule(frequency), from_datetime)
+
+
+def check_if_execution_window_overlaps(task, execution_window, session=None):
+    """We generally don't want overlaps. Returns an open Execution Window of
+    the Task that overlaps the given one, or None.
+
+    This is a range query on the (task_id, status, start, end) index, so the
+    Task's history never has to be loaded"""
+    with unit_of_work(session) as session:
+        return session.scalars(
+            select(ExecutionWindow)
+            .where(and_(
+                ExecutionWindow.task_id == task.id,
+                ExecutionWindow.status == ExecutionWindowStatusEnum.OPEN,
+                ExecutionWindow.start < execution_window.end,
+                ExecutionWindow.end > execution_window.start))
+            .order_by(ExecutionWindow.start.desc())
+            .limit(1)).one_or_none()
+
+
+def find_overlapping_execution_windows(execution_windows, open_only=True,
+                                       session=None):
+    """Batch version of check_if_execution_window_overlaps. Takes anything
+    with task_id, start and end, and returns the overlapping Execution
+    Window or None for each, in the same order.
+
+    Existing windows are loaded with one query per chunk of Tasks, bounded
+    to the span of the candidates, and each candidate is then checked
+    against an IntervalIndex of its Task's windows in O(log n).
+    open_only=False checks against windows of any status."""
+    execution_windows = [*execution_windows]
+    if not execution_windows:
+        return []
+    task_ids = sorted({window.task_id for window in execution_windows})
+    first_start = min(window.start for window in execution_windows)
+    last_end = max(window.end for window in execution_windows)
+
+    windows_by_task = {}
+    with unit_of_work(session) as session:
+        for chunk in _chunks(task_ids, BULK_CHUNK_SIZE):
+            query = select(ExecutionWindow).where(and_(
+                ExecutionWindow.task_id.in_(chunk),
+                ExecutionWindow.start < last_end,
+                ExecutionWindow.end > first_start))
+            if open_only:
+                query = query.where(ExecutionWindow.status
+                                    == ExecutionWindowStatusEnum.OPEN)
+            for window in session.scalars(query):
+                windows_by_task.setdefault(window.task_id, []).append(window)
+
+    indexes = {task_id: IntervalIndex(windows)
+               for task_id, windows in windows_by_task.items()}
+    empty = IntervalIndex([])
+    return [
+        indexes.get(window.task_id, empty).find_overlap(window.start,
+                                                        window.end)
+        for window in execution_windows
     ]
-    for window in open_windows:
-        # Check if there is any overlap (full or partial)
-        if (
-            execution_window.start < window.end
-            and execution_window.end > window.start
-        ):
-            return window
-    return None
-
-
-def add_execution_window(execution_window):
-    session = SessionLocal()
-    try:
+
+
+def add_execution_window(execution_window, session=None):
+    with unit_of_work(session) as session:
         session.add(execution_window)
-        session.commit()
-    finally:
-        session.close()
+        session.flush()
+        invalidate_on_commit(session, f'task:{execution_window.task_id}')
+        _record_execution_window(session, execution_window)
+        add_to_rollups(session, new_window_changes(execution_window))
+
+
+def _record_execution_window(session, execution_window):
+    record_execution_window(session, execution_window.id,
+                            execution_window.task_id, execution_window.start,
+                            execution_window.end, execution_window.status)
@@ -0,0 +1,127 @@
+"""
+Reading and writing the whole dataset as JSONL or CSV, for
+`taskmaster export` and `taskmaster import`.
+
+A dump is a stream of records, one per row, parents first: every Task,
+then every Frequency, Execution Window and Execution. Each record has a
+`record` field saying which of RECORD_TYPES it is, and the row's columns
+under their own names, ids included, so Frequency types and the links
+between Executions and their windows survive the round trip. Datetimes are
+ISO 8601 and enums are their values, as in the API.
+
+JSONL has one object per line. CSV has one header, the union of every
+type's columns, and leaves the columns a record doesn't have empty.
+
+Nothing here holds more than a row at a time. The service functions in
+taskmaster.taskmaster do the reading and inserting.
+"""
+import csv
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, Enum, Integer
+
+from taskmaster.models import Execution, ExecutionWindow, Frequency, Task
+from taskmaster.utils import from_iso
+
+
+# Record type: table, in the order they're written and inserted
+RECORD_TYPES = {
+    'task': Task.__table__,
+    'frequency': Frequency.__table__,
+    'execution_window': ExecutionWindow.__table__,
+    'execution': Execution.__table__,
+}
+
+FORMATS = ('jsonl', 'csv')
+
+CSV_FIELDS = ['record', *dict.fromkeys(
+    column.name for table in RECORD_TYPES.values()
+    for column in table.columns)]
+
+
+class InvalidRecord(Exception):
+    def __init__(self, line, error):
+        self.line = line
+        self.message = f'Invalid record on line {line}: {error!r}'
+        super().__init__(self.message)
+
+
+def _converters(column):
+    """(to the dump, from the dump) for a column's values, neither sees
+    None. Values from CSV are always strings"""
+    if isinstance(column.type, DateTime):
+        return datetime.isoformat, from_iso
+    if isinstance(column.type, Enum):
+        enum_class = column.type.enum_class
+        return (lambda member: member.value), enum_class
+    if isinstance(column.type, Integer):
+        return None, int
+    return None, None
+
+
+_CONVERTERS = {
+    record_type: [(column.name, *_converters(column))
+                  for column in table.columns]
+    for record_type, table in RECORD_TYPES.items()}
+
+
+def to_record(record_type, row):
+    """The record for a row (a mapping of column to value) of
+    record_type"""
+    record = {'record': record_type}
+    for name, to_dump, _ in _CONVERTERS[record_type]:
+        value = row[name]
+        record[name] = (to_dump(value)
+                        if to_dump and value is not None else value)
+    return record
+
+
+def from_record(record):
+    """(record type, row to insert) for a record read from a dump. Columns
+    that are missing are NULL, as are empty ones other than strings"""
+    record_type = record['record']
+    if record_type not in _CONVERTERS:
+        raise ValueError(f'Unknown record type {record_type!r}')
+    row = {}
+    for name, _, from_dump in _CONVERTERS[record_type]:
+        value = record.get(name)
+        if from_dump is None:
+            row[name] = value
+        elif value is None or value == '':
+            row[name] = None
+        else:
+            row[name] = from_dump(value)
+    return record_type, row
+
+
+def write_records(records, file, file_format):
+    """Writes records from to_record to a text file, returns how many"""
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(file, CSV_FIELDS)
+        writer.writeheader()
+        for count, record in enumerate(records, start=1):
+            writer.writerow(record)
+    else:
+        for count, record in enumerate(records, start=1):
+            file.write(json.dumps(record))
+            file.write('\n')
+    return count
+
+
+def read_records(file, file_format):
+    """Yields (record type, row) from a text file, see from_record. Raises
+    InvalidRecord with the line number of anything that can't be read"""
+    if file_format == 'csv':
+        rows = enumerate(csv.DictReader(file), start=2)
+    else:
+        rows = ((number, line)
+                for number, line in enumerate(file, start=1)
+                if line.strip())
+    for number, row in rows:
+        try:
+            yield from_record(row if file_format == 'csv'
+                              else json.loads(row))
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidRecord(number, e)
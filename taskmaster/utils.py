@@ -1,4 +1,29 @@
-from datetime import datetime
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+
+# The formats fuzzy_datetime_validator accepts, with a year
+DATED_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+# The same formats zero padded, which is nearly always how they come, and
+# can be built without strptime
+_PADDED = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?: (\d{2}):(\d{2}))?',
+                     re.ASCII)
+_PADDED_MONTH_DAY = re.compile(r'(\d{2})-(\d{2})', re.ASCII)
+
+# strptime allows unpadded numbers and any whitespace between the date and
+# time, but nothing else. Inputs with other characters (ISO 8601's T, say)
+# can't match any of the formats
+_MIGHT_MATCH = re.compile(r'[\d\s:-]+')
+
+# A month and day is at most 5 characters, a year and anything else at
+# least 8, so the length says which to try
+_MONTH_DAY_MAX_LENGTH = 5
+
+# Distinct inputs remembered, parsing the same dates over and over is
+# common in bulk imports and paging
+MEMO_SIZE = 4096
 
 
 def fuzzy_datetime_validator(input, raise_if_invalid=True):
@@ -9,28 +34,104 @@ def fuzzy_datetime_validator(input, raise_if_invalid=True):
     * '%Y-%m-%d' (will set 00:00 as time)
     * '%m-%d' (will set current year and 00:00 as time)
     """
-    date = None
-    try:
-        date = datetime.strptime(input, '%Y-%m-%d %H:%M')
-    except ValueError:
-        pass
+    if len(input) > _MONTH_DAY_MAX_LENGTH:
+        date = _parse_dated(input)
+    else:
+        date = _parse_month_day(input, datetime.now().year)
 
-    # This will assume 00:00 is the time
-    try:
-        date = datetime.strptime(input, '%Y-%m-%d')
-    except ValueError:
-        pass
+    if not date and raise_if_invalid:
+        raise ValueError(
+            f'Provided input {input} cannot be coerced to a datetime')
+
+    return date
 
-    # This will set the current year and assume 00:00 is the time
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _parse_dated(input):
+    match = _PADDED.fullmatch(input)
+    if match:
+        try:
+            return datetime(*(int(part) for part in match.groups()
+                              if part is not None))
+        except ValueError:
+            return None
+    if not _MIGHT_MATCH.fullmatch(input):
+        return None
+    for date_format in DATED_FORMATS:
+        try:
+            return datetime.strptime(input, date_format)
+        except ValueError:
+            pass
+    return None
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _parse_month_day(input, year):
+    """Keyed on the year too, so the memo doesn't outlast New Year"""
+    match = _PADDED_MONTH_DAY.fullmatch(input)
     try:
-        year = datetime.now().year
-        input_with_year = f'{year}-{input}'
-        date = datetime.strptime(input_with_year, '%Y-%m-%d')
+        if match:
+            return datetime(year, int(match[1]), int(match[2]))
+        return datetime.strptime(f'{year}-{input}', '%Y-%m-%d')
     except ValueError:
-        pass
+        return None
 
-    if not date and raise_if_invalid:
-        raise ValueError(
-            f'Provided input {input} cannot be coerced to a datetime')
 
+def parse_many(inputs, raise_if_invalid=True, iso=False):
+    """
+    fuzzy_datetime_validator for a column of inputs, returning a list of
+    datetimes in the same order. The current year is only looked up once,
+    and each distinct input is only parsed once.
+    iso -- also accept ISO 8601 timestamps, like parse_datetime
+    """
+    inputs = [*inputs]
+    year = None
+    dates = {}
+    for input in inputs:
+        if input in dates:
+            continue
+        if len(input) > _MONTH_DAY_MAX_LENGTH:
+            date = _parse_dated(input)
+        else:
+            year = year or datetime.now().year
+            date = _parse_month_day(input, year)
+        if date is None and iso:
+            try:
+                date = from_iso(input)
+            except ValueError:
+                pass
+        if date is None and raise_if_invalid:
+            if iso:
+                raise ValueError(f'Provided input {input} is not '
+                                 'YYYY-MM-DD, YYYY-MM-DD HH:mm or ISO 8601')
+            raise ValueError(
+                f'Provided input {input} cannot be coerced to a datetime')
+        dates[input] = date
+    return [dates[input] for input in inputs]
+
+
+def from_iso(input):
+    """datetime.fromisoformat, but a timestamp with an offset is converted
+    to UTC and the offset dropped, as every datetime is stored naive in
+    UTC. Raises ValueError if the input isn't ISO 8601"""
+    date = datetime.fromisoformat(input)
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+
+def parse_datetime(input):
+    """
+    Accepts everything fuzzy_datetime_validator does, plus full ISO 8601
+    timestamps such as '2024-10-01T09:30:00.123456'. Timestamps with an
+    offset come back in UTC, see from_iso.
+    Raises ValueError if the input is neither.
+    """
+    date = fuzzy_datetime_validator(input, raise_if_invalid=False)
+    if date is None:
+        try:
+            date = from_iso(input)
+        except ValueError:
+            raise ValueError(f'Provided input {input} is not YYYY-MM-DD, '
+                             'YYYY-MM-DD HH:mm or ISO 8601')
     return date
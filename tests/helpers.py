@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from taskmaster.database import dispose_engine, init_db
+
+
+class TemporaryDatabaseTestCase(unittest.TestCase):
+    """Points TaskMaster at a fresh SQLite file for each test"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.database_path = os.path.join(directory.name, 'taskmaster.sqlite')
+        environ = patch.dict(os.environ, {
+            'TASKMASTER_DATABASE_URL': f'sqlite:///{self.database_path}',
+        })
+        environ.start()
+        self.addCleanup(environ.stop)
+        dispose_engine()
+        self.addCleanup(dispose_engine)
+        init_db()
+
+    def attach_archive(self):
+        """Sets archive_path to a file next to the database, so it's attached
+        to connections from now on"""
+        self.archive_path = os.path.join(
+            os.path.dirname(self.database_path), 'archive.sqlite')
+        environ = patch.dict(os.environ,
+                             {'TASKMASTER_ARCHIVE_PATH': self.archive_path})
+        environ.start()
+        self.addCleanup(environ.stop)
+        dispose_engine()
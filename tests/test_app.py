@@ -0,0 +1,225 @@
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+from wsgiref.util import setup_testing_defaults
+
+from sqlalchemy import event
+
+from taskmaster.cache import Cache, MemoryBackend, configure_cache
+from taskmaster.database import get_engine
+from taskmaster.taskmaster import (archive_history, create_task,
+                                   get_dashboard)
+
+from tests.helpers import TemporaryDatabaseTestCase
+
+from website import templating
+from website.app import MAX_PAGE_SIZE, app, dashboard_context
+
+
+def request(method, path, body=None, query='', headers=None):
+    environ = {'REQUEST_METHOD': method, 'PATH_INFO': path,
+               'QUERY_STRING': query}
+    if body is not None:
+        data = json.dumps(body).encode('utf-8')
+        environ.update(CONTENT_LENGTH=str(len(data)),
+                       CONTENT_TYPE='application/json')
+        environ['wsgi.input'] = io.BytesIO(data)
+    environ.update(headers or {})
+    setup_testing_defaults(environ)
+
+    response = {}
+
+    def start_response(status, response_headers):
+        response['status'] = int(status.split()[0])
+        response['headers'] = dict(response_headers)
+
+    content = b''.join(app(environ, start_response))
+    response['content'] = content
+    headers = response['headers']
+    if headers.get('Content-Type', 'application/json') == 'application/json':
+        response['json'] = json.loads(content) if content else None
+    return response
+
+
+class TestTasksAPI(TemporaryDatabaseTestCase):
+
+    def test_create_and_show(self):
+        created = request('POST', '/api/tasks', {'name': 'Water plants'})
+        self.assertEqual(created['status'], 201)
+        task_id = created['json']['id']
+
+        shown = request('GET', f'/api/tasks/{task_id}')
+        self.assertEqual(shown['json']['name'], 'Water plants')
+        self.assertEqual(shown['json']['frequency']['type'], 'daily')
+        self.assertEqual(request('GET', '/api/tasks/999')['status'], 404)
+        self.assertEqual(request('POST', '/api/tasks', {})['status'], 400)
+        self.assertEqual(request('DELETE', '/api/tasks')['status'], 405)
+
+    def test_pagination(self):
+        for name in 'abc':
+            request('POST', '/api/tasks', {'name': name})
+
+        first = request('GET', '/api/tasks', query='limit=2')['json']
+        second = request('GET', '/api/tasks',
+                         query=f'limit=2&after={first["next"]}')['json']
+        self.assertEqual([t['name'] for t in first['tasks']], ['a', 'b'])
+        self.assertEqual([t['name'] for t in second['tasks']], ['c'])
+        self.assertIsNone(second['next'])
+        self.assertEqual(request('GET', '/api/tasks',
+                                 query=f'limit={MAX_PAGE_SIZE + 1}')['status'],
+                         400)
+
+    def test_schedule_and_execute(self):
+        task_id = request('POST', '/api/tasks', {'name': 'a'})['json']['id']
+        window = {'start': '2000-01-01 00:00', 'end': '2100-01-01 00:00'}
+        scheduled = request('POST', f'/api/tasks/{task_id}/windows', window)
+        self.assertEqual(scheduled['status'], 201)
+        self.assertEqual(request('POST', f'/api/tasks/{task_id}/windows',
+                                 window)['status'], 409)
+
+        executed = request('POST', f'/api/tasks/{task_id}/executions')
+        self.assertEqual(executed['json']['execution_window_id'],
+                         scheduled['json']['id'])
+        windows = request('GET', f'/api/tasks/{task_id}/windows')['json']
+        self.assertEqual(windows['items'][0]['status'], 'hit')
+
+    def test_offsets_are_converted_to_utc(self):
+        task_id = request('POST', '/api/tasks', {'name': 'a'})['json']['id']
+        window = {'start': '2024-01-01T10:00:00+02:00',
+                  'end': '2024-01-01 09:00'}
+
+        scheduled = request('POST', f'/api/tasks/{task_id}/windows', window)
+
+        self.assertEqual(scheduled['status'], 201)
+        self.assertTrue(scheduled['json']['start'].startswith(
+            '2024-01-01T08:00'))
+        window['end'] = '2024-01-01 08:00'
+        self.assertEqual(request('POST', f'/api/tasks/{task_id}/windows',
+                                 window)['status'], 400)
+
+    def test_conditional_get(self):
+        task_id = request('POST', '/api/tasks', {'name': 'a'})['json']['id']
+        path = f'/api/tasks/{task_id}/executions'
+        tag = request('GET', path)['headers']['ETag']
+
+        cached = request('GET', path, headers={'HTTP_IF_NONE_MATCH': tag})
+        self.assertEqual(cached['status'], 304)
+        self.assertIsNone(cached['json'])
+
+        request('POST', path)
+        changed = request('GET', path, headers={'HTTP_IF_NONE_MATCH': tag})
+        self.assertEqual(changed['status'], 200)
+        self.assertNotEqual(changed['headers']['ETag'], tag)
+
+    def test_stats(self):
+        task_id = request('POST', '/api/tasks', {'name': 'a'})['json']['id']
+        request('POST', f'/api/tasks/{task_id}/windows',
+                {'start': '2000-01-01', 'end': '2000-01-02'})
+        request('POST', f'/api/tasks/{task_id}/windows',
+                {'start': '2000-01-02', 'end': '2100-01-01'})
+        request('POST', f'/api/tasks/{task_id}/executions')
+
+        statements = []
+        event.listen(get_engine(), 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+        stats = request('GET', '/api/stats', query='period=month')
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual([(row['period'], row['hit'], row['open'])
+                          for row in stats['json']['stats']],
+                         [('2000-01', 1, 1)])
+        self.assertEqual(stats['json']['stats'][0]['adherence'], 1.0)
+        self.assertEqual(
+            request('GET', '/api/stats', query='period=year')['status'], 400)
+        self.assertEqual(
+            request('GET', '/api/stats', query='task=99')['status'], 404)
+
+    def test_archived_history(self):
+        self.attach_archive()
+        task_id = request('POST', '/api/tasks', {'name': 'a'})['json']['id']
+        for _ in range(2):
+            request('POST', f'/api/tasks/{task_id}/executions')
+        archive_history(datetime.utcnow())
+        path = f'/api/tasks/{task_id}/executions'
+
+        self.assertEqual(len(request('GET', path)['json']['items']), 1)
+        self.assertEqual(len(request('GET', path, query='archived=true')
+                             ['json']['items']), 2)
+        self.assertEqual(
+            request('GET', path, query='archived=maybe')['status'], 400)
+
+    def test_rollups(self):
+        task_id = request('POST', '/api/tasks', {'name': 'a'})['json']['id']
+        request('POST', f'/api/tasks/{task_id}/windows',
+                {'start': '2000-01-01', 'end': '2000-01-02'})
+        request('POST', f'/api/tasks/{task_id}/windows',
+                {'start': '2000-01-02', 'end': '2100-01-01'})
+        request('POST', f'/api/tasks/{task_id}/executions')
+
+        rollups = request('GET', '/api/rollups')['json']['rollups']
+
+        # The Execution is counted today, the window it hit on its start
+        self.assertEqual(
+            [(row['period'], row['executions'], row['windows'],
+              row['windows_hit']) for row in rollups[:2]],
+            [('2000-01-01', 0, 1, 0), ('2000-01-02', 0, 1, 1)])
+        self.assertEqual(rollups[2]['executions'], 1)
+        self.assertEqual(
+            request('GET', '/api/rollups', query='task=99')['status'], 404)
+
+    def test_cache_stats(self):
+        configure_cache(None)
+        self.assertEqual(request('GET', '/api/cache')['json'],
+                         {'enabled': False})
+
+        configure_cache(Cache(MemoryBackend()))
+        self.addCleanup(configure_cache, None)
+        task_id = request('POST', '/api/tasks', {'name': 'a'})['json']['id']
+        request('GET', f'/api/tasks/{task_id}')
+        request('GET', f'/api/tasks/{task_id}')
+        stats = request('GET', '/api/cache')['json']
+        self.assertEqual(
+            (stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+        self.assertEqual(stats['process'], os.getpid())
+
+
+class TestDashboard(TemporaryDatabaseTestCase):
+
+    def test_renders_in_one_query(self):
+        task_id = create_task('<b>a</b>').id
+        path = f'/api/tasks/{task_id}'
+        request('POST', f'{path}/windows',
+                {'start': '2000-01-01', 'end': '2100-01-01'})
+        request('POST', f'{path}/executions')
+        request('POST', f'{path}/windows',
+                {'start': '2099-01-01', 'end': '2099-01-02'})
+
+        statements = []
+        event.listen(get_engine(), 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+        response = request('GET', '/')
+
+        self.assertEqual(response['status'], 200)
+        self.assertEqual(len(statements), 1)
+        html = response['content'].decode()
+        self.assertIn('&lt;b&gt;a&lt;/b&gt;', html)
+        self.assertIn('Upcoming', html)
+        self.assertIn('daily', html)
+        self.assertEqual(request('GET', '/nowhere')['status'], 404)
+
+    def test_precompiled_templates(self):
+        for i in range(3):
+            create_task(f'Task {i}')
+        now = datetime.utcnow()
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.object(templating, 'COMPILED_DIR', directory):
+                templating.compile_templates()
+                compiled = templating.make_environment(compiled=True)
+            template = compiled.get_template('dashboard.html')
+            html = b''.join(templating.stream(
+                template, dashboard_context(get_dashboard(now), now)))
+
+        self.assertEqual(html.decode().count('<td>Task '), 3)
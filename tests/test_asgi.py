@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+from taskmaster import aio
+
+from tests.helpers import TemporaryDatabaseTestCase
+
+from website.asgi import app
+
+
+async def request(method, path, body=None, query='', headers=()):
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'query_string': query.encode('latin-1'),
+             'headers': [(name.encode('latin-1'), value.encode('latin-1'))
+                         for name, value in headers]}
+    messages = [{'type': 'http.request',
+                 'body': json.dumps(body).encode() if body else b''}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    headers = {name.decode(): value.decode()
+               for name, value in sent[0]['headers']}
+    content = b''.join(message['body'] for message in sent[1:])
+    json_body = headers.get('content-type') == 'application/json' and content
+    return {'status': sent[0]['status'], 'headers': headers,
+            'content': content,
+            'json': json.loads(content) if json_body else None}
+
+
+class TestASGIApp(TemporaryDatabaseTestCase):
+
+    def run_async(self, coroutine_function):
+        async def run():
+            try:
+                await coroutine_function()
+            finally:
+                await aio.dispose_async_engine()
+        asyncio.run(run())
+
+    def test_matches_the_wsgi_api(self):
+        async def scenario():
+            created = await request('POST', '/api/tasks', {'name': 'a'})
+            self.assertEqual(created['status'], 201)
+            task_id = created['json']['id']
+            shown = await request('GET', f'/api/tasks/{task_id}')
+            self.assertEqual(shown['json']['frequency']['type'], 'daily')
+            self.assertEqual(
+                (await request('GET', '/api/tasks/999'))['status'], 404)
+
+            window = {'start': '2000-01-01', 'end': '2100-01-01'}
+            scheduled = await request(
+                'POST', f'/api/tasks/{task_id}/windows', window)
+            executed = await request(
+                'POST', f'/api/tasks/{task_id}/executions')
+            self.assertEqual(executed['json']['execution_window_id'],
+                             scheduled['json']['id'])
+
+            path = f'/api/tasks/{task_id}/windows'
+            listed = await request('GET', path)
+            self.assertEqual(listed['json']['items'][0]['status'], 'hit')
+            cached = await request(
+                'GET', path,
+                headers=[('If-None-Match', listed['headers']['etag'])])
+            self.assertEqual(cached['status'], 304)
+
+            stats = await request('GET', '/api/stats',
+                                  query=f'task={task_id}')
+            self.assertEqual(stats['json']['stats'][0]['hit'], 1)
+            rollups = await request('GET', '/api/rollups',
+                                    query=f'task={task_id}&period=month')
+            self.assertEqual(
+                [(row['period'], row['windows_hit'])
+                 for row in rollups['json']['rollups']][0], ('2000-01', 1))
+
+            dashboard = await request('GET', '/')
+            self.assertIn(b'<td>a</td>', dashboard['content'])
+        self.run_async(scenario)
+
+    def test_writes_are_serialised(self):
+        async def scenario():
+            results = await asyncio.gather(*(
+                request('POST', '/api/tasks', {'name': f'Task {i}'})
+                for i in range(20)))
+            self.assertEqual({r['status'] for r in results}, {201})
+            tasks = await aio.get_tasks()
+            self.assertEqual(len(tasks), 20)
+        self.run_async(scenario)
+
+    def test_only_writing_waits_for_the_write_lock(self):
+        async def scenario():
+            task = await request('POST', '/api/tasks', {'name': 'a'})
+            path = f'/api/tasks/{task["json"]["id"]}/executions'
+            async with aio.unit_of_work(write=True):
+                # Looking up the Task comes before the lock
+                missing = await asyncio.wait_for(
+                    request('POST', '/api/tasks/999/executions'), 5)
+                self.assertEqual(missing['status'], 404)
+                executing = asyncio.ensure_future(request('POST', path))
+                await asyncio.sleep(0.1)
+                self.assertFalse(executing.done())
+            self.assertEqual((await executing)['status'], 201)
+        self.run_async(scenario)
+
+    def test_offsets_are_converted_to_utc(self):
+        async def scenario():
+            task = await request('POST', '/api/tasks', {'name': 'a'})
+            scheduled = await request(
+                'POST', f'/api/tasks/{task["json"]["id"]}/windows',
+                {'start': '2024-01-01T10:00:00+02:00',
+                 'end': '2024-01-01 09:00'})
+            self.assertEqual(scheduled['status'], 201)
+        self.run_async(scenario)
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import time
+import unittest
+
+from taskmaster.cache import (Cache, MISSING, MemoryBackend, SQLiteBackend,
+                              configure_cache)
+from taskmaster.database import unit_of_work
+from taskmaster.models import WeeklyFrequency
+from taskmaster.taskmaster import (create_task, edit_task,
+                                   get_frequency_by_task_id, get_task,
+                                   get_tasks, replace_frequency)
+
+from tests.helpers import TemporaryDatabaseTestCase
+
+
+class TestMemoryBackend(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        backend = MemoryBackend(max_entries=2)
+        backend.set('a', b'1')
+        backend.set('b', b'2')
+        backend.get('a')
+        backend.set('c', b'3')
+
+        self.assertIs(backend.get('b'), MISSING)
+        self.assertEqual(backend.get('a'), b'1')
+        self.assertEqual(backend.evictions, 1)
+
+    def test_expires_entries(self):
+        backend = MemoryBackend(ttl=0)
+        backend.set('a', b'1')
+        time.sleep(0.001)
+
+        self.assertIs(backend.get('a'), MISSING)
+
+
+class TestSQLiteBackend(unittest.TestCase):
+
+    def test_is_shared_through_the_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite')
+            SQLiteBackend(path).set('a', b'1')
+            backend = SQLiteBackend(path, max_entries=1)
+
+            self.assertEqual(backend.get('a'), b'1')
+            backend.set('b', b'2')
+            self.assertIs(backend.get('a'), MISSING)
+            self.assertEqual(backend.evictions, 1)
+
+
+class TestReadThroughCache(TemporaryDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = Cache(MemoryBackend())
+        configure_cache(self.cache)
+        self.addCleanup(configure_cache, None)
+
+    def test_serves_hits_without_the_database(self):
+        task = create_task('Some task')
+        get_task(task.id)
+        with unit_of_work() as session:
+            session.execute = session.scalars = None
+            cached_task = get_task(task.id, session=session)
+            self.assertEqual(cached_task.frequency.type.value, 'daily')
+
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_invalidates_after_commit(self):
+        task = create_task('Some task')
+        self.assertEqual([t.name for t in get_tasks()], ['Some task'])
+        get_frequency_by_task_id(task.id)
+
+        with unit_of_work() as session:
+            task = get_task(task.id, session=session)
+            task.name = 'Renamed'
+            edit_task(task, session=session)
+            replace_frequency(WeeklyFrequency(task_id=task.id, day_of_week=2),
+                              session=session)
+            # Not committed yet, so the cached values still stand
+            self.assertEqual(len(self.cache.backend), 3)
+
+        self.assertEqual([t.name for t in get_tasks()], ['Renamed'])
+        self.assertEqual(get_task(task.id).frequency.type.value, 'weekly')
+        self.assertEqual(get_frequency_by_task_id(task.id).day_of_week, 2)
+
+    def test_keeps_entries_after_rollback(self):
+        task_id = create_task('Some task').id
+        get_task(task_id)
+
+        with self.assertRaises(RuntimeError):
+            with unit_of_work() as session:
+                task = get_task(task_id, session=session)
+                task.name = 'Renamed'
+                edit_task(task, session=session)
+                raise RuntimeError('Boom')
+
+        self.assertEqual(get_task(task_id).name, 'Some task')
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_never_caches_uncommitted_values(self):
+        task_id = create_task('Some task').id
+
+        with self.assertRaises(RuntimeError):
+            with unit_of_work() as session:
+                task = get_task(task_id, session=session)
+                task.name = 'Dirty'
+                edit_task(task, session=session)
+                self.assertEqual(get_task(task_id, session=session).name,
+                                 'Dirty')
+                raise RuntimeError('Boom')
+
+        self.assertEqual(get_task(task_id).name, 'Some task')
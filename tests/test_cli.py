@@ -1,16 +1,27 @@
+import shlex
+import subprocess
+import sys
 import unittest
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 import click
 from click.testing import CliRunner
 
-from taskmaster.cli import list, new, cli
+from taskmaster.cli import COMMANDS, cli
+from taskmaster.commands.tasks import list, new
+from taskmaster.models import ExecutionWindow
+from taskmaster.taskmaster import (add_execution_window, create_task,
+                                   execute_tasks, get_execution_windows,
+                                   get_executions)
+
+from tests.helpers import TemporaryDatabaseTestCase
 
 class TestCliTasksListCommand(unittest.TestCase):
     
-    @patch('taskmaster.cli.get_tasks')
-    @patch('taskmaster.cli.click.echo')
+    @patch('taskmaster.commands.tasks.iter_tasks')
+    @patch('taskmaster.commands.tasks.click.echo')
     def test_list_command(self, mock_echo, mock_get_tasks):
-        # Mock the tasks that get_tasks() should return
+        # Mock the tasks that iter_tasks() should return
         mock_task_1 = MagicMock(id=1)
         mock_task_1.name = 'Task 1'
         mock_task_2 = MagicMock(id=2)
@@ -35,8 +46,8 @@ class TestCliTasksListCommand(unittest.TestCase):
 
 class TestCliTasksNewCommand(unittest.TestCase):
 
-    @patch('taskmaster.cli.create_task')
-    @patch('taskmaster.cli.click.echo')
+    @patch('taskmaster.commands.tasks.create_task')
+    @patch('taskmaster.commands.tasks.click.echo')
     def test_new_command(self, mock_echo, mock_create_task):
         task_name = 'Some task'
         mock_task_1 = MagicMock(id=1)
@@ -53,9 +64,11 @@ class TestCliTasksNewCommand(unittest.TestCase):
 
 class TestCliTaskShowCommand(unittest.TestCase):
 
-    @patch('taskmaster.cli.get_task')
-    @patch('taskmaster.cli.click.echo')
-    def test_task_group(self, mock_echo, mock_get_task):
+    @patch('taskmaster.commands.task.get_executions', return_value=[])
+    @patch('taskmaster.commands.task.get_execution_windows', return_value=[])
+    @patch('taskmaster.commands.task.get_task')
+    @patch('taskmaster.commands.task.click.echo')
+    def test_task_group(self, mock_echo, mock_get_task, *_):
         task_name = 'Some task'
         mock_task_1 = MagicMock(id=1)
         mock_task_1.name = task_name
@@ -65,3 +78,112 @@ class TestCliTaskShowCommand(unittest.TestCase):
         result = runner.invoke(cli, ['task', '1', 'show'])
 
         self.assertEqual(result.exit_code, 0)
+
+
+class TestCliTaskShowPaging(TemporaryDatabaseTestCase):
+
+    def test_pages_through_rows_sharing_a_datetime(self):
+        task = create_task('Some task')
+        at = datetime(2024, 1, 1, 9)
+        for hours in range(1, 4):
+            add_execution_window(ExecutionWindow(
+                task_id=task.id, start=at, end=at + timedelta(hours=hours)))
+        execute_tasks([(task.id, at)] * 3)
+
+        args = ['task', str(task.id), 'show', '--limit', '2']
+        windows, executions = [], []
+        for _ in range(3):
+            result = CliRunner().invoke(cli, args)
+            self.assertEqual(result.exit_code, 0, result.output)
+            section, hint = None, None
+            for line in result.output.splitlines():
+                if line.endswith('(latest first):'):
+                    section = windows if 'Windows' in line else executions
+                elif line.startswith('Older history: '):
+                    hint = line
+                elif line and section is not None:
+                    section.append(line)
+            if hint is None:
+                break
+            args = [*shlex.split(hint)[3:], '--limit', '2']
+
+        self.assertIsNone(hint)
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(len(set(windows)), 3)
+        self.assertEqual(executions, ['2024-01-01 09:00'] * 3)
+
+
+class TestCliTaskSchedule(TemporaryDatabaseTestCase):
+
+    def test_refuses_an_overlapping_window(self):
+        task = create_task('Some task')
+        add_execution_window(ExecutionWindow(
+            task_id=task.id, start=datetime(2024, 1, 1),
+            end=datetime(2024, 1, 2)))
+
+        result = CliRunner().invoke(cli, ['task', str(task.id), 'schedule'],
+                                    input='2024-01-01 12:00\n2024-01-02\n')
+
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIn('Overlaps Execution Window', result.output)
+        self.assertEqual(len([*get_execution_windows(task.id)]), 1)
+
+
+class TestCliLazyCommands(unittest.TestCase):
+
+    # More than this many modules imported for `taskmaster --help`, on top of
+    # click's own, means something heavy has crept back in
+    HELP_MODULE_BUDGET = 25
+
+    def test_short_help_matches_commands(self):
+        for name, (_, short_help) in COMMANDS.items():
+            with self.subTest(name):
+                command = cli.get_command(None, name)
+                self.assertEqual(command.name, name)
+                self.assertEqual(command.get_short_help_str(limit=1000),
+                                 short_help)
+
+    def test_help_imports_no_more_than_it_needs(self):
+        code = """
+import sys
+import click
+before = set(sys.modules)
+from taskmaster.cli import cli
+try:
+    cli(['--help'], prog_name='taskmaster')
+except SystemExit:
+    pass
+print(len(set(sys.modules) - before))
+print(','.join(name for name in sys.modules
+               if name.startswith(('sqlalchemy', 'taskmaster.'))))
+"""
+        result = subprocess.run([sys.executable, '-c', code], check=True,
+                                capture_output=True, text=True)
+        *help_text, count, heavy = result.stdout.splitlines()
+
+        self.assertIn('execute-batch', '\n'.join(help_text))
+        self.assertEqual(heavy, 'taskmaster.cli')
+        self.assertLessEqual(int(count), self.HELP_MODULE_BUDGET)
+
+    def test_unknown_command_is_still_an_error(self):
+        result = CliRunner().invoke(cli, ['nonsense'])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("No such command 'nonsense'", result.output)
+
+
+class TestCliExecuteBatch(TemporaryDatabaseTestCase):
+
+    def test_offsets_are_converted_to_utc(self):
+        task = create_task('Some task')
+        records = (f'{{"task_id": {task.id}, '
+                   '"executed_at": "2024-10-19T10:00:00+02:00"}\n'
+                   f'{{"task_id": {task.id}}}\n')
+
+        result = CliRunner().invoke(cli, ['execute-batch'], input=records)
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Added 2 Executions', result.output)
+        executed_at = [e.executed_at for e in get_executions(task.id)]
+        self.assertEqual(executed_at[-1], datetime(2024, 10, 19, 8))
+        self.assertIsNone(executed_at[0].tzinfo)
@@ -0,0 +1,100 @@
+import io
+import os
+import threading
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from taskmaster.cli import cli
+from taskmaster.client import (DaemonEnvironmentDiffers, DaemonNotRunning,
+                               main, send_command)
+from taskmaster.daemon import CommandServer
+
+from tests.helpers import TemporaryDatabaseTestCase
+
+
+class TestShell(TemporaryDatabaseTestCase):
+
+    def test_runs_each_line(self):
+        result = CliRunner().invoke(cli, ['shell'], input='\n'.join([
+            'tasks new "Water plants"',
+            'tasks list',
+            'task 99 show',
+            'shell',
+            'exit',
+        ]))
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Created 1 - Water plants', result.output)
+        self.assertIn('1 - Water plants', result.output)
+        self.assertIn('Task not found: Task ID 99', result.output)
+        self.assertIn("shell can't be run from the shell", result.output)
+
+
+class TestDaemon(TemporaryDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.socket_path = os.path.join(os.path.dirname(self.database_path),
+                                        'taskmaster-cli.sock')
+        server = CommandServer(self.socket_path, cli)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+
+    def send(self, *argv, stdin=None):
+        return send_command([*argv], stdin=stdin, path=self.socket_path)
+
+    def test_serves_commands(self):
+        self.assertEqual(self.send('tasks', 'new', 'Water plants'),
+                         (0, 'Created 1 - Water plants\n'))
+        self.assertEqual(self.send('tasks', 'list'),
+                         (0, '1 - Water plants\n'))
+        exit_code, output = self.send('task', '99', 'show')
+        self.assertEqual(exit_code, 1)
+        self.assertIn('Task not found', output)
+
+    def test_forwards_stdin_when_read(self):
+        self.send('tasks', 'new', 'Water plants')
+        stdin = io.BytesIO(b'{"task_id": 1}\n{"task_id": 1}\n')
+        exit_code, output = self.send('execute-batch', stdin=stdin)
+
+        self.assertEqual(exit_code, 0)
+        self.assertIn('Added 2 Executions', output)
+
+    def test_client_knows_when_nothing_is_listening(self):
+        with self.assertRaises(DaemonNotRunning):
+            send_command(['tasks', 'list'],
+                         path=self.socket_path + '.missing')
+
+    def test_client_environment_is_used(self):
+        self.send('tasks', 'new', 'Water plants')
+        output = io.StringIO()
+        socket_variable = {'TASKMASTER_DAEMON_SOCKET': self.socket_path}
+        with patch.dict(os.environ, socket_variable), \
+                patch('taskmaster.client._run_here') as run_here, \
+                redirect_stdout(output):
+            self.assertEqual(main(['tasks', 'list']), 0)
+            run_here.assert_not_called()
+            self.assertEqual(output.getvalue(), '1 - Water plants\n')
+
+            # Another config would mean another database
+            with patch.dict(os.environ, {'TASKMASTER_CONFIG': 'other.ini'}):
+                with self.assertRaises(DaemonEnvironmentDiffers):
+                    self.send('tasks', 'list')
+                main(['tasks', 'list'])
+            run_here.assert_called_once_with(['tasks', 'list'])
+
+    def test_commands_that_run_until_stopped_are_not_served(self):
+        exit_code, output = self.send('windows', 'sweep', '--loop')
+        self.assertEqual(exit_code, 2)
+        self.assertIn("can't be run by the daemon", output)
+
+        with patch('taskmaster.client.send_command') as send, \
+                patch('taskmaster.client._run_here') as run_here:
+            main(['windows', 'sweep', '--loop'])
+        send.assert_not_called()
+        run_here.assert_called_once_with(['windows', 'sweep', '--loop'])
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from taskmaster.database import (create_engine_from_config, get_config,
+                                 init_db, unit_of_work)
+from taskmaster.models import ExecutionWindow
+from taskmaster.taskmaster import (add_execution_window,
+                                   check_if_execution_window_overlaps,
+                                   create_task)
+
+from tests.helpers import TemporaryDatabaseTestCase
+
+
+class TestGetConfig(unittest.TestCase):
+
+    def test_defaults(self):
+        config = get_config(environ={})
+        self.assertEqual(config['echo'], 'false')
+        self.assertEqual(config['journal_mode'], 'WAL')
+
+    def test_environment_overrides_config_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ini',
+                                         delete=False) as config_file:
+            config_file.write('[taskmaster]\n'
+                              'database_url = sqlite:///from_file.sqlite\n'
+                              'busy_timeout = 100\n')
+        self.addCleanup(os.remove, config_file.name)
+
+        config = get_config(environ={
+            'TASKMASTER_CONFIG': config_file.name,
+            'TASKMASTER_BUSY_TIMEOUT': '250',
+        })
+
+        self.assertEqual(config['database_url'], 'sqlite:///from_file.sqlite')
+        self.assertEqual(config['busy_timeout'], '250')
+
+    def test_missing_config_file(self):
+        with self.assertRaises(FileNotFoundError):
+            get_config(environ={'TASKMASTER_CONFIG': '/does/not/exist.ini'})
+
+
+class TestCreateEngineFromConfig(unittest.TestCase):
+
+    def test_sqlite_pragmas(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        config = get_config(environ={
+            'TASKMASTER_DATABASE_URL':
+                f'sqlite:///{directory.name}/taskmaster.sqlite',
+        })
+        engine = create_engine_from_config(config)
+        self.addCleanup(engine.dispose)
+
+        self.assertFalse(engine.echo)
+        with engine.connect() as connection:
+            def pragma(name):
+                return connection.execute(text(f'PRAGMA {name}')).scalar()
+            self.assertEqual(pragma('journal_mode'), 'wal')
+            self.assertEqual(pragma('synchronous'), 1)  # NORMAL
+            self.assertEqual(pragma('foreign_keys'), 1)
+            self.assertEqual(pragma('busy_timeout'), 5000)
+
+
+class TestInitDb(unittest.TestCase):
+
+    def test_creates_tables(self):
+        engine = create_engine_from_config(
+            get_config(environ={'TASKMASTER_DATABASE_URL': 'sqlite://'}))
+        self.addCleanup(engine.dispose)
+
+        init_db(engine)
+
+        self.assertIn('execution_windows', inspect(engine).get_table_names())
+
+
+class TestUnitOfWork(TemporaryDatabaseTestCase):
+
+    def test_writes_check_and_add_one_at_a_time(self):
+        task = create_task('Some task')
+
+        def new_window():
+            return ExecutionWindow(task_id=task.id, start=datetime(2024, 1, 1),
+                                   end=datetime(2024, 1, 2))
+
+        overlaps = []
+
+        def check_and_add():
+            with unit_of_work(write=True) as session:
+                overlap = check_if_execution_window_overlaps(
+                    task, new_window(), session=session)
+                if overlap is None:
+                    add_execution_window(new_window(), session=session)
+                overlaps.append(overlap)
+        other = threading.Thread(target=check_and_add)
+
+        with unit_of_work(write=True) as session:
+            overlaps.append(check_if_execution_window_overlaps(
+                task, new_window(), session=session))
+            # The other Session can't check until this one has added
+            other.start()
+            other.join(0.2)
+            self.assertTrue(other.is_alive())
+            window = new_window()
+            add_execution_window(window, session=session)
+        other.join()
+
+        self.assertEqual([o and o.id for o in overlaps], [None, window.id])
+
+    def test_takes_the_lock_in_a_session_passed_in(self):
+        with unit_of_work() as session:
+            with unit_of_work(session, write=True):
+                connection = session.connection().connection
+                self.assertTrue(connection.dbapi_connection.in_transaction)
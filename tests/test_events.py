@@ -0,0 +1,140 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from taskmaster import aio
+from taskmaster.database import unit_of_work
+from taskmaster.events import (EXECUTION, EXECUTION_WINDOW, get_events,
+                               get_latest_event_id, prune_events)
+from taskmaster.models import ExecutionWindow
+from taskmaster.taskmaster import (add_execution_window, create_task,
+                                   execute_task, execute_tasks,
+                                   sweep_missed_execution_windows)
+
+from tests.helpers import TemporaryDatabaseTestCase
+
+from website.app import app as wsgi_app
+from website.asgi import app
+
+
+class TestRecording(TemporaryDatabaseTestCase):
+
+    def recorded_since(self, last_id):
+        events, reset_to = get_events(last_id)
+        self.assertIsNone(reset_to)
+        return [(e.type, json.loads(e.data).get('status')) for e in events]
+
+    def test_recorded_with_the_change(self):
+        task = create_task('Some task')
+        start = get_latest_event_id()
+        now = datetime.utcnow()
+        add_execution_window(ExecutionWindow(
+            task_id=task.id, start=now - timedelta(hours=1),
+            end=now + timedelta(hours=1)))
+        execute_task(task.id)
+
+        self.assertEqual(self.recorded_since(start), [
+            (EXECUTION_WINDOW, 'open'),
+            (EXECUTION, None),
+            (EXECUTION_WINDOW, 'hit'),
+        ])
+
+    def test_nothing_recorded_on_rollback(self):
+        task = create_task('Some task')
+        start = get_latest_event_id()
+        with self.assertRaises(RuntimeError):
+            with unit_of_work() as session:
+                execute_task(task.id, session=session)
+                raise RuntimeError('Boom')
+
+        self.assertEqual(self.recorded_since(start), [])
+
+    def test_bulk_writes_and_the_sweeper_are_recorded(self):
+        task = create_task('Some task')
+        now = datetime.utcnow()
+        for day in (1, 2):
+            add_execution_window(ExecutionWindow(
+                task_id=task.id, start=now - timedelta(days=day),
+                end=now - timedelta(days=day) + timedelta(hours=1)))
+        start = get_latest_event_id()
+        execute_tasks([(task.id, now - timedelta(days=1))])
+        sweep_missed_execution_windows(now=now)
+
+        self.assertEqual(self.recorded_since(start), [
+            (EXECUTION, None),
+            (EXECUTION_WINDOW, 'hit'),
+            (EXECUTION_WINDOW, 'missed'),
+        ])
+
+    def test_async_writes_are_recorded(self):
+        task = create_task('Some task')
+        start = get_latest_event_id()
+
+        async def execute():
+            try:
+                await aio.execute_task(task.id)
+            finally:
+                await aio.dispose_async_engine()
+        asyncio.run(execute())
+
+        self.assertEqual(self.recorded_since(start), [(EXECUTION, None)])
+
+    def test_reports_missed_events(self):
+        task = create_task('Some task')
+        for _ in range(3):
+            execute_task(task.id)
+        newest = get_latest_event_id()
+
+        self.assertEqual(prune_events(datetime.utcnow() + timedelta(1)), 2)
+        self.assertEqual(get_events(newest - 3), ([], newest))
+        self.assertEqual([e.id for e in get_events(newest - 1)[0]],
+                         [newest])
+        # An id from some other database
+        self.assertEqual(get_events(newest + 10), ([], newest))
+
+
+class TestEventStream(TemporaryDatabaseTestCase):
+
+    def test_streams_from_last_event_id(self):
+        start = get_latest_event_id()
+        task = create_task('Some task')
+        execute_task(task.id)
+
+        sent = []
+        streamed = asyncio.Event()
+        messages = [{'type': 'http.request'}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await streamed.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if b'event: execution' in message.get('body', b''):
+                streamed.set()
+
+        async def stream():
+            try:
+                await asyncio.wait_for(app(
+                    {'type': 'http', 'method': 'GET', 'path': '/api/events',
+                     'query_string': b'',
+                     'headers': [(b'last-event-id', str(start).encode())]},
+                    receive, send), 5)
+            finally:
+                await aio.dispose_async_engine()
+        asyncio.run(stream())
+
+        headers = dict(sent[0]['headers'])
+        self.assertEqual(headers[b'content-type'], b'text/event-stream')
+        self.assertEqual(sent[1]['body'], b'retry: 3000\n\n')
+        chunk = sent[2]['body'].decode()
+        self.assertIn(f'id: {start + 1}\nevent: execution\n', chunk)
+        self.assertIn(f'"task_id": {task.id}', chunk)
+
+    def test_not_served_by_the_wsgi_app(self):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/events'}
+        statuses = []
+        wsgi_app(environ, lambda status, headers: statuses.append(status))
+        self.assertEqual(statuses, ['404 Not Found'])
@@ -0,0 +1,41 @@
+import random
+import unittest
+from collections import namedtuple
+
+from taskmaster.intervals import IntervalIndex
+
+
+Interval = namedtuple('Interval', 'start end')
+
+
+class TestIntervalIndex(unittest.TestCase):
+
+    def test_find_overlap(self):
+        long_interval = Interval(1, 10)
+        index = IntervalIndex([Interval(12, 14), Interval(2, 3),
+                               long_interval])
+
+        self.assertEqual(index.find_overlap(5, 6), long_interval)
+        self.assertEqual(index.find_overlap(13, 20), Interval(12, 14))
+        self.assertIsNone(index.find_overlap(10, 12))  # Touching is fine
+        self.assertIsNone(index.find_overlap(0, 1))
+        self.assertIsNone(IntervalIndex([]).find_overlap(0, 1))
+
+    def test_matches_linear_scan(self):
+        rng = random.Random(0)
+        intervals = []
+        for _ in range(200):
+            start = rng.randint(0, 1000)
+            intervals.append(Interval(start, start + rng.randint(1, 50)))
+        index = IntervalIndex(intervals)
+
+        for _ in range(500):
+            start = rng.randint(0, 1050)
+            end = start + rng.randint(1, 20)
+            overlaps = [x for x in intervals
+                        if start < x.end and end > x.start]
+            found = index.find_overlap(start, end)
+            if overlaps:
+                self.assertIn(found, overlaps)
+            else:
+                self.assertIsNone(found)
@@ -0,0 +1,74 @@
+import calendar
+import unittest
+from datetime import datetime, timedelta
+
+from taskmaster.models import TaskFrequencyEnum, WeeklyFrequency
+from taskmaster.recurrence import (LAST_WEEK_OF_MONTH, frequency_rule,
+                                   next_window, windows_between)
+
+
+def brute_force_starts(rule, from_datetime, to_datetime):
+    """Checks every day in the range against the rule"""
+    kind = rule[0]
+    day = from_datetime.replace(hour=0, minute=0, second=0, microsecond=0)
+    starts = []
+    while day < to_datetime:
+        days_in_month = calendar.monthrange(day.year, day.month)[1]
+        if kind == TaskFrequencyEnum.DAILY:
+            matches = True
+        elif kind == TaskFrequencyEnum.WEEKLY:
+            matches = day.isoweekday() == rule[1]
+        elif kind == TaskFrequencyEnum.MONTHLY_DATE:
+            matches = day.day == min(rule[1], days_in_month)
+        else:
+            week_of_month, day_of_week = rule[1], rule[2]
+            if week_of_month == LAST_WEEK_OF_MONTH:
+                in_week = day.day + 7 > days_in_month
+            else:
+                in_week = (day.day - 1) // 7 + 1 == week_of_month
+            matches = in_week and day.isoweekday() == day_of_week
+        if matches and day >= from_datetime:
+            starts.append(day)
+        day += timedelta(days=1)
+    return starts
+
+
+class TestWindowsBetween(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rules = [(TaskFrequencyEnum.DAILY,)]
+        rules += [(TaskFrequencyEnum.WEEKLY, day) for day in range(1, 8)]
+        rules += [(TaskFrequencyEnum.MONTHLY_DATE, day)
+                  for day in (1, 15, 29, 30, 31)]
+        rules += [(TaskFrequencyEnum.MONTHLY_DAY, week, day)
+                  for week in (1, 2, 4, LAST_WEEK_OF_MONTH)
+                  for day in (1, 3, 7)]
+        from_datetime = datetime(2023, 12, 30, 13, 30)
+        to_datetime = datetime(2025, 3, 2)
+
+        for rule in rules:
+            with self.subTest(rule=rule):
+                windows = windows_between(rule, from_datetime, to_datetime)
+                self.assertEqual(
+                    [start for start, _ in windows],
+                    brute_force_starts(rule, from_datetime, to_datetime))
+                for start, end in windows:
+                    self.assertEqual(end - start, timedelta(days=1))
+
+    def test_range_is_half_open(self):
+        rule = (TaskFrequencyEnum.DAILY,)
+        windows = windows_between(rule, datetime(2024, 1, 1),
+                                  datetime(2024, 1, 3))
+        self.assertEqual([start.day for start, _ in windows], [1, 2])
+
+
+class TestNextWindow(unittest.TestCase):
+
+    def test_starts_on_a_later_day(self):
+        frequency = WeeklyFrequency(type=TaskFrequencyEnum.WEEKLY,
+                                    day_of_week=1)
+        # Monday the 1st of January 2024
+        start, end = next_window(frequency_rule(frequency),
+                                 datetime(2024, 1, 1, 9))
+        self.assertEqual((start, end),
+                         (datetime(2024, 1, 8), datetime(2024, 1, 9)))
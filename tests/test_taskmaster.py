@@ -0,0 +1,551 @@
+import asyncio
+import io
+import os
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+from taskmaster import aio
+from taskmaster.database import dispose_engine, init_db, unit_of_work
+from taskmaster.models import (DailyFrequency, Execution, ExecutionWindow,
+                               ExecutionWindowStatusEnum, MonthlyDayFrequency,
+                               WeeklyFrequency)
+from taskmaster.taskmaster import (ArchiveNotAttached, ImportConflict,
+                                   TaskNotFound, add_execution_window,
+                                   archive_history,
+                                   check_if_execution_window_overlaps,
+                                   create_task, execute_task, execute_tasks,
+                                   export_records,
+                                   find_overlapping_execution_windows,
+                                   generate_execution_windows,
+                                   get_execution_windows, get_executions,
+                                   get_frequency_by_task_id, get_rollups,
+                                   get_stats, get_task, get_tasks,
+                                   import_records, iter_tasks,
+                                   rebuild_rollups, replace_frequency,
+                                   sweep_missed_execution_windows)
+from taskmaster.transfer import InvalidRecord, read_records, write_records
+
+from tests.helpers import TemporaryDatabaseTestCase
+
+
+class TestUnitOfWork(TemporaryDatabaseTestCase):
+
+    def test_calls_share_one_transaction(self):
+        with unit_of_work() as session:
+            task = create_task('Some task', session=session)
+            now = datetime.utcnow()
+            add_execution_window(ExecutionWindow(
+                task_id=task.id, start=now - timedelta(hours=1),
+                end=now + timedelta(hours=1)), session=session)
+            execution = execute_task(task.id, session=session)
+
+        self.assertEqual(execution.execution_window.status,
+                         ExecutionWindowStatusEnum.HIT)
+        self.assertEqual(len(list(get_executions(task.id))), 1)
+
+    def test_rolls_back_everything_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with unit_of_work() as session:
+                create_task('Some task', session=session)
+                raise RuntimeError('Boom')
+
+        self.assertEqual(get_tasks(), [])
+
+
+class TestGetExecutions(TemporaryDatabaseTestCase):
+
+    def test_keyset_pagination(self):
+        task = create_task('Some task')
+        with unit_of_work() as session:
+            for day in range(5):
+                session.add(Execution(task_id=task.id,
+                                      executed_at=datetime(2024, 1, day + 1)))
+
+        first_page = list(get_executions(task.id, limit=2))
+        last = first_page[-1]
+        second_page = list(get_executions(
+            task.id, limit=2, before=(last.executed_at, last.id)))
+
+        self.assertEqual([e.executed_at.day for e in first_page], [5, 4])
+        self.assertEqual([e.executed_at.day for e in second_page], [3, 2])
+        self.assertEqual(
+            len(list(get_executions(task.id,
+                                    since=datetime(2024, 1, 4)))), 2)
+
+
+class TestIterTasks(TemporaryDatabaseTestCase):
+
+    def test_filters_and_pages(self):
+        for name in ('Water plants', 'Feed cat', 'Water lawn', '100% done'):
+            create_task(name)
+
+        self.assertEqual([tuple(row) for row in iter_tasks(name='water')],
+                         [(1, 'Water plants'), (3, 'Water lawn')])
+        self.assertEqual([row.id for row in iter_tasks(after=1, limit=2)],
+                         [2, 3])
+        self.assertEqual([row.id for row in iter_tasks(offset=3)], [4])
+        self.assertEqual([row.id for row in iter_tasks(name='0%')], [4])
+
+
+class TestExecuteTasks(TemporaryDatabaseTestCase):
+
+    def test_hits_each_open_window_once(self):
+        task = create_task('Some task')
+        other_task = create_task('Other task')
+        add_execution_window(ExecutionWindow(
+            task_id=task.id, start=datetime(2024, 1, 1),
+            end=datetime(2024, 1, 2)))
+
+        executions, hits = execute_tasks([
+            (task.id, datetime(2024, 1, 1, 12)),
+            (task.id, datetime(2024, 1, 1, 9)),
+            (other_task.id, datetime(2024, 1, 1, 10)),
+            (task.id, datetime(2024, 1, 3)),
+        ])
+
+        self.assertEqual((executions, hits), (4, 1))
+        hit = [e for e in get_executions(task.id) if e.execution_window_id]
+        self.assertEqual([e.executed_at for e in hit],
+                         [datetime(2024, 1, 1, 9)])
+
+    def test_windows_that_meet(self):
+        task = create_task('Some task')
+        midnight = datetime(2024, 1, 2)
+        for day in (1, 2):
+            add_execution_window(ExecutionWindow(
+                task_id=task.id, start=datetime(2024, 1, day),
+                end=datetime(2024, 1, day + 1)))
+        later, earlier = get_execution_windows(task.id)
+
+        with patch('taskmaster.taskmaster.datetime', wraps=datetime) as clock:
+            clock.utcnow.return_value = midnight
+            execution = execute_task(task.id)
+
+        # Windows are [start, end), so only the later one was running
+        self.assertEqual(execution.execution_window_id, later.id)
+        self.assertEqual(execute_tasks([(task.id, midnight)]), (1, 0))
+
+        other_task = create_task('Other task')
+        for day in (1, 2):
+            add_execution_window(ExecutionWindow(
+                task_id=other_task.id, start=datetime(2024, 1, day),
+                end=datetime(2024, 1, day + 1)))
+
+        async def execute():
+            try:
+                return await aio.execute_task(other_task.id)
+            finally:
+                await aio.dispose_async_engine()
+        with patch('taskmaster.aio.datetime', wraps=datetime) as clock:
+            clock.utcnow.return_value = midnight
+            execution = asyncio.run(execute())
+        self.assertEqual(execution.execution_window.start, midnight)
+
+    def test_unknown_task_records_nothing(self):
+        task = create_task('Some task')
+
+        with self.assertRaises(TaskNotFound):
+            execute_tasks([(task.id, None), (task.id + 1, None)])
+
+        self.assertEqual(list(get_executions(task.id)), [])
+
+
+class TestSweepMissedExecutionWindows(TemporaryDatabaseTestCase):
+
+    def test_marks_ended_open_windows_in_batches(self):
+        task = create_task('Some task')
+        now = datetime(2024, 1, 10)
+        with unit_of_work() as session:
+            for day in range(1, 12):
+                session.add(ExecutionWindow(
+                    task_id=task.id, start=datetime(2024, 1, day),
+                    end=datetime(2024, 1, day + 1),
+                    status=(ExecutionWindowStatusEnum.HIT if day == 1
+                            else ExecutionWindowStatusEnum.OPEN)))
+
+        swept = sweep_missed_execution_windows(
+            now=now, grace=timedelta(days=1), batch_size=3)
+
+        # The 2nd to 7th, the 8th ends right at the end of the grace period
+        self.assertEqual(swept, 6)
+        statuses = [window.status for window
+                    in get_execution_windows(task.id)]
+        self.assertEqual(statuses.count(ExecutionWindowStatusEnum.MISSED), 6)
+        self.assertEqual(statuses.count(ExecutionWindowStatusEnum.OPEN), 4)
+
+
+class TestGetStats(TemporaryDatabaseTestCase):
+
+    # One window a day through January 2024, then one in February
+    STATUSES = 'HHMHHHSHHHHMHHHHHHHHHHMMHHHHHHHO'
+
+    def setUp(self):
+        super().setUp()
+        self.task = create_task('Some task')
+        self.other_task = create_task('Other task')
+        with unit_of_work() as session:
+            for day, status in enumerate(self.STATUSES):
+                start = datetime(2024, 1, 1) + timedelta(days=day)
+                window = ExecutionWindow(
+                    task_id=self.task.id, start=start,
+                    end=start + timedelta(days=1),
+                    status=ExecutionWindowStatusEnum[{
+                        'H': 'HIT', 'M': 'MISSED', 'S': 'SKIPPED',
+                        'O': 'OPEN'}[status]])
+                session.add(window)
+                if status == 'H':
+                    # An hour late, or two on even days
+                    late = timedelta(hours=1 + (day % 2 == 0))
+                    session.add(Execution(task_id=self.task.id,
+                                          executed_at=start + late,
+                                          execution_window=window))
+
+    def test_per_task(self):
+        rows = [*get_stats()]
+
+        # The other Task has no windows at all
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual((row.task_id, row.name, row.period),
+                         (self.task.id, 'Some task', None))
+        self.assertEqual((row.hit, row.missed, row.skipped, row.open),
+                         (26, 4, 1, 1))
+        self.assertAlmostEqual(row.adherence, 26 / 31)
+        self.assertEqual((row.current_streak, row.longest_streak), (7, 10))
+        hits = [day for day, status in enumerate(self.STATUSES)
+                if status == 'H']
+        mean_hours = sum(1 + (day % 2 == 0) for day in hits) / len(hits)
+        self.assertAlmostEqual(row.mean_lateness, mean_hours * 3600,
+                               places=2)
+
+    def test_per_period(self):
+        january, february = get_stats(task_id=self.task.id, period='month')
+
+        self.assertEqual(january.period, '2024-01')
+        self.assertEqual((january.hit, january.open), (26, 0))
+        self.assertEqual((january.current_streak, january.longest_streak),
+                         (7, 10))
+        # Only an open window, which can't be hit or missed yet
+        self.assertEqual((february.period, february.open), ('2024-02', 1))
+        self.assertIsNone(february.adherence)
+        self.assertEqual(february.current_streak, 0)
+
+    def test_since_and_until(self):
+        row, = get_stats(since=datetime(2024, 1, 20),
+                         until=datetime(2024, 1, 25))
+
+        self.assertEqual((row.hit, row.missed), (3, 2))
+        # Ending on the two misses
+        self.assertEqual((row.current_streak, row.longest_streak), (0, 3))
+
+    def test_unknown_task(self):
+        with self.assertRaises(TaskNotFound):
+            [*get_stats(task_id=99)]
+
+
+class TestRollups(TemporaryDatabaseTestCase):
+
+    def counts(self, **kwargs):
+        return [(row.period, row.executions, row.windows, row.windows_hit,
+                 row.windows_missed) for row in get_rollups(**kwargs)]
+
+    def test_kept_up_as_history_is_written(self):
+        task = create_task('Some task')
+        for day in (1, 2):
+            add_execution_window(ExecutionWindow(
+                task_id=task.id, start=datetime(2024, 1, day),
+                end=datetime(2024, 1, day + 1)))
+        execute_tasks([(task.id, datetime(2024, 1, 1, 9)),
+                       (task.id, datetime(2024, 1, 1, 12)),
+                       (task.id, datetime(2024, 2, 5))])
+        sweep_missed_execution_windows(now=datetime(2024, 1, 10))
+
+        expected = [('2024-01-01', 2, 1, 1, 0),
+                    ('2024-01-02', 0, 1, 0, 1),
+                    ('2024-02-05', 1, 0, 0, 0)]
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(self.counts(period='month'),
+                         [('2024-01', 2, 2, 1, 1), ('2024-02', 1, 0, 0, 0)])
+        self.assertEqual(self.counts(since=date(2024, 1, 2),
+                                     until=date(2024, 2, 5)),
+                         expected[1:2])
+
+        # Recounting from the history changes nothing
+        self.assertEqual(rebuild_rollups(), 3)
+        self.assertEqual(self.counts(), expected)
+
+    def test_execute_task(self):
+        task = create_task('Some task')
+        now = datetime.utcnow()
+        add_execution_window(ExecutionWindow(
+            task_id=task.id, start=now - timedelta(hours=1),
+            end=now + timedelta(hours=1)))
+
+        execute_task(task.id)
+
+        row, = get_rollups(task_id=task.id, period='month')
+        self.assertEqual(
+            (row.executions, row.windows, row.windows_hit), (1, 1, 1))
+
+    def test_rebuild_counts_rows_written_directly(self):
+        task = create_task('Some task')
+        with unit_of_work() as session:
+            session.add(Execution(task_id=task.id,
+                                  executed_at=datetime(2024, 1, 1)))
+        self.assertEqual(self.counts(), [])
+
+        self.assertEqual(rebuild_rollups(task_id=task.id), 1)
+
+        self.assertEqual(self.counts(), [('2024-01-01', 1, 0, 0, 0)])
+
+    def test_unknown_task(self):
+        with self.assertRaises(TaskNotFound):
+            [*get_rollups(task_id=99)]
+
+
+class TestArchiveHistory(TemporaryDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.task = create_task('Some task')
+        for day in range(1, 6):
+            add_execution_window(ExecutionWindow(
+                task_id=self.task.id, start=datetime(2024, 1, day),
+                end=datetime(2024, 1, day + 1)))
+        execute_tasks([(self.task.id, datetime(2024, 1, day, 9))
+                       for day in (1, 2, 4)])
+        sweep_missed_execution_windows(now=datetime(2024, 1, 5, 12))
+
+    def ids(self, get_history, **kwargs):
+        return [row.id for row in get_history(self.task.id, **kwargs)]
+
+    def test_moves_old_history_in_batches(self):
+        self.attach_archive()
+        rollups = [tuple(row) for row in get_rollups()]
+
+        moved = archive_history(datetime(2024, 1, 3, 12), batch_size=1)
+
+        # Executions on the 1st and 2nd, the windows ending by the 3rd
+        self.assertEqual(moved, (2, 2))
+        self.assertEqual(self.ids(get_executions), [3])
+        self.assertEqual(self.ids(get_executions, include_archived=True),
+                         [3, 2, 1])
+        self.assertEqual(self.ids(get_execution_windows), [5, 4, 3])
+        self.assertEqual(
+            self.ids(get_execution_windows, include_archived=True,
+                     before=(datetime(2024, 1, 4), 0), limit=2), [3, 2])
+        # Rebuilding counts the archive too
+        rebuild_rollups()
+        self.assertEqual([tuple(row) for row in get_rollups()], rollups)
+
+    def test_keeps_open_windows_and_the_newest_rows(self):
+        self.attach_archive()
+
+        moved = archive_history(datetime(2025, 1, 1))
+
+        # The last Execution is the newest, and keeps its HIT window with it
+        self.assertEqual(moved, (2, 3))
+        self.assertEqual(self.ids(get_executions), [3])
+        self.assertEqual(
+            [window.status for window in get_execution_windows(self.task.id)],
+            [ExecutionWindowStatusEnum.OPEN, ExecutionWindowStatusEnum.HIT])
+        # So a new Execution doesn't reuse an archived id
+        self.assertEqual(execute_task(self.task.id).id, 4)
+
+    def test_without_an_archive(self):
+        with self.assertRaises(ArchiveNotAttached):
+            archive_history(datetime(2025, 1, 1))
+
+        self.assertEqual(self.ids(get_executions, include_archived=True),
+                         [3, 2, 1])
+
+
+class TestExportAndImport(TemporaryDatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.task = create_task('Some task')
+        replace_frequency(MonthlyDayFrequency(
+            task_id=self.task.id, week_of_month=-1, day_of_week=7))
+        create_task('Other task')
+        add_execution_window(ExecutionWindow(
+            task_id=self.task.id, start=datetime(2024, 1, 1),
+            end=datetime(2024, 1, 2)))
+        execute_tasks([(self.task.id, datetime(2024, 1, 1, 9, 30, 15, 5))])
+        generate_execution_windows(horizon=timedelta(days=1),
+                                   now=datetime(2024, 1, 1))
+
+    def export(self, file_format, **kwargs):
+        dump = io.StringIO()
+        write_records(export_records(**kwargs), dump, file_format)
+        return dump.getvalue()
+
+    def use_new_database(self, name):
+        path = f'{self.database_path}.{name}'
+        environ = patch.dict(os.environ,
+                             {'TASKMASTER_DATABASE_URL': f'sqlite:///{path}'})
+        environ.start()
+        self.addCleanup(environ.stop)
+        dispose_engine()
+        init_db()
+
+    def test_round_trip(self):
+        rollups = [tuple(row) for row in get_rollups()]
+        for file_format in ('jsonl', 'csv'):
+            with self.subTest(file_format):
+                dump = self.export(file_format)
+                self.use_new_database(file_format)
+
+                counts = import_records(read_records(
+                    io.StringIO(dump, newline=''), file_format),
+                    batch_size=2)
+
+                self.assertEqual(counts, {
+                    'task': 2, 'frequency': 2, 'execution_window': 2,
+                    'execution': 1})
+                self.assertEqual(self.export(file_format), dump)
+                frequency = get_frequency_by_task_id(self.task.id)
+                self.assertIsInstance(frequency, MonthlyDayFrequency)
+                execution, = get_executions(self.task.id)
+                hit = [window.id for window
+                       in get_execution_windows(self.task.id)
+                       if window.status == ExecutionWindowStatusEnum.HIT]
+                self.assertEqual(hit, [execution.execution_window_id])
+                self.assertEqual([tuple(row) for row in get_rollups()],
+                                 rollups)
+
+    def test_includes_archived_history(self):
+        self.attach_archive()
+        execute_task(self.task.id)
+        archive_history(datetime(2024, 1, 2))
+
+        self.assertEqual(self.export('jsonl').count('"execution"'), 1)
+        self.assertEqual(
+            self.export('jsonl', include_archived=True).count('"execution"'),
+            2)
+
+    def test_ids_already_taken(self):
+        dump = self.export('jsonl')
+
+        with self.assertRaises(ImportConflict):
+            import_records(read_records(io.StringIO(dump), 'jsonl'))
+
+        self.assertEqual(len(get_tasks()), 2)
+
+    def test_invalid_record(self):
+        dump = '{"record": "task", "id": 9, "name": "a"}\n\n{"record": "x"}'
+
+        with self.assertRaises(InvalidRecord) as raised:
+            import_records(read_records(io.StringIO(dump), 'jsonl'))
+
+        self.assertEqual(raised.exception.line, 3)
+        self.assertEqual(len(get_tasks()), 2)
+
+
+class TestGenerateExecutionWindows(TemporaryDatabaseTestCase):
+
+    def test_generates_missing_windows_incrementally(self):
+        task = create_task('Some task')
+        add_execution_window(ExecutionWindow(
+            task_id=task.id, start=datetime(2024, 1, 3),
+            end=datetime(2024, 1, 4)))
+        now = datetime(2024, 1, 1, 12)
+
+        added = generate_execution_windows(horizon=timedelta(days=4),
+                                           now=now)
+
+        # 1st to 5th of January, including the window running now, except
+        # the 3rd which was already there
+        self.assertEqual(added, 4)
+        self.assertEqual(get_task(task.id).windows_generated_until,
+                         datetime(2024, 1, 5, 12))
+        self.assertEqual(generate_execution_windows(
+            horizon=timedelta(days=4), now=now), 0)
+
+        added = generate_execution_windows(horizon=timedelta(days=5),
+                                           now=now)
+
+        self.assertEqual(added, 1)
+        starts = [window.start.day for window
+                  in get_execution_windows(task.id)]
+        self.assertEqual(starts, [6, 5, 4, 3, 2, 1])
+
+    def test_a_new_task_can_be_hit_today(self):
+        task = create_task('Some task')
+        generate_execution_windows(horizon=timedelta(days=1))
+
+        execution = execute_task(task.id)
+
+        self.assertIsNotNone(execution.execution_window_id)
+
+
+class TestOverlappingExecutionWindows(TemporaryDatabaseTestCase):
+
+    def test_single_and_batch_checks_agree(self):
+        task = create_task('Some task')
+        with unit_of_work() as session:
+            session.add_all([
+                ExecutionWindow(task_id=task.id, start=datetime(2024, 1, 1),
+                                end=datetime(2024, 1, 2)),
+                ExecutionWindow(task_id=task.id, start=datetime(2024, 1, 2),
+                                end=datetime(2024, 1, 3),
+                                status=ExecutionWindowStatusEnum.HIT),
+            ])
+        candidates = [
+            ExecutionWindow(task_id=task.id, start=datetime(2024, 1, 1, 12),
+                            end=datetime(2024, 1, 2, 12)),
+            ExecutionWindow(task_id=task.id, start=datetime(2024, 1, 2),
+                            end=datetime(2024, 1, 3)),
+        ]
+
+        overlaps = find_overlapping_execution_windows(candidates)
+
+        self.assertEqual([window and window.start for window in overlaps],
+                         [datetime(2024, 1, 1), None])
+        for candidate, overlap in zip(candidates, overlaps):
+            single = check_if_execution_window_overlaps(task, candidate)
+            self.assertEqual(single and single.id, overlap and overlap.id)
+        self.assertIsNotNone(find_overlapping_execution_windows(
+            candidates[1:], open_only=False)[0])
+
+
+class TestReplaceFrequency(TemporaryDatabaseTestCase):
+
+    def test_windows_follow_the_new_frequency(self):
+        task = create_task('Some task')
+        now = datetime.utcnow()
+        generate_execution_windows(horizon=timedelta(days=14), now=now)
+
+        replace_frequency(WeeklyFrequency(task_id=task.id, day_of_week=1))
+        added = generate_execution_windows(horizon=timedelta(days=14),
+                                           now=now)
+
+        # Only the daily window running now is left of the old ones, the
+        # rest are on Mondays
+        self.assertGreaterEqual(added, 2)
+        windows = [*get_execution_windows(task.id)]
+        self.assertEqual([window.start.weekday() for window in windows
+                          if window.start > now], [0] * added)
+        self.assertLessEqual(
+            sweep_missed_execution_windows(now=now + timedelta(days=1)), 1)
+        self.assertEqual(sum(row.windows for row in get_rollups()),
+                         len(windows))
+
+    def test_changes_type_in_place(self):
+        task = create_task('Some task')
+        frequency_id = task.frequency.id
+
+        with unit_of_work() as session:
+            loaded_task = get_task(task.id, session=session)
+            self.assertIsInstance(loaded_task.frequency, DailyFrequency)
+            new_frequency = WeeklyFrequency(task_id=task.id, day_of_week=3)
+            replace_frequency(new_frequency, session=session)
+
+            self.assertEqual(new_frequency.id, frequency_id)
+            self.assertIs(loaded_task.frequency, new_frequency)
+
+        frequency = get_frequency_by_task_id(task.id)
+        self.assertIsInstance(frequency, WeeklyFrequency)
+        self.assertEqual((frequency.id, frequency.day_of_week),
+                         (frequency_id, 3))
+        self.assertIsNone(frequency.day_of_month)
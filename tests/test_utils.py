@@ -0,0 +1,99 @@
+import itertools
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from taskmaster.utils import (fuzzy_datetime_validator, parse_datetime,
+                              parse_many)
+
+
+def strptime_every_format(input):
+    """fuzzy_datetime_validator as it was, trying each format in turn"""
+    date = None
+    for date_format in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            date = datetime.strptime(input, date_format)
+        except ValueError:
+            pass
+    try:
+        date = datetime.strptime(f'{datetime.now().year}-{input}',
+                                 '%Y-%m-%d')
+    except ValueError:
+        pass
+    return date
+
+
+class TestFuzzyDatetimeValidator(unittest.TestCase):
+
+    def test_documented_formats(self):
+        year = datetime.now().year
+        self.assertEqual(fuzzy_datetime_validator('2024-10-01 09:30'),
+                         datetime(2024, 10, 1, 9, 30))
+        self.assertEqual(fuzzy_datetime_validator('2024-10-01'),
+                         datetime(2024, 10, 1))
+        self.assertEqual(fuzzy_datetime_validator('10-01'),
+                         datetime(year, 10, 1))
+
+    def test_matches_strptime(self):
+        # Padded and unpadded numbers, out of range ones, and whatever else
+        # strptime lets through
+        parts = {
+            'year': ['2024', '0000', '24'],
+            'month': ['1', '01', '12', '13', '00'],
+            'day': ['1', '01', '29', '31', '32', ' 1'],
+            'time': ['', ' 09:30', ' 9:5', '  23:59', '\t00:00', ' 24:00',
+                     ' 12:60', 'T09:30', ' 09:30:00'],
+        }
+        inputs = [f'{month}-{day}' for month, day in itertools.product(
+            parts['month'], parts['day'])]
+        inputs += [f'{year}-{month}-{day}{time}'
+                   for year, month, day, time in itertools.product(
+                       *parts.values())]
+        inputs += ['', 'soon', '2024-10-01 ', '2024-10-01 09:30 ', '٢-٣']
+        for input in inputs:
+            with self.subTest(input=input):
+                self.assertEqual(
+                    fuzzy_datetime_validator(input, raise_if_invalid=False),
+                    strptime_every_format(input))
+
+    def test_month_day_takes_the_current_year(self):
+        fuzzy_datetime_validator('02-29', raise_if_invalid=False)
+        with patch('taskmaster.utils.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2028, 1, 1)
+            mock_datetime.side_effect = datetime
+            self.assertEqual(fuzzy_datetime_validator('02-29'),
+                             datetime(2028, 2, 29))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            fuzzy_datetime_validator('2024-02-30')
+        self.assertIsNone(fuzzy_datetime_validator('2024-02-30',
+                                                   raise_if_invalid=False))
+
+
+class TestParseDatetime(unittest.TestCase):
+
+    def test_offsets_are_converted_to_utc(self):
+        self.assertEqual(parse_datetime('2024-10-19T10:00:00+02:00'),
+                         datetime(2024, 10, 19, 8))
+        self.assertEqual(parse_datetime('2024-10-19T10:00:00Z'),
+                         datetime(2024, 10, 19, 10))
+        self.assertEqual(parse_many(['2024-10-19T10:00-01:30'], iso=True),
+                         [datetime(2024, 10, 19, 11, 30)])
+
+
+class TestParseMany(unittest.TestCase):
+
+    def test_matches_one_at_a_time(self):
+        inputs = ['2024-10-01 09:30', '10-01', '2024-10-01', '10-01', 'x']
+        self.assertEqual(
+            parse_many(iter(inputs), raise_if_invalid=False),
+            [fuzzy_datetime_validator(input, raise_if_invalid=False)
+             for input in inputs])
+
+    def test_iso(self):
+        inputs = ['2024-10-01T09:30:00.5', '2024-10-01']
+        self.assertEqual(parse_many(inputs, iso=True),
+                         [parse_datetime(input) for input in inputs])
+        with self.assertRaises(ValueError):
+            parse_many(inputs)
@@ -1,15 +1,440 @@
-from jinja2 import Environment, FileSystemLoader
+"""
+The TaskMaster website, a WSGI app for gunicorn.
 
-env = Environment(loader=FileSystemLoader('templates'))
+/ is the dashboard and /api/... is a JSON API, both over the functions in
+taskmaster.taskmaster. Each request runs in one unit of work, so it
+checks out one pooled connection and commits (or rolls back) once.
+
+API GET responses carry an ETag, so a client polling with If-None-Match
+gets an empty 304 when nothing has changed.
+
+The /api/events stream is only served by website/asgi.py, where a listener
+is a coroutine rather than a whole sync worker.
+"""
+import hashlib
+import json
+import re
+from datetime import datetime
+from itertools import chain
+from urllib.parse import parse_qs
+
+from taskmaster.cache import cache_stats
+from taskmaster.database import unit_of_work
+from taskmaster.models import ExecutionWindow
+from taskmaster.taskmaster import (STATS_PERIODS, TaskNotFound,
+                                   add_execution_window,
+                                   check_if_execution_window_overlaps,
+                                   create_task, execute_task,
+                                   get_dashboard, get_execution_windows,
+                                   get_executions, get_rollups, get_stats,
+                                   get_task, iter_tasks)
+from taskmaster.utils import parse_datetime
+
+from website.templating import env, stream
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BODY_SIZE = 64 * 1024
+
+STATUS_TEXT = {
+    200: 'OK',
+    201: 'Created',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    409: 'Conflict',
+    413: 'Payload Too Large',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=()):
+        self.status = status
+        self.message = message
+        self.headers = [*headers]
+        super().__init__(message)
+
+
+def _query_param(request, name, default=None):
+    values = request['query'].get(name)
+    return values[0] if values else default
+
+
+def _page_size(request):
+    limit = _query_param(request, 'limit')
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise HTTPError(400, 'limit must be a whole number')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPError(400, f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit
+
+
+def _datetime_param(request, name):
+    value = _query_param(request, name)
+    if value is None:
+        return None
+    try:
+        return parse_datetime(value)
+    except ValueError as e:
+        raise HTTPError(400, f'{name}: {e}')
+
+
+def _flag_param(request, name):
+    value = _query_param(request, name, 'false').lower()
+    if value not in ('true', 'false'):
+        raise HTTPError(400, f'{name} must be true or false')
+    return value == 'true'
+
+
+def _cursor_param(request):
+    """Keyset cursors for history look like <ISO datetime>,<id>"""
+    value = _query_param(request, 'before')
+    if value is None:
+        return None
+    try:
+        at, _, row_id = value.rpartition(',')
+        return parse_datetime(at), int(row_id)
+    except ValueError:
+        raise HTTPError(400, 'before must look like <datetime>,<id>')
+
+
+def _json_body(request):
+    environ = request['environ']
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        raise HTTPError(400, 'Invalid Content-Length')
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, 'Request body is too large')
+    return parse_json_body(environ['wsgi.input'].read(length) if length
+                           else b'')
+
+
+def parse_json_body(data):
+    """The request body as a dict, an empty body being an empty one"""
+    if not data:
+        return {}
+    try:
+        body = json.loads(data)
+    except ValueError:
+        raise HTTPError(400, 'Request body must be JSON')
+    if not isinstance(body, dict):
+        raise HTTPError(400, 'Request body must be a JSON object')
+    return body
+
+
+def _datetime_json(value):
+    return value.isoformat() if value else None
+
+
+def task_json(task):
+    frequency = task.frequency
+    return {
+        'id': task.id,
+        'name': task.name,
+        'frequency': frequency and {
+            'type': frequency.type.value,
+            'day_of_week': frequency.day_of_week,
+            'day_of_month': frequency.day_of_month,
+            'week_of_month': frequency.week_of_month,
+        },
+        'windows_generated_until': _datetime_json(
+            task.windows_generated_until),
+    }
+
+
+def execution_json(execution):
+    return {
+        'id': execution.id,
+        'task_id': execution.task_id,
+        'executed_at': _datetime_json(execution.executed_at),
+        'execution_window_id': execution.execution_window_id,
+    }
+
+
+def execution_window_json(execution_window):
+    return {
+        'id': execution_window.id,
+        'task_id': execution_window.task_id,
+        'start': _datetime_json(execution_window.start),
+        'end': _datetime_json(execution_window.end),
+        'status': execution_window.status.value,
+    }
+
+
+def stats_json(row):
+    return {
+        'task_id': row.task_id,
+        'name': row.name,
+        'period': row.period,
+        'hit': row.hit,
+        'missed': row.missed,
+        'skipped': row.skipped,
+        'open': row.open,
+        'adherence': row.adherence,
+        'current_streak': row.current_streak,
+        'longest_streak': row.longest_streak,
+        'mean_lateness_seconds': row.mean_lateness,
+    }
+
+
+def rollups_json(row):
+    return {
+        'task_id': row.task_id,
+        'name': row.name,
+        'period': row.period,
+        'executions': row.executions,
+        'windows': row.windows,
+        'windows_hit': row.windows_hit,
+        'windows_missed': row.windows_missed,
+    }
+
+
+def stats_params(request):
+    """The get_stats arguments from the query string"""
+    task_id = _query_param(request, 'task')
+    period = _query_param(request, 'period')
+    if period is not None and period not in STATS_PERIODS:
+        raise HTTPError(400, 'period must be one of '
+                        + ', '.join(STATS_PERIODS))
+    try:
+        task_id = None if task_id is None else int(task_id)
+    except ValueError:
+        raise HTTPError(400, 'task must be a Task ID')
+    return {'task_id': task_id, 'period': period,
+            'since': _datetime_param(request, 'since'),
+            'until': _datetime_param(request, 'until')}
+
+
+def _task(task_id, session):
+    try:
+        return get_task(task_id, session=session)
+    except TaskNotFound as e:
+        raise HTTPError(404, e.message)
+
+
+def list_tasks(request, session):
+    limit = _page_size(request)
+    try:
+        after = int(_query_param(request, 'after', 0))
+    except ValueError:
+        raise HTTPError(400, 'after must be a Task ID')
+    name = _query_param(request, 'name')
+    tasks = [{'id': task_id, 'name': task_name}
+             for task_id, task_name in iter_tasks(
+                 limit=limit, after=after, name=name, session=session)]
+    return 200, {
+        'tasks': tasks,
+        'next': tasks[-1]['id'] if len(tasks) == limit else None,
+    }
+
+
+def new_task(request, session):
+    name = _json_body(request).get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise HTTPError(400, 'name is required')
+    return 201, task_json(create_task(name.strip(), session=session))
+
+
+def show_task(request, session, task_id):
+    return 200, task_json(_task(task_id, session))
+
+
+def _history(request, session, task_id, get_history, to_json, cursor_of):
+    _task(task_id, session)
+    limit = _page_size(request)
+    rows = [*get_history(task_id, limit=limit,
+                         since=_datetime_param(request, 'since'),
+                         before=_cursor_param(request),
+                         include_archived=_flag_param(request, 'archived'),
+                         session=session)]
+    next_cursor = None
+    if len(rows) == limit:
+        at, row_id = cursor_of(rows[-1])
+        next_cursor = f'{at.isoformat()},{row_id}'
+    return 200, {'items': [to_json(row) for row in rows],
+                 'next': next_cursor}
+
+
+def list_executions(request, session, task_id):
+    return _history(request, session, task_id, get_executions,
+                    execution_json,
+                    lambda execution: (execution.executed_at, execution.id))
+
+
+def new_execution(request, session, task_id):
+    _task(task_id, session)
+    return 201, execution_json(execute_task(task_id, session=session))
+
+
+def list_execution_windows(request, session, task_id):
+    return _history(request, session, task_id, get_execution_windows,
+                    execution_window_json,
+                    lambda window: (window.start, window.id))
+
+
+def new_execution_window(request, session, task_id):
+    task = _task(task_id, session)
+    body = _json_body(request)
+    try:
+        start = parse_datetime(str(body['start']))
+        end = parse_datetime(str(body['end']))
+    except KeyError as e:
+        raise HTTPError(400, f'{e.args[0]} is required')
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    if end <= start:
+        raise HTTPError(400, 'end must be after start')
+
+    execution_window = ExecutionWindow(task_id=task.id, start=start, end=end)
+    # Another worker can't add an overlapping window between the check and
+    # the insert
+    with unit_of_work(session, write=True):
+        overlap = check_if_execution_window_overlaps(task, execution_window,
+                                                     session=session)
+        if overlap is not None:
+            raise HTTPError(409, f'Overlaps Execution Window {overlap.id}')
+        add_execution_window(execution_window, session=session)
+    return 201, execution_window_json(execution_window)
+
+
+def show_stats(request, session):
+    try:
+        rows = [*get_stats(**stats_params(request), session=session)]
+    except TaskNotFound as e:
+        raise HTTPError(404, e.message)
+    return 200, {'stats': [stats_json(row) for row in rows]}
+
+
+def show_rollups(request, session):
+    params = stats_params(request)
+    params['period'] = params['period'] or 'day'
+    try:
+        rows = [*get_rollups(**params, session=session)]
+    except TaskNotFound as e:
+        raise HTTPError(404, e.message)
+    return 200, {'rollups': [rollups_json(row) for row in rows]}
+
+
+def show_cache(request, session):
+    return 200, cache_stats()
+
+
+ROUTES = [
+    (re.compile(r'/api/tasks/?'),
+     {'GET': list_tasks, 'POST': new_task}),
+    (re.compile(r'/api/tasks/(\d+)/?'),
+     {'GET': show_task}),
+    (re.compile(r'/api/tasks/(\d+)/executions/?'),
+     {'GET': list_executions, 'POST': new_execution}),
+    (re.compile(r'/api/tasks/(\d+)/windows/?'),
+     {'GET': list_execution_windows, 'POST': new_execution_window}),
+    (re.compile(r'/api/stats/?'),
+     {'GET': show_stats}),
+    (re.compile(r'/api/rollups/?'),
+     {'GET': show_rollups}),
+    (re.compile(r'/api/cache/?'),
+     {'GET': show_cache}),
+]
+
+
+def _route(method, path, routes=ROUTES):
+    for pattern, handlers in routes:
+        match = pattern.fullmatch(path)
+        if match is None:
+            continue
+        handler = handlers.get('GET' if method == 'HEAD' else method)
+        if handler is None:
+            raise HTTPError(405, f'{method} is not allowed here',
+                            [('Allow', ', '.join(handlers))])
+        return handler, [int(arg) for arg in match.groups()]
+    raise HTTPError(404, f'No such resource {path}')
+
+
+def etag(body):
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _not_modified(environ, tag):
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    # Weak comparison is what If-None-Match calls for
+    candidates = {candidate.strip().removeprefix('W/')
+                  for candidate in if_none_match.split(',')}
+    return tag in candidates or '*' in candidates
+
+
+def api(environ, start_response):
+    method = environ['REQUEST_METHOD']
+    request = {
+        'environ': environ,
+        'query': parse_qs(environ.get('QUERY_STRING', '')),
+    }
+    headers = [('Content-Type', 'application/json')]
+    try:
+        handler, args = _route(method, environ.get('PATH_INFO', ''))
+        with unit_of_work() as session:
+            status, data = handler(request, session, *args)
+    except HTTPError as e:
+        status, data = e.status, {'error': e.message}
+        headers.extend(e.headers)
+
+    body = json.dumps(data).encode('utf-8')
+    if method in ('GET', 'HEAD') and status == 200:
+        tag = etag(body)
+        headers.extend([('ETag', tag), ('Cache-Control', 'no-cache')])
+        if _not_modified(environ, tag):
+            start_response('304 Not Modified', headers[1:])
+            return []
+    headers.append(('Content-Length', str(len(body))))
+    start_response(f'{status} {STATUS_TEXT[status]}', headers)
+    return [] if method == 'HEAD' else [body]
+
+
+def dashboard_context(rows, now):
+    """Splits the rows of get_dashboard into the template's sections. The
+    windows and executions are few and come first, so they're read up
+    front, and the Tasks are left streaming from the database"""
+    rows = iter(rows)
+    context = {'now': now, 'windows': [], 'executions': [], 'tasks': []}
+    for row in rows:
+        if row.section == 1:
+            context['windows'].append(row)
+        elif row.section == 2:
+            context['executions'].append(row)
+        else:
+            context['tasks'] = chain([row], rows)
+            break
+    return context
+
+
+def dashboard(environ, start_response):
+    now = datetime.utcnow()
+    template = env.get_template('dashboard.html')
+
+    def body():
+        with unit_of_work() as session:
+            context = dashboard_context(get_dashboard(now, session=session),
+                                        now)
+            yield from stream(template, context)
+
+    start_response('200 OK', [('Content-Type', 'text/html; charset=utf-8')])
+    return body()
 
 
 def app(environ, start_response):
-    template = env.get_template('hello.html')
-    content = 'Hello, World, this is TaskMaster!'
-    data = {'content': content}
-    html_output = template.render(data)
-    byte_output = html_output.encode("utf-8")
-    status = '200 OK'
-    headers = [('Content-Type', 'text/html; charset=utf-8')]
-    start_response(status, headers)
-    return [byte_output]
+    path = environ.get('PATH_INFO', '')
+    if path.startswith('/api/'):
+        return api(environ, start_response)
+    if path == '/':
+        return dashboard(environ, start_response)
+
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'Not Found']
@@ -0,0 +1,357 @@
+"""
+The TaskMaster website as an ASGI app, for uvicorn.
+
+It serves the same dashboard and JSON API as the WSGI app in app.py, with
+the same routes, templates, JSON, ETags and errors, but over the async
+functions in taskmaster.aio. One process can then keep many slow clients
+going at once. Writes still happen one at a time.
+
+Only this app serves the /api/events stream, which polls the events table
+(see taskmaster.events) for each listener.
+
+    uvicorn website.asgi:app
+"""
+import asyncio
+import json
+import re
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from taskmaster import aio
+from taskmaster.cache import cache_stats
+from taskmaster.events import EVENT_BATCH_SIZE
+from taskmaster.models import ExecutionWindow
+from taskmaster.taskmaster import TaskNotFound
+from taskmaster.utils import parse_datetime
+
+from website.app import (HTTPError, MAX_BODY_SIZE, _cursor_param,
+                         _datetime_param, _flag_param, _not_modified,
+                         _page_size, _query_param, _route, dashboard_context,
+                         etag, execution_json, execution_window_json,
+                         parse_json_body, rollups_json, stats_json,
+                         stats_params, task_json)
+from website.templating import env, stream
+
+
+# Seconds between looks for new events, and between comments on an idle
+# event stream, which stop proxies closing it
+EVENT_POLL_INTERVAL = 1
+EVENT_KEEPALIVE = 15
+
+EVENT_STREAM_HEADERS = [
+    ('Content-Type', 'text/event-stream'),
+    ('Cache-Control', 'no-cache'),
+    # Stops nginx buffering the stream
+    ('X-Accel-Buffering', 'no'),
+]
+
+
+async def _task(task_id, session):
+    try:
+        return await aio.get_task(task_id, session=session)
+    except TaskNotFound as e:
+        raise HTTPError(404, e.message)
+
+
+async def list_tasks(request, session):
+    limit = _page_size(request)
+    try:
+        after = int(_query_param(request, 'after', 0))
+    except ValueError:
+        raise HTTPError(400, 'after must be a Task ID')
+    rows = await aio.iter_tasks(limit=limit, after=after,
+                                name=_query_param(request, 'name'),
+                                session=session)
+    tasks = [{'id': task_id, 'name': task_name} for task_id, task_name in rows]
+    return 200, {
+        'tasks': tasks,
+        'next': tasks[-1]['id'] if len(tasks) == limit else None,
+    }
+
+
+async def new_task(request, session):
+    name = parse_json_body(request['body']).get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise HTTPError(400, 'name is required')
+    return 201, task_json(await aio.create_task(name.strip(),
+                                                session=session))
+
+
+async def show_task(request, session, task_id):
+    return 200, task_json(await _task(task_id, session))
+
+
+async def _history(request, session, task_id, get_history, to_json,
+                   cursor_of):
+    await _task(task_id, session)
+    limit = _page_size(request)
+    rows = await get_history(task_id, limit=limit,
+                             since=_datetime_param(request, 'since'),
+                             before=_cursor_param(request),
+                             include_archived=_flag_param(request,
+                                                          'archived'),
+                             session=session)
+    next_cursor = None
+    if len(rows) == limit:
+        at, row_id = cursor_of(rows[-1])
+        next_cursor = f'{at.isoformat()},{row_id}'
+    return 200, {'items': [to_json(row) for row in rows],
+                 'next': next_cursor}
+
+
+async def list_executions(request, session, task_id):
+    return await _history(
+        request, session, task_id, aio.get_executions, execution_json,
+        lambda execution: (execution.executed_at, execution.id))
+
+
+async def new_execution(request, session, task_id):
+    await _task(task_id, session)
+    return 201, execution_json(await aio.execute_task(task_id,
+                                                      session=session))
+
+
+async def list_execution_windows(request, session, task_id):
+    return await _history(
+        request, session, task_id, aio.get_execution_windows,
+        execution_window_json, lambda window: (window.start, window.id))
+
+
+async def new_execution_window(request, session, task_id):
+    task = await _task(task_id, session)
+    body = parse_json_body(request['body'])
+    try:
+        start = parse_datetime(str(body['start']))
+        end = parse_datetime(str(body['end']))
+    except KeyError as e:
+        raise HTTPError(400, f'{e.args[0]} is required')
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    if end <= start:
+        raise HTTPError(400, 'end must be after start')
+
+    execution_window = ExecutionWindow(task_id=task.id, start=start, end=end)
+    # Another request can't add an overlapping window between the check and
+    # the insert
+    async with aio.unit_of_work(session, write=True):
+        overlap = await aio.check_if_execution_window_overlaps(
+            task, execution_window, session=session)
+        if overlap is not None:
+            raise HTTPError(409, f'Overlaps Execution Window {overlap.id}')
+        await aio.add_execution_window(execution_window, session=session)
+    return 201, execution_window_json(execution_window)
+
+
+async def show_stats(request, session):
+    try:
+        rows = await aio.get_stats(**stats_params(request), session=session)
+    except TaskNotFound as e:
+        raise HTTPError(404, e.message)
+    return 200, {'stats': [stats_json(row) for row in rows]}
+
+
+async def show_rollups(request, session):
+    params = stats_params(request)
+    params['period'] = params['period'] or 'day'
+    try:
+        rows = await aio.get_rollups(**params, session=session)
+    except TaskNotFound as e:
+        raise HTTPError(404, e.message)
+    return 200, {'rollups': [rollups_json(row) for row in rows]}
+
+
+async def show_cache(request, session):
+    return 200, cache_stats()
+
+
+ROUTES = [
+    (re.compile(r'/api/tasks/?'),
+     {'GET': list_tasks, 'POST': new_task}),
+    (re.compile(r'/api/tasks/(\d+)/?'),
+     {'GET': show_task}),
+    (re.compile(r'/api/tasks/(\d+)/executions/?'),
+     {'GET': list_executions, 'POST': new_execution}),
+    (re.compile(r'/api/tasks/(\d+)/windows/?'),
+     {'GET': list_execution_windows, 'POST': new_execution_window}),
+    (re.compile(r'/api/stats/?'),
+     {'GET': show_stats}),
+    (re.compile(r'/api/rollups/?'),
+     {'GET': show_rollups}),
+    (re.compile(r'/api/cache/?'),
+     {'GET': show_cache}),
+]
+
+
+async def _read_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_SIZE:
+            raise HTTPError(413, 'Request body is too large')
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def _respond(send, status, headers, body=b''):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(name.lower().encode('latin-1'),
+                             value.encode('latin-1'))
+                            for name, value in headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _request(scope):
+    """The request as the helpers in app.py expect it, with the headers in
+    a WSGI style environ"""
+    environ = {
+        'HTTP_' + name.decode('latin-1').upper().replace('-', '_'):
+            value.decode('latin-1')
+        for name, value in scope['headers']
+    }
+    return {
+        'environ': environ,
+        'query': parse_qs(scope['query_string'].decode('latin-1')),
+    }
+
+
+def last_event_id(request):
+    """Where an event stream starts from: a reconnecting EventSource sends
+    the Last-Event-ID header, and a new one can pass last_event_id. With
+    neither it's None, meaning from now"""
+    value = (request['environ'].get('HTTP_LAST_EVENT_ID')
+             or _query_param(request, 'last_event_id'))
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(400, 'Last-Event-ID must be an event id')
+
+
+def format_events(events, reset_to, last_id):
+    """Turns what get_events returned into a chunk of the event stream, and
+    returns it with the id to read after next time.
+
+    If events were missed the client is sent a reset event, meaning reload
+    whatever it's showing, and the stream carries on from the latest
+    event"""
+    if reset_to is not None:
+        return f'id: {reset_to}\nevent: reset\ndata: {{}}\n\n', reset_to
+    if not events:
+        return ': keepalive\n\n', last_id
+    chunk = ''.join(
+        f'id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n'
+        for event in events)
+    return chunk, events[-1].id
+
+
+async def events(scope, receive, send):
+    """Server-sent events for Executions and Execution Window changes, see
+    taskmaster.events. Each listener is a coroutine looking for new events
+    every EVENT_POLL_INTERVAL seconds"""
+    try:
+        last_id = last_event_id(_request(scope))
+    except HTTPError as e:
+        await _respond(send, e.status, [('Content-Type', 'application/json')],
+                       json.dumps({'error': e.message}).encode('utf-8'))
+        return
+    if last_id is None:
+        last_id = await aio.get_latest_event_id()
+
+    disconnected = asyncio.Event()
+
+    async def watch_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = asyncio.create_task(watch_for_disconnect())
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(name.lower().encode('latin-1'),
+                             value.encode('latin-1'))
+                            for name, value in EVENT_STREAM_HEADERS]})
+    await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n',
+                'more_body': True})
+    idle = 0
+    try:
+        while not disconnected.is_set():
+            events, reset_to = await aio.get_events(last_id)
+            if events or reset_to is not None or idle >= EVENT_KEEPALIVE:
+                chunk, last_id = format_events(events, reset_to, last_id)
+                await send({'type': 'http.response.body',
+                            'body': chunk.encode('utf-8'), 'more_body': True})
+                idle = 0
+            if len(events) == EVENT_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(disconnected.wait(),
+                                       EVENT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                idle += EVENT_POLL_INTERVAL
+    finally:
+        watcher.cancel()
+
+
+async def api(scope, receive, send):
+    method = scope['method']
+    request = _request(scope)
+    environ = request['environ']
+    headers = [('Content-Type', 'application/json')]
+    try:
+        handler, args = _route(method, scope['path'], ROUTES)
+        request['body'] = await _read_body(receive)
+        async with aio.unit_of_work() as session:
+            status, data = await handler(request, session, *args)
+    except HTTPError as e:
+        status, data = e.status, {'error': e.message}
+        headers.extend(e.headers)
+
+    body = json.dumps(data).encode('utf-8')
+    if method in ('GET', 'HEAD') and status == 200:
+        tag = etag(body)
+        headers.extend([('ETag', tag), ('Cache-Control', 'no-cache')])
+        if _not_modified(environ, tag):
+            await _respond(send, 304, headers[1:])
+            return
+    headers.append(('Content-Length', str(len(body))))
+    await _respond(send, status, headers,
+                   b'' if method == 'HEAD' else body)
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aio.dispose_async_engine()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def dashboard(scope, receive, send):
+    now = datetime.utcnow()
+    rows = await aio.get_dashboard(now)
+    template = env.get_template('dashboard.html')
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/html; charset=utf-8')]})
+    for chunk in stream(template, dashboard_context(rows, now)):
+        await send({'type': 'http.response.body', 'body': chunk,
+                    'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+
+    if scope['path'] == '/api/events':
+        return await events(scope, receive, send)
+    if scope['path'].startswith('/api/'):
+        return await api(scope, receive, send)
+    if scope['path'] == '/':
+        return await dashboard(scope, receive, send)
+
+    await _respond(send, 404, [('Content-Type', 'text/plain')], b'Not Found')
@@ -0,0 +1,13 @@
+"""
+Compiles the website's templates into website/compiled_templates, which the
+website then loads instead of the template sources. deploy.sh runs this
+before copying the files over.
+
+Run from the repository root with `python -m website.compile_templates`
+"""
+from website.templating import COMPILED_DIR, compile_templates
+
+
+if __name__ == '__main__':
+    compile_templates()
+    print(f'Compiled templates into {COMPILED_DIR}')
@@ -0,0 +1,56 @@
+"""
+The Jinja2 Environment for the website.
+
+Templates are found by absolute path, so it doesn't matter where the server
+was started from, and aren't checked for changes once loaded. At deploy
+time `python -m website.compile_templates` compiles them to Python modules
+in website/compiled_templates. When that directory exists they're imported
+from there instead, which skips parsing and compiling them in every new
+worker. Delete it, or recompile, after changing a template.
+"""
+import os
+
+from jinja2 import (Environment, FileSystemLoader, ModuleLoader,
+                    select_autoescape)
+
+
+WEBSITE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(WEBSITE_DIR, 'templates')
+COMPILED_DIR = os.path.join(WEBSITE_DIR, 'compiled_templates')
+
+# Rendered output is handed to the server in chunks of at least this size
+STREAM_BUFFER_SIZE = 8192
+
+
+def make_environment(compiled=None):
+    """compiled -- load precompiled templates, by default if there are any"""
+    if compiled is None:
+        compiled = os.path.isdir(COMPILED_DIR)
+    loader = (ModuleLoader(COMPILED_DIR) if compiled
+              else FileSystemLoader(TEMPLATE_DIR))
+    return Environment(loader=loader, auto_reload=False,
+                       autoescape=select_autoescape())
+
+
+def compile_templates():
+    """Compiles every template into COMPILED_DIR"""
+    make_environment(compiled=False).compile_templates(
+        COMPILED_DIR, zip=None, ignore_errors=False)
+
+
+def stream(template, context):
+    """Renders the template bit by bit, in UTF-8 chunks"""
+    buffer = []
+    size = 0
+    for piece in template.generate(context):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+env = make_environment()